@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Microbenchmark of reading and writing column attributes.
+
+Compares the column descriptors installed by the ORM metaclass with
+the previous ``__getattr__``/``__setattr__`` fallbacks, which are
+reproduced here for reference.
+
+Usage::
+
+    python benchmarks/attribute_access.py
+"""
+from __future__ import print_function
+
+import timeit
+
+import sqlalchemy as db
+from chemist import Model
+
+metadata = db.MetaData()
+
+
+class User(Model):
+    table = db.Table(
+        "bench_user",
+        metadata,
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("email", db.String(100)),
+        db.Column("age", db.Integer),
+    )
+
+
+class LegacyUser(Model):
+    table = db.Table(
+        "bench_legacy_user",
+        metadata,
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("email", db.String(100)),
+        db.Column("age", db.Integer),
+    )
+
+    def __setattr__(self, attr, value):
+        if attr in self.__columns__:
+            self.__data__[attr] = self.deserialize_value(attr, value)
+            return
+
+        return super(LegacyUser, self).__setattr__(attr, value)
+
+    def __getattr__(self, attr):
+        try:
+            return object.__getattribute__(self, attr)
+        except AttributeError:
+            columns = list(self.__columns__.keys())
+            if attr in columns:
+                value = self.__data__.get(attr, None)
+                return self.serialize_value(attr, value)
+
+
+# remove the descriptors so that LegacyUser goes through the fallbacks
+for name in LegacyUser.__columns__:
+    delattr(LegacyUser, name)
+
+
+def measure(label, statement, instance, number=200000):
+    seconds = min(
+        timeit.repeat(statement, globals={"user": instance}, number=number, repeat=5)
+    )
+    print("{:<28} {:>8.1f} ns/op".format(label, seconds / number * 1e9))
+
+
+def main():
+    user = User(id=1, email="octocat@github.com", age=33)
+    legacy = LegacyUser(id=1, email="octocat@github.com", age=33)
+
+    measure("read (before)", "user.email", legacy)
+    measure("read (after)", "user.email", user)
+    measure("write (before)", "user.email = 'a@b.c'", legacy)
+    measure("write (after)", "user.email = 'a@b.c'", user)
+
+
+if __name__ == "__main__":
+    main()
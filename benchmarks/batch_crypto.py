@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of decrypting and encrypting the cells of a batch of rows
+with :py:func:`chemist.encryption.decrypt_rows` and
+:py:func:`chemist.encryption.encrypt_rows` per number of workers.
+
+Scaling depends on the size of the values: libsodium only releases
+the GIL while it runs, the rest of the per-cell work does not.
+
+Usage::
+
+    python benchmarks/batch_crypto.py [number-of-rows] [value-size]
+"""
+from __future__ import print_function
+
+import sys
+import time
+from multiprocessing import cpu_count
+
+import nacl.secret
+import sqlalchemy as db
+from chemist import Model, decrypt_rows, encrypt_rows
+
+metadata = db.MetaData()
+
+
+class Document(Model):
+    table = db.Table(
+        "bench_document",
+        metadata,
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("title", db.Text),
+        db.Column("body", db.Text),
+    )
+    encryption = {
+        "title": b"\x01" * nacl.secret.SecretBox.KEY_SIZE,
+        "body": b"\x02" * nacl.secret.SecretBox.KEY_SIZE,
+    }
+    encryption_envelope = True
+
+
+def measure(label, process, make_rows, workers, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        rows = make_rows()
+        started = time.time()
+        process(Document, rows, workers)
+        timings.append(time.time() - started)
+
+    elapsed = min(timings)
+    cells = len(rows) * 2
+    print("{:<10} workers={:<3} {:>8.3f}s {:>10.0f} cells/s".format(
+        label, workers, elapsed, cells / elapsed))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 4096
+
+    plain = [
+        {"id": i, "title": "document {}".format(i), "body": "x" * size}
+        for i in range(count)
+    ]
+    sealed = encrypt_rows(Document, [dict(row) for row in plain], 1)
+
+    print("{} rows, {} bytes per body, {} cpus".format(count, size, cpu_count()))
+    for workers in (1, 2, 4, 8):
+        measure("encrypt", encrypt_rows, lambda: [dict(r) for r in plain], workers)
+
+    for workers in (1, 2, 4, 8):
+        measure("decrypt", decrypt_rows, lambda: [dict(r) for r in sealed], workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of inserting rows with a loop of ``Manager.create()``
+versus a single ``Manager.bulk_create()``, against SQLite.
+
+Usage::
+
+    python benchmarks/bulk_create.py [number-of-rows]
+"""
+from __future__ import print_function
+
+import sys
+import time
+
+import sqlalchemy as db
+from chemist import Model, set_default_uri
+
+metadata = db.MetaData()
+
+
+class Contact(Model):
+    table = db.Table(
+        "bench_contact",
+        metadata,
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("email", db.String(100), nullable=False),
+        db.Column("name", db.String(100)),
+        db.Column("age", db.Integer),
+    )
+
+
+def rows(count):
+    for i in range(count):
+        yield {"email": "user{}@example.com".format(i), "name": "User", "age": i % 90}
+
+
+def measure(label, count, insert):
+    engine = set_default_uri("sqlite://")
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+
+    started = time.time()
+    insert(count)
+    elapsed = time.time() - started
+
+    assert Contact.using(engine).total_rows() == count
+    print("{:<32} {:>8.3f}s {:>10.0f} rows/s".format(label, elapsed, count / elapsed))
+
+
+def create_loop(count):
+    for data in rows(count):
+        Contact.create(**data)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+    measure("create() loop", count, create_loop)
+    measure("bulk_create()", count, lambda n: Contact.bulk_create(rows(n)))
+    measure(
+        "bulk_create(returning=True)",
+        count,
+        lambda n: Contact.bulk_create(rows(n), returning=True),
+    )
+
+
+if __name__ == "__main__":
+    main()
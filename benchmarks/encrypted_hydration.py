@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of hydrating rows into models with and without
+``encryption`` declared.
+
+``LegacySecret`` reproduces the previous
+``get_encryption_box_for_attribute``, which built a new ``SecretBox``
+on every call, for reference.
+
+Usage::
+
+    python benchmarks/encrypted_hydration.py [number-of-rows]
+"""
+from __future__ import print_function
+
+import sys
+import time
+
+import nacl.secret
+import sqlalchemy as db
+from chemist import Model, Manager
+
+metadata = db.MetaData()
+
+SECRET_KEY = b"\x01" * nacl.secret.SecretBox.KEY_SIZE
+
+
+def make_table(name):
+    return db.Table(
+        name,
+        metadata,
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("email", db.String(100)),
+        db.Column("secret", db.LargeBinary),
+    )
+
+
+class Plain(Model):
+    table = make_table("bench_plain")
+
+
+class Secret(Model):
+    table = make_table("bench_secret")
+    encryption = {"secret": SECRET_KEY}
+
+
+class LegacySecret(Model):
+    table = make_table("bench_legacy_secret")
+    encryption = {"secret": SECRET_KEY}
+
+    def get_encryption_box_for_attribute(self, attr):
+        keymap = dict(getattr(self, "encryption", None) or {})
+        if attr not in keymap:
+            return
+
+        return nacl.secret.SecretBox(keymap[attr])
+
+
+class Proxy(object):
+    def keys(self):
+        return ["id", "email", "secret"]
+
+
+def hydrate(manager, rows):
+    proxy = Proxy()
+    started = time.time()
+    for row in rows:
+        manager.from_result_proxy(proxy, row)
+
+    return time.time() - started
+
+
+def measure(label, model, rows, repeat=3):
+    manager = Manager(model, db.create_engine("sqlite://"))
+    elapsed = min(hydrate(manager, rows) for _ in range(repeat))
+
+    print("{:<28} {:>8.3f}s {:>10.0f} rows/s".format(label, elapsed, len(rows) / elapsed))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    box = nacl.secret.SecretBox(SECRET_KEY)
+    ciphertext = bytes(box.encrypt(b"4111111111111111"))
+    rows = [(i, "user{}@example.com".format(i), ciphertext) for i in range(count)]
+    plain_rows = [(i, email, b"4111111111111111") for i, email, _ in rows]
+
+    measure("no encryption", Plain, plain_rows)
+    measure("encryption (before)", LegacySecret, rows)
+    measure("encryption (after)", Secret, rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of the per-call overhead of the classmethod shortcuts of
+:py:class:`chemist.models.Model`, which resolve the manager of the
+model through :py:meth:`chemist.models.Model.using`.
+
+Usage::
+
+    python benchmarks/manager_lookup.py [number-of-calls]
+"""
+from __future__ import print_function
+
+import sys
+import time
+
+import sqlalchemy as db
+from chemist import Model, set_default_uri
+
+metadata = db.MetaData()
+
+
+class Task(Model):
+    table = db.Table(
+        "bench_task",
+        metadata,
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("name", db.String(100)),
+    )
+
+
+def measure(label, call, count):
+    started = time.time()
+    for _ in range(count):
+        call()
+
+    elapsed = time.time() - started
+    print("{:<12} {:>8.3f}s {:>8.2f}us/call".format(label, elapsed, elapsed / count * 1e6))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    engine = set_default_uri("sqlite://")
+    metadata.create_all(engine)
+    Task.create(name="task")
+
+    measure("objects()", Task.objects, count)
+    measure("using(uri)", lambda: Task.using("sqlite://"), count)
+    measure("find_one_by", lambda: Task.find_one_by(id=1), count // 20)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of :py:meth:`chemist.managers.Manager.find_one_by` with
+its cached compiled statement against compiling the statement of every
+query returned by :py:meth:`chemist.managers.Manager.generate_query`.
+
+Usage::
+
+    python benchmarks/statement_cache.py [number-of-queries]
+"""
+from __future__ import print_function
+
+import sys
+import time
+
+import sqlalchemy as db
+from chemist import Manager, Model
+
+metadata = db.MetaData()
+
+
+class Task(Model):
+    table = db.Table(
+        "bench_task",
+        metadata,
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("name", db.String(100)),
+        db.Column("done", db.Boolean),
+    )
+
+
+def measure(label, lookup, count):
+    started = time.time()
+    for i in range(count):
+        lookup(name="task{}".format(i % 100), done=False)
+
+    elapsed = time.time() - started
+    print("{:<10} {:>8.3f}s {:>10.0f} queries/s".format(label, elapsed, count / elapsed))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    engine = db.create_engine("sqlite://")
+    metadata.create_all(engine)
+    manager = Manager(Task, engine)
+    manager.bulk_create([{"name": "task{}".format(i), "done": False} for i in range(100)])
+
+    def uncached(**kw):
+        return manager.one_from_query(manager.generate_query(limit_by=1, **kw))
+
+    measure("uncached", uncached, count)
+    measure("cached", manager.find_one_by, count)
+    print(Manager.statement_cache.stats())
+
+
+if __name__ == "__main__":
+    main()
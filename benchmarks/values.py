@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of listing two columns of many rows with
+:py:meth:`chemist.managers.Manager.values` against building the models
+with :py:meth:`chemist.managers.Manager.all`.
+
+Usage::
+
+    python benchmarks/values.py [number-of-rows]
+"""
+from __future__ import print_function
+
+import sys
+import time
+
+import sqlalchemy as db
+from chemist import Model, set_default_uri
+
+metadata = db.MetaData()
+
+
+class User(Model):
+    table = db.Table(
+        "bench_user",
+        metadata,
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("email", db.String(255)),
+        db.Column("password", db.String(255)),
+        db.Column("auth_token", db.Text),
+    )
+
+
+def measure(label, call, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        started = time.time()
+        call()
+        timings.append(time.time() - started)
+
+    print("{:<10} {:>8.3f}s".format(label, min(timings)))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    engine = set_default_uri("sqlite://")
+    metadata.create_all(engine)
+    User.bulk_create([
+        {"email": "user{}@example.com".format(i), "password": "x" * 60, "auth_token": "t" * 200}
+        for i in range(count)
+    ])
+
+    print("{} rows".format(count))
+    measure("models", lambda: [{"email": u.email, "id": u.id} for u in User.all()])
+    measure("values", lambda: User.values("email", "id"))
+
+
+if __name__ == "__main__":
+    main()
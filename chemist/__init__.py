@@ -4,4 +4,6 @@ from chemist.orm import default_context as context
 from chemist.orm import *
 from chemist.models import *
 from chemist.managers import *
+from chemist.encryption import *
+from chemist.cache import *
 from chemist.exceptions import *
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""Cache backends of the identity cache of the models, see
+:py:attr:`chemist.models.Model.identity_cache`, and the bounded
+mapping of the statement cache of the managers, see
+:py:class:`chemist.managers.StatementCache`.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+monotonic = getattr(time, "monotonic", time.time)
+cache_miss = object()
+
+
+class CacheBackend(object):
+    """Interface of the identity cache backends.
+
+    Keys are tuples with the URL of the engine, its password masked,
+    the table name and the primary key, values
+    are tuples with the column names and the raw values of a row.
+    :py:meth:`get` returns None for missing keys.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self):
+        """returns a dict with the counters of the backend"""
+        return {}
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU cache with a TTL, safe to share between threads.
+
+    Keeps up to ``max_size`` entries for ``ttl`` seconds, evicting the
+    least recently used, and counts hits, misses and evictions.
+
+    ::
+
+      class User(Model):
+          table = ...
+          identity_cache = MemoryCache(max_size=10000, ttl=60)
+    """
+
+    def __init__(self, max_size=1000, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None or entry[1] <= monotonic():
+                self.misses += 1
+                return None
+
+            # reinserted as the most recently used
+            self.entries[key] = entry
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (value, monotonic() + self.ttl)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self.entries),
+            }
+
+
+class LRUDict(object):
+    """Bounded mapping that evicts the least recently used entries
+    beyond ``max_size`` and counts hits, misses and evictions.
+
+    Implements the subset of the dict interface that SQLAlchemy uses
+    for its ``compiled_cache`` execution option.
+    """
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, fallback=None):
+        with self.lock:
+            value = self.entries.pop(key, cache_miss)
+            if value is cache_miss:
+                self.misses += 1
+                return fallback
+
+            self.entries[key] = value
+            self.hits += 1
+            return value
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = value
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self.entries),
+                "hit_rate": float(self.hits) / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""Encryption helpers of the models.
+
+Versioned envelope for the values written by
+:py:meth:`~chemist.models.Model.encrypt_attribute` in models declared
+with ``encryption_envelope = True``.
+
+A sealed value is a text of the form::
+
+  chemist:1:<key-id>:<base64 of the SecretBox ciphertext>
+
+so that :py:meth:`~chemist.models.Model.decrypt_attribute` only
+attempts decryption of values that carry the prefix, and knows which
+key encrypted them.
+
+Key providers, which can be declared in place of the raw keys of
+``Model.encryption`` to retrieve them from somewhere else, see
+:py:class:`KeyProvider`.
+
+Batch encryption and decryption of many rows on a thread pool, see
+:py:func:`decrypt_rows`, key rotation, see :py:class:`KeyRotation`,
+and blind indexes, see :py:func:`get_blind_index`.
+"""
+import base64
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
+import nacl.secret
+import nacl.utils
+from nacl.exceptions import CryptoError
+from six import binary_type, text_type
+
+from chemist.exceptions import InvalidEncryptionEnvelope
+
+
+ENVELOPE_VERSION = 1
+ENVELOPE_PREFIX = "chemist:{}:".format(ENVELOPE_VERSION)
+ENVELOPE_PREFIX_BYTES = ENVELOPE_PREFIX.encode("ascii")
+
+
+def to_bytes(value):
+    if isinstance(value, binary_type):
+        return value
+
+    return text_type(value).encode("utf-8")
+
+
+def get_key_id(key):
+    """returns the short fingerprint of an encryption key that
+    identifies it in sealed values"""
+    return hashlib.sha256(to_bytes(key)).hexdigest()[:8]
+
+
+def get_blind_index(key, value):
+    """returns the keyed HMAC-SHA256 of the text of the given value,
+    as 64 hexadecimal digits, or None for None.
+
+    Models that declare ``blind_indexes`` store it in a sibling column
+    of an encrypted column, so that equality filters can match it.
+    """
+    if value is None:
+        return None
+
+    return hmac.new(to_bytes(key), to_bytes(value), hashlib.sha256).hexdigest()
+
+
+def is_sealed(value):
+    """returns True if the given value was sealed by :py:func:`seal`"""
+    if isinstance(value, text_type):
+        return value.startswith(ENVELOPE_PREFIX)
+
+    if isinstance(value, binary_type):
+        return value.startswith(ENVELOPE_PREFIX_BYTES)
+
+    return False
+
+
+def seal(box, key_id, value, nonce):
+    """encrypts the given value with the given
+    :py:class:`nacl.secret.SecretBox` and wraps it in the envelope"""
+    ciphertext = box.encrypt(to_bytes(value), nonce)
+    encoded = base64.b64encode(bytes(ciphertext)).decode("ascii")
+    return "".join([ENVELOPE_PREFIX, key_id, ":", encoded])
+
+
+def unseal(value):
+    """returns a tuple with the key id and the raw ciphertext of a
+    sealed value"""
+    if isinstance(value, binary_type):
+        value = value.decode("ascii")
+
+    try:
+        key_id, encoded = value[len(ENVELOPE_PREFIX):].split(":", 1)
+        return key_id, base64.b64decode(encoded.encode("ascii"))
+    except (ValueError, TypeError) as e:
+        raise InvalidEncryptionEnvelope("malformed encrypted value: {}".format(e))
+
+
+monotonic = getattr(time, "monotonic", time.time)
+
+
+class KeyFetch(object):
+    """a key fetch in progress, which concurrent callers wait for"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.key = None
+        self.error = None
+
+
+class KeyProvider(object):
+    """Retrieves the encryption keys of model attributes from
+    somewhere else than the model declaration.
+
+    Subclasses implement :py:meth:`fetch_key`, whose results are
+    cached in-process for ``ttl`` seconds, up to ``max_size`` keys,
+    evicting the least recently used. Concurrent threads asking for
+    a key that is not cached wait for a single fetch.
+
+    **Example:**
+
+    ::
+
+      class AgentKeyProvider(KeyProvider):
+          def fetch_key(self, model, attr):
+              return agent.get_key('{}.{}'.format(model.__name__, attr))
+
+      class User(Model):
+          table = ...
+          encryption = {
+              'credit_card': AgentKeyProvider(ttl=300),
+          }
+    """
+
+    def __init__(self, ttl=300, max_size=1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.cache = OrderedDict()
+        self.fetches = {}
+        self.lock = threading.Lock()
+
+    def fetch_key(self, model, attr):
+        """returns the key of the given model class and attribute,
+        must be implemented by subclasses"""
+        raise NotImplementedError(
+            "{} must implement fetch_key(model, attr)".format(self.__class__.__name__)
+        )
+
+    def get_key(self, model, attr):
+        """returns the cached key of the given model class and
+        attribute, fetching it when missing or expired"""
+        cache_key = (model, attr)
+        with self.lock:
+            entry = self.cache.pop(cache_key, None)
+            if entry is not None and entry[1] > monotonic():
+                # reinserted as the most recently used
+                self.cache[cache_key] = entry
+                return entry[0]
+
+            fetch = self.fetches.get(cache_key)
+            leader = fetch is None
+            if leader:
+                fetch = self.fetches[cache_key] = KeyFetch()
+
+        if not leader:
+            fetch.done.wait()
+            if fetch.error is not None:
+                raise fetch.error
+
+            return fetch.key
+
+        try:
+            fetch.key = self.fetch_key(model, attr)
+        except BaseException as e:
+            fetch.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.fetches[cache_key]
+                if fetch.error is None:
+                    self.cache[cache_key] = (fetch.key, monotonic() + self.ttl)
+                    while len(self.cache) > self.max_size:
+                        self.cache.popitem(last=False)
+
+            fetch.done.set()
+
+        return fetch.key
+
+    def clear(self):
+        """evicts all the cached keys"""
+        with self.lock:
+            self.cache.clear()
+
+
+class InMemoryKeyProvider(KeyProvider):
+    """A :py:class:`KeyProvider` that serves keys from a dict, meant
+    for tests. Counts the calls to :py:meth:`fetch_key` in
+    ``fetch_count``.
+
+    ::
+
+      provider = InMemoryKeyProvider({('User', 'credit_card'): key})
+    """
+
+    def __init__(self, keys=None, **kw):
+        super(InMemoryKeyProvider, self).__init__(**kw)
+        self.keys = dict(keys or {})
+        self.fetch_count = 0
+
+    def set_key(self, model, attr, key):
+        """sets the key of the given model class (or class name) and
+        attribute, already cached keys are served until they expire"""
+        self.keys[(getattr(model, "__name__", model), attr)] = key
+
+    def fetch_key(self, model, attr):
+        self.fetch_count += 1
+        return self.keys[(model.__name__, attr)]
+
+
+thread_pools = {}
+thread_pools_lock = threading.Lock()
+
+
+def get_thread_pool(workers):
+    """returns the shared thread pool with the given number of
+    workers, creating it on first use"""
+    with thread_pools_lock:
+        pool = thread_pools.get(workers)
+        if pool is None:
+            pool = thread_pools[workers] = ThreadPool(workers)
+
+        return pool
+
+
+def process_rows(model, rows, workers, method_name):
+    cells = []
+    for name in model.__encryption_keys__:
+        cells.extend((row, name) for row in rows if name in row)
+
+    if not cells:
+        return rows
+
+    # a bare instance to reach the encryption methods of the model
+    method = getattr(model.__new__(model), method_name)
+
+    def process(cell):
+        row, name = cell
+        return method(name, row[name])
+
+    if workers > 1 and len(cells) > 1:
+        chunksize = max(1, len(cells) // (workers * 4))
+        results = get_thread_pool(workers).map(process, cells, chunksize)
+    else:
+        results = map(process, cells)
+
+    for (row, name), value in zip(cells, results):
+        row[name] = value
+
+    return rows
+
+
+def decrypt_rows(model, rows, workers):
+    """Decrypts in place the encrypted cells of the given list of
+    dicts of column values of the given model class, spread on
+    ``workers`` threads: libsodium releases the GIL while it
+    decrypts.
+
+    Used by the bulk paths of :py:class:`~chemist.managers.Manager`
+    when its ``crypto_workers`` is set.
+    """
+    return process_rows(model, rows, workers, "decrypt_attribute")
+
+
+def encrypt_rows(model, rows, workers):
+    """Same as :py:func:`decrypt_rows` but encrypts the cells"""
+    return process_rows(model, rows, workers, "encrypt_attribute")
+
+
+class KeyRotation(object):
+    """Re-encrypts values from an old key to a new one, used by
+    :py:meth:`~chemist.managers.Manager.rotate_encryption`.
+
+    Values that were not encrypted with the old key, e.g. already
+    rotated, are left alone so that an interrupted rotation can run
+    again.
+    """
+
+    def __init__(self, old_key, new_key, envelope):
+        self.old_box = nacl.secret.SecretBox(old_key)
+        self.old_key_id = get_key_id(old_key)
+        self.new_box = nacl.secret.SecretBox(new_key)
+        self.new_key_id = get_key_id(new_key)
+        self.envelope = envelope
+
+    def rotate(self, value):
+        """returns the given value encrypted with the new key, or
+        None if it does not need to be rotated"""
+        if value is None:
+            return None
+
+        ciphertext = value
+        if is_sealed(value):
+            key_id, ciphertext = unseal(value)
+            if key_id != self.old_key_id:
+                return None
+
+        try:
+            plaintext = self.old_box.decrypt(ciphertext)
+        except (CryptoError, TypeError):
+            return None
+
+        nonce = nacl.utils.random(nacl.secret.SecretBox.NONCE_SIZE)
+        if self.envelope:
+            return seal(self.new_box, self.new_key_id, plaintext, nonce)
+
+        return bytes(self.new_box.encrypt(plaintext, nonce))
+
+    def rotate_many(self, values, workers=0):
+        """same as :py:meth:`rotate` for a list of values, spread on
+        a thread pool when ``workers`` is greater than 1"""
+        if workers > 1 and len(values) > 1:
+            chunksize = max(1, len(values) // (workers * 4))
+            return get_thread_pool(workers).map(self.rotate, values, chunksize)
+
+        return [self.rotate(value) for value in values]
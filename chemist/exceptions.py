@@ -26,5 +26,17 @@ class InvalidModelDeclaration(Exception):
     pass
 
 
+class InvalidPaginationCursor(Exception):
+    pass
+
+
 class RecordNotFound(Exception):
     pass
+
+
+class InvalidEncryptionEnvelope(Exception):
+    pass
+
+
+class UnknownEncryptionKey(Exception):
+    pass
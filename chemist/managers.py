@@ -1,23 +1,330 @@
 # -*- coding: utf-8 -*-
+import base64
+import datetime
+import io
+import itertools
+import logging
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from decimal import Decimal
 from functools import partial
 from uuid import uuid4
 
+import dateutil.parser
 import sqlalchemy as db
+from nacl.exceptions import CryptoError
+from six import string_types
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.sql import operators
 
 from chemist.exceptions import InvalidColumnName, InvalidQueryModifier
+from chemist.exceptions import InvalidPaginationCursor
+from chemist.exceptions import InvalidModelDeclaration
+from chemist.exceptions import RecordNotFound
+from chemist.serializers import json
+from chemist.cache import LRUDict
+from chemist.encryption import decrypt_rows
+from chemist.encryption import encrypt_rows
+from chemist.encryption import is_sealed
+from chemist.encryption import KeyRotation
+from chemist.orm import fill_unloaded
+from chemist.orm import format_decimal
+from chemist.orm import mark_unloaded
+from chemist.session import get_current_session
+
+logger = logging.getLogger(__name__)
 
 sentinel = type("sentinel", (object,), {})
 
 
+def chunked(items, size):
+    """splits an iterable into lists of up to ``size`` items"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+# query modifiers of the filter keyword-args, e.g. ``age__gte=18``
+QUERY_MODIFIERS = (
+    "startswith",
+    "contains",
+    "in",
+    "gt",
+    "gte",
+    "lt",
+    "lte",
+    "range",
+    "isnull",
+    "ne",
+    "iexact",
+)
+
+
+# query modifiers that match the blind index of an encrypted column,
+# ``isnull`` matches the encrypted column itself
+BLIND_INDEX_MODIFIERS = ("in", "ne")
+
+
+def filter_clause(column, modifier, value):
+    """returns the where clause of a filter keyword-arg, ``range``
+    takes a tuple with the lower and upper bounds and ``isnull`` a
+    boolean"""
+    if modifier == "startswith":
+        return column.startswith(value)
+
+    if modifier == "contains":
+        return column.contains(value, escape="#")
+
+    if modifier == "in":
+        return column.in_(value)
+
+    if modifier == "gt":
+        return column > value
+
+    if modifier == "gte":
+        return column >= value
+
+    if modifier == "lt":
+        return column < value
+
+    if modifier == "lte":
+        return column <= value
+
+    if modifier == "range":
+        low, high = value
+        return column.between(low, high)
+
+    if modifier == "isnull":
+        return column.is_(None) if value else column.isnot(None)
+
+    if modifier == "ne":
+        return column != value
+
+    if modifier == "iexact":
+        # sargable with an index on lower(column)
+        return db.func.lower(column) == db.func.lower(value)
+
+    return column == value
+
+
+class StatementCache(object):
+    """Statements generated by :py:meth:`Manager.prepare_query` per
+    query shape, and their compiled form per dialect, both bounded
+    LRUs shared by all the managers.
+
+    ::
+
+      Manager.statement_cache.stats()
+    """
+
+    def __init__(self, max_size=500):
+        self.statements = LRUDict(max_size)
+        self.compiled = LRUDict(max_size * 2)
+
+    def clear(self):
+        self.statements.clear()
+        self.compiled.clear()
+
+    def stats(self):
+        return {
+            "statements": self.statements.stats(),
+            "compiled": self.compiled.stats(),
+        }
+
+
+# aggregate functions of :py:meth:`Manager.aggregate`
+AGGREGATES = {
+    "count": db.func.count,
+    "sum": db.func.sum,
+    "avg": db.func.avg,
+    "min": db.func.min,
+    "max": db.func.max,
+}
+
+
+# inserts with a conflict clause per dialect name, see
+# :py:meth:`Manager.upsert`, SQLite has one since SQLAlchemy 1.4
+UPSERT_INSERTS = {
+    "mysql": mysql.insert,
+    "postgresql": postgresql.insert,
+}
+if hasattr(sqlite, "insert"):
+    UPSERT_INSERTS["sqlite"] = sqlite.insert
+
+
+def format_aggregate(value):
+    """formats decimals like the serialization of the models, see
+    :py:func:`~chemist.orm.format_decimal`"""
+    if isinstance(value, Decimal):
+        return format_decimal(value)
+
+    return value
+
+
+def is_projection(proxy):
+    """returns True if the given result proxy is the result of a
+    select of :py:meth:`Manager.select_projection`"""
+    context = getattr(proxy, "context", None)
+    options = getattr(context, "execution_options", None) or {}
+    return options.get("projection") is True
+
+
 def escape_query(query, escape="#"):
     for c in ("%", "_", "/"):
         query = query.replace(c, "{}{}".format(escape, c))
     return query
 
 
+def encode_cursor(columns, values):
+    """encodes the values of the ordering columns of the last row
+    of a page into an opaque, url-safe, pagination cursor"""
+    payload = json.dumps([[c.name for c in columns], list(values)])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor, columns):
+    """decodes a cursor generated by :py:func:`encode_cursor` for the
+    same ordering columns back into python values"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        names, values = json.loads(payload)
+    except (TypeError, ValueError, UnicodeError):
+        raise InvalidPaginationCursor(cursor)
+
+    if names != [c.name for c in columns] or len(values) != len(columns):
+        raise InvalidPaginationCursor(
+            "the cursor {} was not generated for the ordering {}".format(cursor, names)
+        )
+
+    decoded = []
+    for column, value in zip(columns, values):
+        kind = column.type.python_type
+        if value is not None and issubclass(kind, (datetime.datetime, datetime.date)):
+            value = dateutil.parser.parse(value)
+            if kind is datetime.date:
+                value = value.date()
+        elif value is not None and kind is Decimal:
+            value = Decimal(value)
+
+        decoded.append(value)
+
+    return decoded
+
+
+class Page(list):
+    """list of models returned by :py:meth:`Manager.paginate`, the
+    ``cursor`` attribute is the continuation cursor of the next page
+    or ``None`` when this is the last page."""
+
+    def __init__(self, models, cursor=None):
+        super(Page, self).__init__(models)
+        self.cursor = cursor
+
+    @property
+    def has_next(self):
+        return self.cursor is not None
+
+
+def count_updated(conn, update, params):
+    """executes the given UPDATE with each dict of ``params`` and
+    returns the number of rows it changed, ``executemany`` on the
+    dialects that report its row count"""
+    if not params:
+        return 0
+
+    if conn.dialect.supports_sane_multi_rowcount:
+        return conn.execute(update, params).rowcount
+
+    return sum(conn.execute(update, values).rowcount for values in params)
+
+
+class RotationReport(object):
+    """Progress of :py:meth:`Manager.rotate_encryption`"""
+
+    def __init__(self, last=None):
+        self.last = last
+        self.scanned = 0
+        self.rotated = 0
+        self.started = time.time()
+        self.elapsed = 0.0
+
+    def add(self, scanned, rotated, last):
+        self.scanned += scanned
+        self.rotated += rotated
+        self.last = last
+        self.elapsed = time.time() - self.started
+
+    @property
+    def rows_per_second(self):
+        if not self.elapsed:
+            return 0.0
+
+        return self.scanned / self.elapsed
+
+    def __repr__(self):
+        return "<RotationReport scanned={} rotated={} last={!r} {:.0f} rows/s>".format(
+            self.scanned, self.rotated, self.last, self.rows_per_second
+        )
+
+
+def read_checkpoint(path):
+    """returns the primary key saved in the given checkpoint file, if
+    any"""
+    if not path or not os.path.exists(path):
+        return None
+
+    with io.open(path, encoding="utf-8") as fd:
+        return json.loads(fd.read())["last"]
+
+
+def write_checkpoint(path, last):
+    """saves the last processed primary key in the given checkpoint
+    file, atomically"""
+    if not path:
+        return
+
+    partial_path = "{}.partial".format(path)
+    with io.open(partial_path, "w", encoding="utf-8") as fd:
+        fd.write(u"{}".format(json.dumps({"last": last})))
+
+    os.rename(partial_path, path)
+
+
+def remove_checkpoint(path):
+    """removes the given checkpoint file once the walk it tracks is
+    complete, so that a later walk starts over"""
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
 class Manager(object):
     """ """
 
+    # number of rows fetched at a time by the streaming methods
+    # :py:meth:`iter_by`, :py:meth:`iter_all` and :py:meth:`where_iter`
+    stream_batch_size = 1000
+
+    # statements of :py:meth:`prepare_query` per query shape
+    statement_cache = StatementCache()
+
+    # number of threads that decrypt and encrypt the rows loaded or
+    # inserted in bulk, see :py:meth:`uses_batch_crypto`
+    crypto_workers = 0
+
+    # largest number of values bound by a single ``__in`` filter per
+    # dialect name, larger lists are queried in chunks, see
+    # :py:meth:`split_in_filter`
+    in_chunk_sizes = {"sqlite": 500, "oracle": 1000, "mssql": 2000}
+    default_in_chunk_size = 10000
+
     def __init__(self, model_klass, context):
         self.model = model_klass
         self.context = context
@@ -29,84 +336,707 @@ class Manager(object):
         if not result:
             return None
 
-        data = dict(zip(proxy.keys(), result))
-        return self.model(engine=self.engine, **data)
+        keys = proxy.keys()
+        projection = len(keys) < len(self.model.__columns__) and is_projection(proxy)
+        return self.from_row_data(keys, result, projection)
+
+    def from_row_data(self, keys, row, projection=False):
+        """Creates a new instance of the model given the column names
+        and the values of a row, or returns the instance of the
+        :py:meth:`~chemist.orm.Context.session` with the same
+        primary key.
+
+        The columns missing from the row of a ``projection``, see
+        :py:meth:`get_projection`, are marked as unloaded."""
+        session = get_current_session()
+        if session is not None:
+            keys = list(keys)
+            pk_name = self.model.get_pk_name()
+            if pk_name in keys:
+                instance = session.get_identity(self.model, row[keys.index(pk_name)])
+                if instance is not None:
+                    return instance
+
+        if self.model.__lazy__:
+            instance = self.model.from_row(self.engine, keys, row)
+        else:
+            data = dict(zip(keys, row))
+            instance = self.model(engine=self.engine, **data)
+            instance.__dirty__ = None
+
+        if projection:
+            mark_unloaded(instance, set(self.model.__columns__).difference(keys))
+
+        if session is not None:
+            session.add_identity(instance)
+
+        return instance
 
     def many_from_result_proxy(self, proxy):
+        if self.uses_batch_crypto():
+            projection = is_projection(proxy)
+            return self.many_from_rows(proxy.keys(), proxy.fetchall(), projection)
+
         Models = partial(self.from_result_proxy, proxy)
         return list(map(Models, proxy.fetchall()))
 
-    def create(self, **data):
-        """Creates a new model and saves it to MySQL"""
+    def uses_batch_crypto(self):
+        """returns True if the encrypted columns of the rows loaded or
+        inserted in bulk are processed on a thread pool, see
+        :py:func:`~chemist.encryption.decrypt_rows`.
+
+        Requires ``encryption_envelope`` so that the models do not
+        attempt to decrypt the values again.
+        """
+        model = self.model
+        return bool(
+            self.crypto_workers
+            and model.encryption_envelope
+            and model.__encryption_keys__
+            and not model.__lazy__
+        )
+
+    def many_from_rows(self, keys, rows, projection=False):
+        """Creates model instances from the given rows, decrypting
+        their encrypted columns in a single batch"""
+        data = decrypt_rows(
+            self.model, [dict(zip(keys, row)) for row in rows], self.crypto_workers
+        )
+        session = get_current_session()
+        instances = []
+        unloaded = projection and set(self.model.__columns__).difference(keys)
+        for item in data:
+            instance = self.model(engine=self.engine, **item)
+            instance.__dirty__ = None
+            if unloaded:
+                mark_unloaded(instance, unloaded)
+
+            if session is not None:
+                existing = session.get_identity(self.model, instance.get_pk_value())
+                instance = existing or session.add_identity(instance)
+
+            instances.append(instance)
+
+        return instances
+
+    def new(self, **data):
+        """Instantiates a new model bound to the engine of this
+        manager, without saving it"""
         colmeta = getattr(self.model, "__columns__", {})
         cols = colmeta.keys()
         if "uuid" in cols and "uuid" not in data:
             data["uuid"] = uuid4().hex
 
-        instance = self.model(engine=self.engine, **data)
+        return self.model(engine=self.engine, **data)
+
+    def create(self, **data):
+        """Creates a new model and saves it to MySQL"""
+        instance = self.new(**data)
         return instance.save()
 
+    def bulk_create(self, items, batch_size=500, returning=False):
+        """Inserts many models at once and returns them.
+
+        ``items`` is an iterable of dicts, which are instantiated like
+        in :py:meth:`create`, or of unsaved model instances. Each
+        model is preprocessed and encrypted through
+        :py:meth:`~chemist.models.Model.to_insert_params` then the
+        rows are inserted ``batch_size`` at a time with ``executemany``,
+        all within a single transaction.
+
+        The primary keys of the new rows are only set in the models
+        when ``returning=True``: through ``INSERT ... RETURNING`` on
+        dialects that support it, otherwise by inserting the rows one
+        by one, still within the same transaction. Without them,
+        saving the returned models again inserts new rows.
+        """
+        table = self.model.table
+        pk_name = self.model.get_pk_name()
+        pk = getattr(table.c, pk_name)
+        created = []
+
+        conn = self.engine.connect()
+        transaction = conn.begin()
+        try:
+            dialect = conn.dialect
+            use_returning = returning and (
+                dialect.implicit_returning and dialect.supports_multivalues_insert
+            )
+            batch_crypto = self.uses_batch_crypto()
+            for batch in chunked(items, batch_size):
+                instances = []
+                for item in batch:
+                    if isinstance(item, dict):
+                        item = self.new(**item)
+                    elif not item.engine:
+                        item.engine = self.engine
+
+                    item.pre_save()
+                    instances.append(item)
+
+                params = [
+                    instance.to_insert_params(encrypt=not batch_crypto)
+                    for instance in instances
+                ]
+                if batch_crypto:
+                    encrypt_rows(self.model, params, self.crypto_workers)
+
+                if use_returning:
+                    result = conn.execute(table.insert().values(params).returning(pk))
+                    for instance, row in zip(instances, result.fetchall()):
+                        instance.set(**{pk_name: row[0]})
+                elif returning:
+                    for instance, values in zip(instances, params):
+                        result = conn.execute(table.insert().values(**values))
+                        instance.set(**{pk_name: result.inserted_primary_key[0]})
+                else:
+                    conn.execute(table.insert(), params)
+
+                for instance, values in zip(instances, params):
+                    instance.fill_inserted_values(values)
+
+                created.extend(instances)
+
+            transaction.commit()
+        except Exception:
+            transaction.rollback()
+            raise
+        finally:
+            conn.close()
+
+        for instance in created:
+            instance.__dirty__ = None
+            instance.post_save(transaction)
+
+        return created
+
     def get_or_create(self, **data):
         """Tries to get a model from the database that would match the
         given keyword-args through :py:meth:`Manager.find_one_by`. If not
         found, a new instance is created in the database through
-        :py:meth:`Manager.create`"""
+        :py:meth:`Manager.create`
+
+        When the keyword-args include a unique key of the table and
+        the dialect has a native upsert, the model is inserted or
+        fetched in a single statement instead, see
+        :py:meth:`insert_or_select`.
+        """
+        conflict_on = self.get_unique_key(data)
+        if conflict_on and self.supports_upsert():
+            return self.insert_or_select(data, conflict_on)
+
         instance = self.find_one_by(**data)
         if not instance:
             instance = self.create(**data)
 
         return instance
 
+    def insert_or_select(self, data, conflict_on):
+        """Inserts a model with the given data unless a row with the
+        same values of the ``conflict_on`` columns already exists, in
+        which case the model of that row is returned.
+
+        :py:meth:`~chemist.models.Model.pre_save` runs before the
+        insert, since only the database knows whether the row exists,
+        and :py:meth:`~chemist.models.Model.post_save` only runs when
+        the row is inserted.
+        """
+        table = self.model.table
+        pk_name = self.model.get_pk_name()
+        instance = self.new(**data)
+        instance.pre_save()
+        params = instance.to_insert_params()
+        if instance.get_pk_value() is not None:
+            params[pk_name] = instance.get_pk_value()
+
+        existing = None
+        conn = self.engine.connect()
+        transaction = conn.begin()
+        try:
+            dialect_name = conn.dialect.name
+            if dialect_name == "mysql":
+                # MySQL has no ON CONFLICT DO NOTHING
+                statement = table.insert().prefix_with("IGNORE")
+            else:
+                statement = UPSERT_INSERTS[dialect_name](table)
+                statement = statement.on_conflict_do_nothing(index_elements=conflict_on)
+
+            result = conn.execute(statement.values(params))
+            if result.rowcount:
+                instance.set(**{pk_name: result.inserted_primary_key[0]})
+                instance.fill_inserted_values(params)
+            else:
+                key = tuple(params[name] for name in conflict_on)
+                proxy = conn.execute(self.select_conflicting(conflict_on, [key]))
+                existing = self.from_row_data(proxy.keys(), proxy.fetchone())
+
+            transaction.commit()
+        except Exception:
+            transaction.rollback()
+            raise
+        finally:
+            conn.close()
+
+        if existing is not None:
+            return existing
+
+        instance.__dirty__ = None
+        instance.forget_cached(self.engine)
+        instance.post_save(transaction)
+        return instance
+
+    def upsert(self, conflict_on=None, **data):
+        """Inserts a model with the given data or, when a row with the
+        same values of the ``conflict_on`` columns already exists,
+        updates that row with the given data, and returns the model::
+
+          User.objects().upsert(conflict_on='email', email='foo@bar.com', name='Foo')
+
+        ``conflict_on`` is a column name or a tuple of the column
+        names of a unique key, by default the primary key.
+
+        Runs a single ``INSERT ... ON CONFLICT`` on PostgreSQL and
+        SQLite, and ``INSERT ... ON DUPLICATE KEY UPDATE`` on MySQL,
+        see :py:meth:`supports_upsert`, otherwise falls back to
+        :py:meth:`find_one_by` then a save.
+        """
+        conflict_on = self.get_conflict_columns(conflict_on)
+        if self.supports_upsert():
+            return self.upsert_rows([data], conflict_on)[0]
+
+        instance = self.find_one_by(**dict((name, data.get(name)) for name in conflict_on))
+        if not instance:
+            return self.create(**data)
+
+        instance.set(**data)
+        return instance.save()
+
+    def bulk_upsert(self, rows, conflict_on=None, batch_size=500):
+        """Same as :py:meth:`upsert` for many dicts of data at once,
+        ``batch_size`` rows per statement, within a single
+        transaction. Returns the models."""
+        conflict_on = self.get_conflict_columns(conflict_on)
+        if self.supports_upsert():
+            return self.upsert_rows(rows, conflict_on, batch_size=batch_size)
+
+        return [self.upsert(conflict_on, **data) for data in rows]
+
+    def supports_upsert(self):
+        """returns True when the dialect of the engine has an insert
+        with a conflict clause, see :py:data:`UPSERT_INSERTS`"""
+        return self.engine.dialect.name in UPSERT_INSERTS
+
+    def get_conflict_columns(self, conflict_on):
+        """returns the tuple of column names given to the
+        ``conflict_on`` of :py:meth:`upsert`"""
+        if conflict_on is None:
+            return (self.model.get_pk_name(),)
+
+        if isinstance(conflict_on, string_types):
+            conflict_on = (conflict_on,)
+
+        conflict_on = tuple(conflict_on)
+        self.get_columns(conflict_on)
+        return conflict_on
+
+    def get_unique_key(self, data):
+        """returns the column names of the first unique key of the
+        table, i.e. the primary key, a unique constraint or a unique
+        index, with all the values in the given data, if any"""
+        table = self.model.table
+        keys = [table.primary_key.columns]
+        keys.extend(
+            constraint.columns
+            for constraint in table.constraints
+            if isinstance(constraint, db.UniqueConstraint)
+        )
+        keys.extend(index.columns for index in table.indexes if index.unique)
+
+        for columns in keys:
+            names = tuple(column.name for column in columns)
+            if names and all(data.get(name) is not None for name in names):
+                return names
+
+        return None
+
+    def upsert_statement(self, dialect_name, conflict_on, update):
+        """returns the insert of the given dialect that updates the
+        ``update`` columns of the row that conflicts on the
+        ``conflict_on`` columns.
+
+        The conflict columns are set to themselves when there are no
+        columns to update, so that the existing row is still returned.
+        """
+        statement = UPSERT_INSERTS[dialect_name](self.model.table)
+        update = update or conflict_on
+        if dialect_name == "mysql":
+            values = dict((name, statement.inserted[name]) for name in update)
+            return statement.on_duplicate_key_update(**values)
+
+        values = dict((name, statement.excluded[name]) for name in update)
+        return statement.on_conflict_do_update(index_elements=conflict_on, set_=values)
+
+    def select_conflicting(self, conflict_on, keys):
+        """returns a query of the rows with the given tuples of values
+        of the ``conflict_on`` columns"""
+        table = self.model.table
+        columns = self.get_columns(conflict_on)
+        return table.select().where(
+            db.or_(*[
+                db.and_(*[column == value for column, value in zip(columns, key)])
+                for key in keys
+            ])
+        )
+
+    def upsert_rows(self, rows, conflict_on, update=True, batch_size=500):
+        """Upserts the given dicts of data through
+        :py:meth:`upsert_statement`, ``batch_size`` at a time, within a
+        single transaction and returns the models of the rows.
+
+        The rows come back through ``RETURNING`` on dialects that
+        support it, otherwise they are selected by the values of their
+        conflict columns, see :py:meth:`select_conflicting`. The rows
+        without the values of their conflict columns never conflict:
+        they are inserted one at a time, so that they come back by
+        primary key on the other dialects.
+
+        The returned models are the ones that
+        :py:meth:`~chemist.models.Model.pre_save` ran on, updated with
+        the values of their rows before
+        :py:meth:`~chemist.models.Model.post_save`.
+        """
+        table = self.model.table
+        pk_name = self.model.get_pk_name()
+        upserted = []
+
+        conn = self.engine.connect()
+        transaction = conn.begin()
+        try:
+            dialect_name = conn.dialect.name
+            returning = conn.dialect.implicit_returning
+            for batch in chunked(rows, batch_size):
+                # rows that update the same columns share a statement,
+                # the last of the rows with the same conflict values wins
+                groups = OrderedDict()
+                for data in batch:
+                    instance = self.new(**data)
+                    instance.pre_save()
+                    params = instance.to_insert_params()
+                    # the primary key is left to the database on insert
+                    if instance.get_pk_value() is not None:
+                        params[pk_name] = instance.get_pk_value()
+
+                    columns = []
+                    if update:
+                        names = set(instance.to_insert_params(columns=list(data)))
+                        columns = [
+                            name for name in params
+                            if name in names and name not in conflict_on
+                        ]
+
+                    key = tuple(params.get(name) for name in conflict_on)
+                    if None in key:
+                        # never conflicts, e.g. no primary key yet
+                        key = id(params)
+
+                    group = groups.setdefault((tuple(params), tuple(columns)), OrderedDict())
+                    group[key] = (instance, params)
+
+                for (_, columns), group in groups.items():
+                    statement = self.upsert_statement(dialect_name, conflict_on, columns)
+                    keys = [key for key in group if isinstance(key, tuple)]
+                    if keys:
+                        values = [group[key][1] for key in keys]
+                        if returning:
+                            proxy = conn.execute(
+                                statement.values(values).returning(*table.columns)
+                            )
+                        else:
+                            conn.execute(statement.values(values))
+                            proxy = conn.execute(self.select_conflicting(conflict_on, keys))
+
+                        upserted.extend(self.merge_upserted(proxy, conflict_on, group))
+
+                    for key, (instance, params) in group.items():
+                        if isinstance(key, tuple):
+                            continue
+
+                        if returning:
+                            proxy = conn.execute(
+                                statement.values(params).returning(*table.columns)
+                            )
+                        else:
+                            result = conn.execute(statement.values(params))
+                            pk = tuple(result.inserted_primary_key)
+                            proxy = conn.execute(self.select_conflicting((pk_name,), [pk]))
+
+                        upserted.extend(self.merge_upserted(proxy, (), {(): (instance, params)}))
+
+            transaction.commit()
+        except Exception:
+            transaction.rollback()
+            raise
+        finally:
+            conn.close()
+
+        for instance in upserted:
+            instance.forget_cached(self.engine)
+            instance.post_save(transaction)
+
+        return upserted
+
+    def merge_upserted(self, proxy, conflict_on, group):
+        """returns the models of the rows of the given proxy, see
+        :py:meth:`upsert_rows`: the model of the ``group`` with the same
+        values of the ``conflict_on`` columns, updated with the values
+        of its row, or a new model for a row that matches none"""
+        keys = list(proxy.keys())
+        indexes = [keys.index(name) for name in conflict_on]
+        models = []
+        for row in proxy.fetchall():
+            model = self.from_row_data(keys, row)
+            entry = group.get(tuple(row[index] for index in indexes))
+            if entry is not None and entry[0] is not model:
+                instance = entry[0]
+                instance.set(**model.__data__)
+                instance.__dirty__ = None
+                model = instance
+
+            models.append(model)
+
+        return models
+
     def generate_query(self, order_by=None, limit_by=None, offset_by=None, **kw):
         """Queries the table with the given keyword-args and
         optionally a single order_by field."""
-        query = self.model.table.select()
+        query, params = self.prepare_query(
+            order_by=order_by, limit_by=limit_by, offset_by=offset_by, **kw
+        )
+        return query.params(params)
+
+    def prepare_query(
+        self,
+        order_by=None,
+        limit_by=None,
+        offset_by=None,
+        only=None,
+        select=None,
+        **kw
+    ):
+        """Same as :py:meth:`generate_query` but returns a tuple with a
+        statement that has bound parameters in place of the values and
+        the dict of values.
+
+        Selects only the columns named in ``only`` along with the
+        primary key, when given, see :py:meth:`find_by`, or exactly
+        the columns named in ``select``, see :py:meth:`values`.
+
+        Statements are cached per manager class and query shape in the
+        :py:class:`StatementCache` of the manager, so that queries with
+        the same filters, ordering, limit and offset reuse both the
+        statement and its compiled form, see :py:meth:`execute`.
+        """
+        values = {}
         for field, value in kw.items():
-            if callable(value):
-                value = value()
+            values[field] = value() if callable(value) else value
 
-            if hasattr(self.model.table.c, field):
-                query = query.where(getattr(self.model.table.c, field) == value)
-            elif "__" in field:
-                field, modifier = field.split("__", 1)
-                f = getattr(self.model.table.c, field)
-                if modifier == "startswith":
-                    query = query.where(f.startswith(value))
-                elif modifier == "contains":
-                    contains = f.contains(escape_query(value), escape="#")
-                    query = query.where(contains)
-                else:
-                    msg = '"{}" is in invalid query modifier.'.format(modifier)
-                    raise InvalidQueryModifier(msg)
+        has_limit = isinstance(limit_by, (float, int))
+        has_offset = isinstance(offset_by, (float, int))
+        fields = tuple(
+            sorted((field, self.filter_shape(field, value)) for field, value in values.items())
+        )
+        only = tuple(only) if only else None
+        select = tuple(select) if select else None
+        # the class of the manager is part of the shape, the statement
+        # cache is shared by all the managers and subclasses may build
+        # different statements, e.g. by overriding select_all()
+        shape = (type(self), self.model, fields, order_by, has_limit, has_offset, only, select)
+
+        cache = self.statement_cache
+        prepared = cache.statements.get(shape)
+        if prepared is None:
+            prepared = cache.statements[shape] = self.build_query(*shape[2:])
+
+        query, bindings = prepared
+        params = {}
+        for name, field, modifier, part in bindings:
+            if field == "limit_by":
+                params[name] = int(limit_by)
+            elif field == "offset_by":
+                params[name] = int(offset_by)
             else:
-                msg = 'The field "{}" does not exist.'.format(field)
-                raise InvalidColumnName(msg)
+                value = self.filter_value(field, modifier, values[field])
+                params[name] = value if part is None else value[part]
 
-        if isinstance(limit_by, (float, int)):
-            query = query.limit(limit_by)
+        return query, params
+
+    def filter_shape(self, field, value):
+        """returns the part of the query shape of a filter keyword-arg
+        that the values bound to its statement cannot change: whether
+        the value is None, or the boolean of ``isnull``"""
+        if field.endswith("__isnull"):
+            return bool(value)
+
+        return value is None
+
+    def build_query(
+        self, fields, order_by, has_limit, has_offset, only=None, select=None
+    ):
+        """Builds the statement of a query shape of
+        :py:meth:`prepare_query`, returns it along with a list of tuples
+        with the name of each bound parameter, the keyword-arg that
+        it binds and its modifier"""
+        if select:
+            query = db.select(self.get_columns(select))
+        elif only:
+            query = self.select_projection(only)
+        else:
+            query = self.select_all()
+        bindings = []
+        counters = {}
+
+        def bind(prefix, field, modifier=None, part=None, **kw):
+            counters[prefix] = counters.get(prefix, 0) + 1
+            param = db.bindparam("{}_{}".format(prefix, counters[prefix]), **kw)
+            bindings.append((param.key, field, modifier, part))
+            return param
+
+        def bind_anonymous(field):
+            # anonymous like the literal limits that some dialects add
+            param = db.bindparam(None, type_=db.Integer)
+            bindings.append((param.key, field, None, None))
+            return param
 
-        if isinstance(offset_by, (float, int)):
-            query = query.offset(offset_by)
+        for field, flag in fields:
+            column, modifier = self.parse_filter(field)
+            if modifier == "isnull":
+                value = flag
+            elif flag and modifier in (None, "blind_index", "ne"):
+                value = None
+            elif modifier == "in":
+                # expanded into as many parameters as there are values
+                value = bind(column.name, field, modifier, expanding=True)
+            elif modifier == "range":
+                value = (
+                    bind(column.name, field, modifier, 0),
+                    bind(column.name, field, modifier, 1),
+                )
+            else:
+                value = bind(column.name, field, modifier)
+
+            if value is None and modifier != "ne":
+                query = query.where(column.is_(None))
+            else:
+                query = query.where(filter_clause(column, modifier, value))
+
+        if has_limit:
+            query = query.limit(bind_anonymous("limit_by"))
+
+        if has_offset:
+            query = query.offset(bind_anonymous("offset_by"))
 
         # Order the results
-        db_order = db.desc
-        if order_by:
-            if order_by.startswith("+"):
-                order_by = order_by[1:]
-                db_order = db.asc
-            elif order_by.startswith("-"):
-                order_by = order_by[1:]
+        name, descending = self.parse_order_by(order_by)
+        db_order = db.desc if descending else db.asc
+        query = query.order_by(db_order(getattr(self.model.table.c, name)))
 
-        query = query.order_by(
-            db_order(getattr(self.model.table.c, order_by or self.model.get_pk_name()))
-        )
+        return query, bindings
+
+    def parse_order_by(self, order_by):
+        """returns a tuple with the column name and whether the order
+        is descending out of the ``order_by`` of :py:meth:`find_by`,
+        a field name that is descending unless prefixed by ``+``"""
+        if not order_by:
+            return self.model.get_pk_name(), True
+
+        if order_by.startswith("+"):
+            return order_by[1:], False
+
+        if order_by.startswith("-"):
+            return order_by[1:], True
+
+        return order_by, True
+
+    def parse_filter(self, field):
+        """returns a tuple with the column and the modifier of a
+        filter keyword-arg, equality, ``in`` and ``ne`` filters on
+        columns with a blind index match the blind index column"""
+        table = self.model.table
+        blind_indexes = self.model.__blind_indexes__
+        if field in blind_indexes:
+            # encrypted values never match, their blind index does
+            index_name, _ = blind_indexes[field]
+            return getattr(table.c, index_name), "blind_index"
+
+        if hasattr(table.c, field):
+            return getattr(table.c, field), None
+
+        if "__" in field:
+            name, modifier = field.rsplit("__", 1)
+            if modifier not in QUERY_MODIFIERS:
+                msg = '"{}" is in invalid query modifier.'.format(modifier)
+                raise InvalidQueryModifier(msg)
+
+            if name in blind_indexes and modifier in BLIND_INDEX_MODIFIERS:
+                index_name, _ = blind_indexes[name]
+                return getattr(table.c, index_name), modifier
+
+            if name in blind_indexes and modifier != "isnull":
+                msg = '"{}" can not match the encrypted column "{}".'.format(modifier, name)
+                raise InvalidQueryModifier(msg)
+
+            if hasattr(table.c, name):
+                return getattr(table.c, name), modifier
+
+        msg = 'The field "{}" does not exist.'.format(field)
+        raise InvalidColumnName(msg)
+
+    def filter_value(self, field, modifier, value):
+        """returns the value to compare to the column of a filter
+        keyword-arg"""
+        if modifier == "contains":
+            return escape_query(value)
+
+        if modifier == "blind_index":
+            return self.model.get_blind_index_for_attribute(field, value)
+
+        if modifier in BLIND_INDEX_MODIFIERS:
+            name = field.rsplit("__", 1)[0]
+            if name in self.model.__blind_indexes__:
+                index = partial(self.model.get_blind_index_for_attribute, name)
+                return list(map(index, value)) if modifier == "in" else index(value)
+
+        if modifier == "in":
+            return list(value)
+
+        if modifier == "range":
+            low, high = value
+            return low, high
+
+        return value
+
+    def apply_filters(self, query, **kw):
+        """Adds a where clause to the given query for each keyword-arg,
+        the keys are column names optionally followed by a query
+        modifier, i.e.: ``name__startswith``"""
+        for field, value in kw.items():
+            if callable(value):
+                value = value()
+
+            column, modifier = self.parse_filter(field)
+            value = self.filter_value(field, modifier, value)
+            query = query.where(filter_clause(column, modifier, value))
 
         return query
 
     def prepare_where_clause(self, *expressions, **kwargs):
         order_by = kwargs.pop("order_by", None)
+        columns = kwargs.pop("columns", None)
         table = self.model.table
-        query = table.select()
+        if columns:
+            query = self.select_projection(columns)
+        else:
+            query = self.select_all()
         for exp in expressions:
             query = query.where(exp)
 
@@ -119,6 +1049,182 @@ class Manager(object):
 
         return query
 
+    def select_all(self):
+        """returns a select of the columns of the model, except its
+        ``deferred_columns``"""
+        deferred = self.model.__deferred__
+        if not deferred:
+            return self.model.table.select()
+
+        names = [c.name for c in self.model.table.columns if c.name not in deferred]
+        return self.select_projection(names)
+
+    def select_projection(self, names):
+        """returns a select of the columns with the given names, see
+        :py:meth:`get_projection`, the models that it loads have the
+        other columns marked as unloaded"""
+        query = db.select(self.get_projection(names))
+        return query.execution_options(projection=True)
+
+    def get_projection(self, names):
+        """returns the columns of the table with the given names, led
+        by the primary key, that models loaded with only some of
+        their columns need in order to fetch the others"""
+        pk_name = self.model.get_pk_name()
+        names = [pk_name] + [name for name in names if name != pk_name]
+        return self.get_columns(names)
+
+    def get_columns(self, names):
+        """returns the columns of the table with the given names"""
+        table = self.model.table
+        columns = []
+        for name in names:
+            if not hasattr(table.c, name):
+                msg = 'The field "{}" does not exist.'.format(name)
+                raise InvalidColumnName(msg)
+
+            columns.append(getattr(table.c, name))
+
+        return columns
+
+    def fetch_columns(self, pk, names):
+        """returns a dict with the raw values of the given columns of
+        the row with the given primary key, see
+        :py:meth:`~chemist.models.Model.fetch_columns`"""
+        table = self.model.table
+        query = db.select([getattr(table.c, name) for name in names]).where(
+            getattr(table.c, self.model.get_pk_name()) == pk
+        )
+        row = self.execute(query).fetchone()
+        if row is None:
+            raise RecordNotFound(
+                "{} {} no longer exists, its columns {} were not loaded".format(
+                    self.model.__name__, pk, ", ".join(names)
+                )
+            )
+
+        return dict(zip(names, row))
+
+    def undefer(self, models, *names):
+        """Fetches the given unloaded columns, by default the
+        ``deferred_columns`` of the model, of all the given models at
+        once, with an ``IN`` query per chunk of primary keys, rather
+        than a query per model on first access::
+
+          posts = Post.find_by(author_id=1)
+          Post.undefer(posts, 'body')
+        """
+        names = sorted(names or self.model.__deferred__)
+        table = self.model.table
+        pk_name = self.model.get_pk_name()
+        pk = getattr(table.c, pk_name)
+        columns = [getattr(table.c, name) for name in names]
+
+        by_pk = {}
+        for model in models:
+            if model.unloaded_columns.intersection(names):
+                by_pk.setdefault(model.get_pk_value(), []).append(model)
+
+        for pks in chunked(list(by_pk), self.stream_batch_size):
+            query = db.select([pk] + columns).where(pk.in_(pks))
+            for row in self.execute(query).fetchall():
+                raw = dict(zip(names, row[1:]))
+                for model in by_pk[row[0]]:
+                    fill_unloaded(model, raw)
+
+        return models
+
+    def parse_ordering(self, order_by):
+        """returns a list of ``(column, descending)`` tuples out of an
+        ``order_by`` declared either as a field name optionally
+        prefixed by ``+`` or ``-`` (like in :py:meth:`generate_query`)
+        or as a tuple of columns optionally wrapped in asc/desc
+        modifiers (like in :py:meth:`prepare_where_clause`)"""
+        if order_by is None:
+            order_by = ()
+        elif not isinstance(order_by, (tuple, list)):
+            order_by = (order_by,)
+
+        table = self.model.table
+        ordering = []
+        for item in order_by:
+            descending = False
+            if isinstance(item, string_types):
+                descending = not item.startswith("+")
+                name = item.lstrip("+-")
+                if not hasattr(table.c, name):
+                    msg = 'The field "{}" does not exist.'.format(name)
+                    raise InvalidColumnName(msg)
+                item = getattr(table.c, name)
+
+            elif getattr(item, "modifier", None) in (operators.asc_op, operators.desc_op):
+                descending = item.modifier is operators.desc_op
+                item = item.element
+
+            ordering.append((item, descending))
+
+        return ordering
+
+    def paginate(self, after=None, order_by=None, size=100, **filters):
+        """Returns a :py:class:`Page` of up to ``size`` models matching
+        the given filters, which accept the same keyword-args as
+        :py:meth:`find_by`.
+
+        Uses keyset pagination: the ``cursor`` of the returned page
+        is passed as ``after=`` to retrieve the next page, which
+        seeks right past the last row of the previous one instead of
+        skipping rows with OFFSET, so that deep pages cost the same
+        as the first one.
+
+        The primary key is appended to the ordering as a tie-breaker
+        when missing, ordering columns are expected to be NOT NULL.
+
+        ::
+
+          page = User.objects().paginate(order_by='-id', size=50)
+          while page.has_next:
+              page = User.objects().paginate(after=page.cursor, order_by='-id', size=50)
+        """
+        ordering = self.parse_ordering(order_by)
+        pk = getattr(self.model.table.c, self.model.get_pk_name())
+        if not any(column is pk for column, _ in ordering):
+            descending = ordering[-1][1] if ordering else True
+            ordering.append((pk, descending))
+
+        columns = [column for column, _ in ordering]
+        query = self.apply_filters(self.select_all(), **filters)
+
+        if after:
+            values = decode_cursor(after, columns)
+            seek = []
+            for i, (column, descending) in enumerate(ordering):
+                clauses = [c == v for c, v in zip(columns[:i], values[:i])]
+                if descending:
+                    clauses.append(column < values[i])
+                else:
+                    clauses.append(column > values[i])
+                seek.append(db.and_(*clauses))
+
+            query = query.where(db.or_(*seek))
+
+        query = query.order_by(
+            *[db.desc(c) if descending else db.asc(c) for c, descending in ordering]
+        )
+        query = query.limit(size + 1)
+
+        # fetched before the connection returns to the pool, which
+        # closes it on dialects with a NullPool, e.g. file-backed SQLite
+        with self.connection() as conn:
+            proxy = self.execute_with(conn, query, None)
+            rows = proxy.fetchall()
+
+        cursor = None
+        if len(rows) > size:
+            rows = rows[:size]
+            cursor = encode_cursor(columns, [rows[-1][c] for c in columns])
+
+        return Page([self.from_result_proxy(proxy, row) for row in rows], cursor)
+
     def where_many(self, *expressions, **kwargs):
         query = self.prepare_where_clause(*expressions, **kwargs)
         return self.many_from_query(query)
@@ -127,63 +1233,632 @@ class Manager(object):
         query = self.prepare_where_clause(*expressions, **kwargs)
         return self.one_from_query(query)
 
+    def where_iter(self, *expressions, **kwargs):
+        """Same as :py:meth:`where_many` but returns a generator that
+        streams the models, see :py:meth:`iter_from_query`.
+
+        Takes an optional ``batch_size=`` keyword-argument."""
+        batch_size = kwargs.pop("batch_size", None)
+        query = self.prepare_where_clause(*expressions, **kwargs)
+        return self.iter_from_query(query, batch_size=batch_size)
+
     def query_by(self, **kwargs):
         """This method is used internally and is not consistent with the other
         ORM methods by not returning a model instance."""
-        query = self.generate_query(**kwargs)
-        return self.query(query)
+        query, params = self.prepare_query(**kwargs)
+        return self.execute(query, params)
 
     def query(self, query):
+        return self.execute(query)
+
+    def execute(self, query, params=None):
+        """Executes the given query in its own transaction, or through
+        the connection of the :py:meth:`~chemist.orm.Context.session`
+        active in the current thread.
+
+        Statements executed with ``params``, i.e. prepared by
+        :py:meth:`prepare_query`, are compiled once per dialect.
+        """
+        session = get_current_session()
+        if session is not None:
+            conn = session.connection_for(self.engine)
+            return self.execute_with(conn, query, params)
+
         with self.engine.begin() as conn:
-            proxy = conn.execute(query)
+            proxy = self.execute_with(conn, query, params)
 
         return proxy
 
-    def many_from_query(self, query):
+    @contextmanager
+    def connection(self):
+        """yields the connection of the
+        :py:meth:`~chemist.orm.Context.session` active in the current
+        thread, or a new connection within a transaction"""
+        session = get_current_session()
+        if session is not None:
+            yield session.connection_for(self.engine)
+            return
+
         with self.engine.begin() as conn:
-            proxy = conn.execute(query)
+            yield conn
+
+    def get_in_chunk_size(self):
+        """returns the largest number of values bound by a single
+        ``__in`` filter for the dialect of the engine, see
+        :py:attr:`in_chunk_sizes`"""
+        name = self.engine.dialect.name
+        return self.in_chunk_sizes.get(name, self.default_in_chunk_size)
+
+    def split_in_filter(self, kw):
+        """returns a tuple with the names of the ``__in`` filters of the
+        given keyword-args of :py:meth:`find_by` that have more values
+        than :py:meth:`get_in_chunk_size` and a list of tuples with one
+        chunk of the distinct values of each, covering every combination
+        of their chunks, or None when all the ``__in`` filters fit in a
+        single query"""
+        names = [key for key in kw if key.endswith("__in")]
+        if not names:
+            return None
+
+        for key in names:
+            if callable(kw[key]):
+                kw[key] = kw[key]()
+
+        size = self.get_in_chunk_size()
+        fields = [key for key in names if len(kw[key]) > size]
+        if not fields:
+            return None
+
+        # a row matches a single value of each filter, hence a single
+        # combination, so that the rows of the combinations are disjoint
+        chunks = [list(chunked(list(OrderedDict.fromkeys(kw[f])), size)) for f in fields]
+        return tuple(fields), list(itertools.product(*chunks))
+
+    def query_chunks(self, kw, fields, chunks):
+        """Runs the query of the given keyword-args of
+        :py:meth:`find_by` once per combination of the chunks of the
+        values of the ``__in`` filters ``fields``, see
+        :py:meth:`split_in_filter`, over a single connection.
+
+        Returns a tuple with the column names, the rows merged in the
+        requested order and sliced by the requested limit and offset,
+        and whether they are the rows of a projection.
+        """
+        kw = dict(kw)
+        limit_by = kw.pop("limit_by", None)
+        offset_by = kw.pop("offset_by", None)
+        offset = int(offset_by) if isinstance(offset_by, (float, int)) else 0
+        end = None
+        if isinstance(limit_by, (float, int)):
+            end = offset + int(limit_by)
+
+        # the rows of the chunks are merged by the ordering column
+        name, descending = self.parse_order_by(kw.get("order_by"))
+        only = kw.get("only")
+        if only and name not in only and name != self.model.get_pk_name():
+            kw["only"] = tuple(only) + (name,)
+
+        select = kw.get("select")
+        extra = bool(select) and name not in select
+        if extra:
+            kw["select"] = tuple(select) + (name,)
+
+        rows = []
+        with self.connection() as conn:
+            for chunk in chunks:
+                kw.update(zip(fields, chunk))
+                query, params = self.prepare_query(limit_by=end, **kw)
+                proxy = self.execute_with(conn, query, params)
+                rows.extend(proxy.fetchall())
+
+        keys = list(proxy.keys())
+        index = keys.index(name)
+        rows.sort(key=lambda row: (row[index] is not None, row[index]), reverse=descending)
+        rows = rows[offset:end]
+        if extra:
+            del keys[index]
+            rows = [tuple(row[:index]) + tuple(row[index + 1:]) for row in rows]
+
+        return keys, rows, is_projection(proxy)
+
+    def execute_with(self, conn, query, params):
+        if params is None:
+            return conn.execute(query)
+
+        conn = conn.execution_options(compiled_cache=self.statement_cache.compiled)
+        return conn.execute(query, params)
+
+    def many_from_query(self, query):
+        proxy = self.execute(query)
         return self.many_from_result_proxy(proxy)
 
     def one_from_query(self, query):
-        with self.engine.begin() as conn:
-            proxy = conn.execute(query)
+        proxy = self.execute(query)
         return self.from_result_proxy(proxy, proxy.fetchone())
 
+    def iter_from_query(self, query, batch_size=None):
+        """Executes the given query with a server-side cursor, where
+        the dialect supports it, and yields model instances while
+        fetching the rows ``batch_size`` at a time.
+
+        A single connection is held for the whole iteration and
+        released once the generator is exhausted or closed, so that
+        walking very large tables keeps a bounded memory footprint.
+        """
+        batch_size = batch_size or self.stream_batch_size
+        with self.engine.connect() as conn:
+            proxy = conn.execution_options(stream_results=True).execute(query)
+            try:
+                while True:
+                    rows = proxy.fetchmany(batch_size)
+                    if not rows:
+                        break
+
+                    if self.uses_batch_crypto():
+                        models = self.many_from_rows(
+                            proxy.keys(), rows, is_projection(proxy)
+                        )
+                        for instance in models:
+                            yield instance
+
+                        continue
+
+                    for row in rows:
+                        yield self.from_result_proxy(proxy, row)
+            finally:
+                proxy.close()
+
     def find_one_by(self, **kw):
         """Find a single model that could be found in the database and
-        match all the given keyword-arguments"""
+        match all the given keyword-arguments.
+
+        Lookups by primary key alone go through the
+        :py:attr:`~chemist.models.Model.identity_cache` of the model,
+        when declared."""
+        if len(kw) == 1 and self.model.identity_cache is not None:
+            pk_name = self.model.get_pk_name()
+            if pk_name in kw:
+                return self.find_cached(kw[pk_name])
+
+        split = self.split_in_filter(kw)
+        if split is not None:
+            kw["limit_by"] = 1
+            models = self.find_chunks(kw, *split)
+            return models[0] if models else None
+
         proxy = self.query_by(**kw)
         return self.from_result_proxy(proxy, proxy.fetchone())
 
+    def find_cached(self, pk):
+        """Finds a model by primary key, reading through the
+        :py:attr:`~chemist.models.Model.identity_cache` of the model,
+        which keeps the raw rows rather than the model instances so
+        that each call returns a new instance"""
+        if callable(pk):
+            pk = pk()
+
+        cache = self.model.identity_cache
+        key = self.model.get_identity_cache_key(pk, self.engine)
+        entry = cache.get(key)
+        if entry is not None:
+            keys, row = entry
+            # cached rows lack the deferred columns of the model
+            return self.from_row_data(keys, row, bool(self.model.__deferred__))
+
+        proxy = self.query_by(**{self.model.get_pk_name(): pk})
+        row = proxy.fetchone()
+        if not row:
+            return None
+
+        keys = list(proxy.keys())
+        cache.set(key, (keys, tuple(row)))
+        return self.from_row_data(keys, row, is_projection(proxy))
+
     def find_by(self, **kw):
         """Find a list of models that could be found in the database
-        and match all the given keyword-arguments"""
+        and match all the given keyword-arguments.
+
+        Takes an optional ``only=`` tuple of column names to select
+        along with the primary key, the other columns are fetched by
+        primary key the first time one of them is accessed::
+
+          User.find_by(only=('email',), active=True)
+
+        ``__in`` filters with more values than
+        :py:meth:`get_in_chunk_size` are queried in chunks, see
+        :py:meth:`query_chunks`.
+        """
+        split = self.split_in_filter(kw)
+        if split is not None:
+            return self.find_chunks(kw, *split)
+
         proxy = self.query_by(**kw)
         Models = partial(self.from_result_proxy, proxy)
         return list(map(Models, proxy.fetchall()))
 
-    def all(self, limit_by=None, offset_by=None, order_by=None):
-        """Returns all existing rows as Model"""
+    def find_chunks(self, kw, fields, chunks):
+        keys, rows, projection = self.query_chunks(kw, fields, chunks)
+        projection = projection and len(keys) < len(self.model.__columns__)
+        return [self.from_row_data(keys, row, projection) for row in rows]
+
+    def all(self, limit_by=None, offset_by=None, order_by=None, **kw):
+        """Returns all existing rows as Model, takes the same
+        ``only=`` keyword-argument as :py:meth:`find_by`"""
         return self.find_by(
             limit_by=limit_by,
             offset_by=offset_by,
             order_by=order_by,
+            **kw
         )
 
+    def iter_by(self, batch_size=None, **kw):
+        """Same as :py:meth:`find_by` but returns a generator that
+        streams the models, see :py:meth:`iter_from_query`"""
+        query = self.generate_query(**kw)
+        return self.iter_from_query(query, batch_size=batch_size)
+
+    def iter_all(self, batch_size=None, order_by=None):
+        """Streams all existing rows as Model, see :py:meth:`iter_from_query`"""
+        return self.iter_by(batch_size=batch_size, order_by=order_by)
+
+    def values(self, *names, **kw):
+        """Returns a list of dicts with the values of the given columns,
+        by default all but the ``deferred_columns``, of the rows that
+        match the given keyword-arguments, which are the same as
+        :py:meth:`find_by`.
+
+        Skips the models altogether: the values are the ones of the
+        result proxy, only decrypted. Returns a generator that streams
+        the rows, like :py:meth:`iter_by`, with ``stream=True``::
+
+          User.objects().values('id', 'email', active=True)
+        """
+        names, rows = self.query_values(names, kw)
+        rows = (dict(zip(names, row)) for row in rows)
+        return rows if kw.get("stream") else list(rows)
+
+    def values_list(self, *names, **kw):
+        """Same as :py:meth:`values` but returns tuples, or the values
+        themselves with ``flat=True`` and a single column::
+
+          User.objects().values_list('id', flat=True, active=True)
+        """
+        flat = kw.pop("flat", False)
+        if flat and len(names) != 1:
+            raise TypeError("values_list(flat=True) takes a single column name")
+
+        names, rows = self.query_values(names, kw)
+        if flat:
+            rows = (row[0] for row in rows)
+        else:
+            rows = (tuple(row) for row in rows)
+
+        return rows if kw.get("stream") else list(rows)
+
+    def query_values(self, names, kw):
+        """returns a tuple with the names of the selected columns and
+        an iterator of the rows of :py:meth:`values`, with their
+        encrypted values decrypted"""
+        kw = dict(kw)
+        stream = kw.pop("stream", False)
+        batch_size = kw.pop("batch_size", None)
+        if not names:
+            deferred = self.model.__deferred__
+            names = [c.name for c in self.model.table.columns if c.name not in deferred]
+
+        split = self.split_in_filter(kw)
+        if split is not None:
+            rows = self.query_chunks(dict(kw, select=names), *split)[1]
+        elif stream:
+            query, params = self.prepare_query(select=names, **kw)
+            rows = self.iter_rows(query.params(params), batch_size)
+        else:
+            query, params = self.prepare_query(select=names, **kw)
+            rows = self.execute(query, params).fetchall()
+
+        keys = self.model.__encryption_keys__
+        encrypted = [(i, name) for i, name in enumerate(names) if name in keys]
+        if encrypted:
+            rows = self.decrypt_values(rows, encrypted)
+
+        return names, rows
+
+    def decrypt_values(self, rows, encrypted):
+        decrypt = self.model.__new__(self.model).decrypt_attribute
+        for row in rows:
+            row = list(row)
+            for i, name in encrypted:
+                row[i] = decrypt(name, row[i])
+
+            yield row
+
+    def iter_rows(self, query, batch_size=None):
+        """Same as :py:meth:`iter_from_query` but yields the rows"""
+        batch_size = batch_size or self.stream_batch_size
+        with self.engine.connect() as conn:
+            proxy = conn.execution_options(stream_results=True).execute(query)
+            try:
+                while True:
+                    rows = proxy.fetchmany(batch_size)
+                    if not rows:
+                        break
+
+                    for row in rows:
+                        yield row
+            finally:
+                proxy.close()
+
+    def aggregate(self, aggregates, group_by=None, **filters):
+        """Computes aggregates in SQL over the rows that match the given
+        keyword-arguments, which are the same as :py:meth:`find_by`.
+
+        ``aggregates`` maps labels to either ``"count"`` or a tuple of
+        an aggregate function, one of ``count``, ``sum``, ``avg``,
+        ``min`` or ``max``, and a column name.
+
+        Returns a dict of the aggregates, or a list of dicts with the
+        ``group_by`` columns and their aggregates ordered by the
+        ``group_by`` columns. Decimals are formatted like in
+        :py:meth:`~chemist.models.Model.to_dict`::
+
+          Payment.objects().aggregate(
+              {'total': ('sum', 'amount'), 'payments': 'count'},
+              group_by='user_id',
+              status='paid',
+          )
+          [{'user_id': 1, 'total': '30.00', 'payments': 3}, ...]
+        """
+        if isinstance(group_by, string_types):
+            group_by = (group_by,)
+
+        group_columns = self.get_columns(group_by or ())
+        labels = sorted(aggregates)
+        selected = list(group_columns) + [
+            self.aggregate_expression(aggregates[label]).label(label) for label in labels
+        ]
+
+        query = db.select(selected).select_from(self.model.table)
+        query = self.apply_filters(query, **filters)
+        if group_columns:
+            query = query.group_by(*group_columns).order_by(*group_columns)
+
+        names = [column.name for column in group_columns] + labels
+        rows = [
+            dict(zip(names, map(format_aggregate, row)))
+            for row in self.execute(query).fetchall()
+        ]
+        if group_columns:
+            return rows
+
+        return rows[0]
+
+    def aggregate_expression(self, spec):
+        if spec == "count":
+            return db.func.count()
+
+        function, name = spec
+        if function not in AGGREGATES:
+            msg = '"{}" is not an aggregate function.'.format(function)
+            raise InvalidQueryModifier(msg)
+
+        column, = self.get_columns([name])
+        return AGGREGATES[function](column)
+
+    def aggregate_by(self, function, field_name, group_by=None, **filters):
+        """computes a single aggregate, returns its value or a dict of
+        the values per ``group_by`` value, a tuple of values when
+        grouping by many columns"""
+        spec = (function, field_name) if field_name else function
+        result = self.aggregate({"value": spec}, group_by=group_by, **filters)
+        if group_by is None:
+            return result["value"]
+
+        keys = [group_by] if isinstance(group_by, string_types) else list(group_by)
+        if len(keys) == 1:
+            return dict((row[keys[0]], row["value"]) for row in result)
+
+        return dict((tuple(row[key] for key in keys), row["value"]) for row in result)
+
+    def count(self, field_name=None, group_by=None, **filters):
+        """Counts the rows, or the non-null values of the given column,
+        that match the given keyword-arguments, see
+        :py:meth:`aggregate_by`::
+
+          Payment.objects().count(group_by='user_id', status='paid')
+          {1: 3, 2: 5}
+        """
+        return self.aggregate_by("count", field_name, group_by, **filters)
+
+    def sum(self, field_name, group_by=None, **filters):
+        """Sums the values of the given column, see :py:meth:`count`"""
+        return self.aggregate_by("sum", field_name, group_by, **filters)
+
+    def avg(self, field_name, group_by=None, **filters):
+        """Averages the values of the given column, see :py:meth:`count`"""
+        return self.aggregate_by("avg", field_name, group_by, **filters)
+
+    def min(self, field_name, group_by=None, **filters):
+        """Returns the lowest value of the given column, see :py:meth:`count`"""
+        return self.aggregate_by("min", field_name, group_by, **filters)
+
+    def max(self, field_name, group_by=None, **filters):
+        """Returns the highest value of the given column, see :py:meth:`count`"""
+        return self.aggregate_by("max", field_name, group_by, **filters)
+
     def total_rows(self, field_name=None, **where):
-        """Gets the total number of rows in the table"""
+        """Gets the total number of rows in the table, optionally
+        matching the given keyword-arguments, which are the same as
+        :py:meth:`find_by`"""
         field_name = field_name or self.model.get_pk_name()
-        query = self.model.table.count()
+        split = self.split_in_filter(where)
+        if split is not None:
+            fields, chunks = split
+            total = 0
+            with self.connection() as conn:
+                for chunk in chunks:
+                    where.update(zip(fields, chunk))
+                    query = self.apply_filters(self.model.table.count(), **where)
+                    total += conn.execute(query).scalar()
 
-        for key, value in where.items():
-            field = getattr(self.model.table.c, key, sentinel)
-            if field is not sentinel:
-                query = query.where(field == value)
+            return total
 
-        with self.engine.begin() as conn:
-            proxy = conn.execute(query)
+        query = self.apply_filters(self.model.table.count(), **where)
 
+        proxy = self.execute(query)
         return proxy.scalar()
 
     def get_connection(self):
         return self.engine.connect()
+
+    def rotate_encryption(
+        self, attr, old_key, new_key, chunk_size=500, workers=0, checkpoint=None
+    ):
+        """Re-encrypts the column ``attr`` from ``old_key`` to
+        ``new_key`` in place.
+
+        The table is walked by primary key ``chunk_size`` rows at a
+        time. Each chunk is re-encrypted, optionally on ``workers``
+        threads, and written with a single ``executemany`` UPDATE in
+        its own transaction, so the rotation can run while the
+        application keeps serving.
+
+        When ``checkpoint`` is the path of a file, the last rotated
+        primary key is saved there after each chunk and an interrupted
+        rotation resumes from it. The file is removed once the rotation
+        completes. Values that were not encrypted with
+        ``old_key`` are left alone, so running it again is harmless.
+
+        Models declared with ``encryption_envelope = True`` can keep
+        reading rows during the rotation by declaring the old key in
+        ``previous_encryption_keys``.
+
+        Each UPDATE only applies while the column still holds the value
+        that was read, so rows written by the application in between
+        are left as they are, and are not counted as rotated.
+
+        Returns a :py:class:`RotationReport`, which is also logged
+        after each chunk.
+
+        ::
+
+          report = User.rotate_encryption(
+              'credit_card', OLD_KEY, NEW_KEY,
+              chunk_size=1000, workers=4,
+              checkpoint='/var/tmp/rotate-credit-card.json',
+          )
+        """
+        table = self.model.table
+        pk_name = self.model.get_pk_name()
+        pk = getattr(table.c, pk_name)
+        column = getattr(table.c, attr, None)
+        if column is None:
+            raise InvalidColumnName(
+                "{} is not a valid column name for the model {}".format(
+                    attr, self.model.__name__
+                )
+            )
+
+        rotation = KeyRotation(old_key, new_key, self.model.encryption_envelope)
+        update = (
+            table.update()
+            .where(db.and_(pk == db.bindparam("_pk"), column == db.bindparam("_old")))
+            .values({attr: db.bindparam("_value")})
+        )
+        report = RotationReport(read_checkpoint(checkpoint))
+        while True:
+            query = db.select([pk, column]).order_by(pk).limit(chunk_size)
+            if report.last is not None:
+                query = query.where(pk > report.last)
+
+            with self.engine.begin() as conn:
+                rows = conn.execute(query).fetchall()
+                values = rotation.rotate_many([row[attr] for row in rows], workers)
+                params = [
+                    {"_pk": row[pk_name], "_old": row[attr], "_value": value}
+                    for row, value in zip(rows, values)
+                    if value is not None
+                ]
+                rotated = count_updated(conn, update, params)
+
+            if rotated:
+                self.model.clear_identity_cache()
+
+            if not rows:
+                remove_checkpoint(checkpoint)
+                return report
+
+            report.add(len(rows), rotated, rows[-1][pk_name])
+            write_checkpoint(checkpoint, report.last)
+            logger.info("rotating %s.%s: %r", self.model.__name__, attr, report)
+
+            if len(rows) < chunk_size:
+                remove_checkpoint(checkpoint)
+                return report
+
+    def seal_legacy_ciphertexts(self, chunk_size=500):
+        """Rewrites the values of the encrypted columns that were
+        written before the model declared ``encryption_envelope =
+        True`` so that they are sealed in the versioned envelope of
+        :py:mod:`chemist.encryption`.
+
+        Rows are read and updated ``chunk_size`` at a time, walking
+        the primary key, one transaction per chunk. Values that are
+        already sealed or that can not be decrypted with the current
+        key are left untouched, and so are the rows whose values
+        changed since they were read.
+
+        Returns the number of updated rows.
+        """
+        if not self.model.encryption_envelope:
+            raise InvalidModelDeclaration(
+                "{} must declare encryption_envelope = True".format(self.model.__name__)
+            )
+
+        table = self.model.table
+        pk_name = self.model.get_pk_name()
+        pk = getattr(table.c, pk_name)
+
+        # a bare instance to reach the encryption methods of the model
+        sealer = self.model.__new__(self.model)
+        names = [name for name in self.model.__encryption_keys__ if name in table.c]
+        if not names:
+            return 0
+
+        columns = [getattr(table.c, name) for name in names]
+        updated = 0
+        last = None
+        while True:
+            query = db.select([pk] + columns).order_by(pk).limit(chunk_size)
+            if last is not None:
+                query = query.where(pk > last)
+
+            with self.engine.begin() as conn:
+                rows = conn.execute(query).fetchall()
+
+                for row in rows:
+                    values = {}
+                    for name in names:
+                        value = row[name]
+                        if value is None or is_sealed(value):
+                            continue
+
+                        box = sealer.get_encryption_box_for_attribute(name)
+                        try:
+                            plaintext = box.decrypt(value)
+                        except (CryptoError, TypeError):
+                            continue
+
+                        values[name] = sealer.encrypt_attribute(name, plaintext)
+
+                    if values:
+                        # only while the values are still the ones read
+                        guard = [pk == row[pk_name]]
+                        guard.extend(getattr(table.c, name) == row[name] for name in values)
+                        update = table.update().where(db.and_(*guard)).values(**values)
+                        updated += conn.execute(update).rowcount
+
+            self.model.clear_identity_cache()
+            if len(rows) < chunk_size:
+                return updated
+
+            last = rows[-1][pk_name]
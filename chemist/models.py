@@ -1,30 +1,38 @@
 # -*- coding: utf-8 -*-
-from six.moves import builtins as __builtin__
 from six import PY2
 
 import re
 
 import nacl.secret
 import nacl.utils
-import inspect
 import datetime
 import logging
-from decimal import Decimal
 from collections import OrderedDict
 from six import with_metaclass
 import dateutil.parser
 
 from chemist.orm import ORM
-from chemist.orm import get_engine
-from chemist.orm import format_decimal
+from chemist.orm import default_context
+from chemist.orm import LazyData
+from chemist.orm import ModelShortcut
+from chemist.orm import get_unloaded_columns
+from chemist.orm import missing
+from chemist.orm import pending
 
 from chemist.managers import Manager
+from chemist.session import get_current_session
+from chemist.encryption import KeyProvider
+from chemist.encryption import get_blind_index
+from chemist.encryption import get_key_id
+from chemist.encryption import is_sealed
+from chemist.encryption import seal
+from chemist.encryption import unseal
 from chemist.serializers import json
-from chemist.exceptions import FieldTypeValueError
 from chemist.exceptions import MultipleEnginesSpecified
 from chemist.exceptions import EngineNotSpecified
 from chemist.exceptions import InvalidColumnName
 from chemist.exceptions import InvalidModelDeclaration
+from chemist.exceptions import UnknownEncryptionKey
 
 
 logger = logging.getLogger(__name__)
@@ -70,21 +78,63 @@ class Model(with_metaclass(ORM, object)):
 
     manager = Manager
 
-    @classmethod
-    def using(cls, engine=None):
-        if engine is None:
-            engine = get_engine()
+    # keep the column values in a fixed-order array rather than in a
+    # dict, and the bookkeeping attributes in __slots__, see
+    # :py:class:`~chemist.orm.CompactData`
+    compact_storage = False
+
+    # models loaded from the database wrap the raw row and decrypt,
+    # deserialize and memoize each column on first access, see
+    # :py:meth:`Model.from_row`
+    lazy_hydration = False
+
+    __slots__ = ()
+
+    # write encrypted values in the versioned envelope of
+    # :py:mod:`chemist.encryption` so that only those are decrypted
+    encryption_envelope = False
+
+    # keys that sealed values might still be encrypted with while
+    # :py:meth:`~chemist.managers.Manager.rotate_encryption` runs,
+    # e.g. ``{'credit_card': [OLD_KEY]}``
+    previous_encryption_keys = {}
 
-        elif isinstance(engine, string_types):
-            engine = get_engine(uri=engine)
+    # keyed HMACs of the plaintext of encrypted columns, stored in
+    # sibling columns on save so that equality filters can match them,
+    # e.g. ``{'credit_card': ('credit_card_index', BLIND_INDEX_KEY)}``
+    blind_indexes = {}
 
-        return cls.manager(cls, engine)
+    # large columns that queries leave out unless selected explicitly,
+    # fetched by primary key on first access or in bulk with
+    # :py:meth:`~chemist.managers.Manager.undefer`, e.g. ``('body',)``
+    deferred_columns = ()
+
+    # optional :py:class:`~chemist.cache.CacheBackend` of the rows
+    # found by primary key, see :py:meth:`Manager.find_cached`
+    identity_cache = None
+
+    # computed by the ORM metaclass for each model class
+    __encryption_keys__ = {}
+    __encryption_boxes__ = {}
+    __encryption_key_ids__ = {}
+    __blind_indexes__ = {}
+    __deferred__ = frozenset()
+
+    @classmethod
+    def using(cls, engine=None):
+        """returns the manager of the model for the given engine or uri,
+        cached per engine and shared by all the callers, see
+        :py:meth:`~chemist.orm.Context.get_manager`"""
+        return default_context.get_manager(cls, engine)
 
     @classmethod
     def objects(cls):
         return cls.using(None)
 
     create = classmethod(lambda cls, **data: cls.using(None).create(**data))
+    bulk_create = ModelShortcut(
+        lambda cls, items, **kw: cls.using(None).bulk_create(items, **kw)
+    )
     get_or_create = classmethod(
         lambda cls, **data: cls.using(None).get_or_create(**data)
     )
@@ -110,6 +160,31 @@ class Model(with_metaclass(ORM, object)):
     where_one = classmethod(
         lambda cls, *args, **kw: cls.using(None).where_one(*args, **kw)
     )
+    # a ModelShortcut gives way to a column with the same name, the
+    # manager method is then still reachable through ``objects()``
+    where_iter = ModelShortcut(
+        lambda cls, *args, **kw: cls.using(None).where_iter(*args, **kw)
+    )
+    iter_by = ModelShortcut(lambda cls, **kw: cls.using(None).iter_by(**kw))
+    values = ModelShortcut(lambda cls, *args, **kw: cls.using(None).values(*args, **kw))
+    aggregate = ModelShortcut(
+        lambda cls, *args, **kw: cls.using(None).aggregate(*args, **kw)
+    )
+    values_list = ModelShortcut(
+        lambda cls, *args, **kw: cls.using(None).values_list(*args, **kw)
+    )
+    paginate = ModelShortcut(lambda cls, **kw: cls.using(None).paginate(**kw))
+    iter_all = ModelShortcut(lambda cls, **kw: cls.using(None).iter_all(**kw))
+    find_cached = ModelShortcut(lambda cls, pk: cls.using(None).find_cached(pk))
+    seal_legacy_ciphertexts = ModelShortcut(
+        lambda cls, **kw: cls.using(None).seal_legacy_ciphertexts(**kw)
+    )
+    undefer = ModelShortcut(
+        lambda cls, models, *names: cls.using(None).undefer(models, *names)
+    )
+    rotate_encryption = ModelShortcut(
+        lambda cls, *args, **kw: cls.using(None).rotate_encryption(*args, **kw)
+    )
 
     def __init__(self, engine=None, **data):
         """A Model can be instantiated with keyword-arguments that
@@ -148,6 +223,7 @@ class Model(with_metaclass(ORM, object)):
             )
 
         self.__data__ = preprocessed_data
+        self.__dirty__ = None
 
         self.engine = engine
 
@@ -163,8 +239,48 @@ class Model(with_metaclass(ORM, object)):
 
             setattr(self, k, v)
 
+        # new models are entirely dirty, including the data that
+        # preprocess might have derived
+        self.__dirty__ = set(self.__data__)
         self.initialize()
 
+    @classmethod
+    def from_row(cls, engine, keys, row):
+        """Creates a model instance that wraps the given row of a
+        :py:class:`sqlalchemy.engine.ResultProxy` without hydrating
+        it: each column is decrypted and deserialized the first time
+        it is accessed.
+
+        Used by :py:meth:`~chemist.managers.Manager.from_result_proxy`
+        for models declared with ``lazy_hydration = True``, unless
+        they implement :py:meth:`~Model.preprocess`, which needs the
+        whole data at once.
+        """
+        columns = cls.__columns__
+        for key in keys:
+            if key not in columns:
+                msg = "{0} is not a valid column name for the model {2}.{1} ({3})"
+                raise InvalidColumnName(
+                    msg.format(key, cls.__name__, cls.__module__, sorted(columns.keys()))
+                )
+
+        instance = cls.__new__(cls)
+        instance.engine = engine
+        instance.__dirty__ = None
+        if cls.compact_storage:
+            index = cls.__column_index__
+            values = [missing] * len(index)
+            for key in keys:
+                values[index[key]] = pending
+
+            instance.__values__ = values
+            instance.__row__ = row
+        else:
+            instance.__data__ = LazyData(instance, keys, row)
+
+        instance.initialize()
+        return instance
+
     def __repr__(self):
         return "<{0} {1}={2}>".format(
             self.__class__.__name__, self.get_pk_name(), self.get_pk_value()
@@ -194,68 +310,118 @@ class Model(with_metaclass(ORM, object)):
         return data
 
     def get_encryption_box_for_attribute(self, attr):
-        keymap = dict(getattr(self, "encryption", None) or {})
+        keymap = self.__encryption_keys__
         if attr not in keymap:
             return
 
         key = keymap[attr]
+        if isinstance(key, KeyProvider):
+            key = key.get_key(self.__class__, attr)
+
+        boxes = self.__encryption_boxes__
+        box = boxes.get((attr, key))
+        if box is None:
+            box = boxes[(attr, key)] = nacl.secret.SecretBox(key)
 
-        box = nacl.secret.SecretBox(key)
         return box
 
+    def get_encryption_key_id_for_attribute(self, attr):
+        """returns the id of the key that encrypts the given attribute
+        in sealed values, see :py:mod:`chemist.encryption`"""
+        keymap = self.__encryption_keys__
+        if attr not in keymap:
+            return
+
+        key = keymap[attr]
+        if isinstance(key, KeyProvider):
+            key = key.get_key(self.__class__, attr)
+
+        key_ids = self.__encryption_key_ids__
+        key_id = key_ids.get(key)
+        if key_id is None:
+            key_id = key_ids[key] = get_key_id(key)
+
+        return key_id
+
+    def get_previous_encryption_box_for_attribute(self, attr, key_id):
+        """returns a box for the key of ``previous_encryption_keys``
+        with the given id, so that values sealed before a key rotation
+        can still be decrypted"""
+        for key in (self.previous_encryption_keys or {}).get(attr, ()):
+            key_ids = self.__encryption_key_ids__
+            if key not in key_ids:
+                key_ids[key] = get_key_id(key)
+
+            if key_ids[key] != key_id:
+                continue
+
+            boxes = self.__encryption_boxes__
+            box = boxes.get((attr, key))
+            if box is None:
+                box = boxes[(attr, key)] = nacl.secret.SecretBox(key)
+
+            return box
+
+    @classmethod
+    def get_blind_index_for_attribute(cls, attr, value):
+        """returns the blind index of the given plaintext value of an
+        attribute declared in ``blind_indexes``, see
+        :py:func:`chemist.encryption.get_blind_index`"""
+        index_name, key = cls.__blind_indexes__[attr]
+        if isinstance(key, KeyProvider):
+            key = key.get_key(cls, index_name)
+
+        return get_blind_index(key, value)
+
     def encrypt_attribute(self, attr, value):
         box = self.get_encryption_box_for_attribute(attr)
         if not box:
             return value
 
         nonce = nacl.utils.random(nacl.secret.SecretBox.NONCE_SIZE)
-        return box.encrypt(str(value), nonce)
+        if not self.encryption_envelope:
+            return box.encrypt(str(value), nonce)
+
+        if value is None:
+            return value
+
+        key_id = self.get_encryption_key_id_for_attribute(attr)
+        return seal(box, key_id, value, nonce)
 
     def decrypt_attribute(self, attr, value):
         box = self.get_encryption_box_for_attribute(attr)
         if not box:
             return value
 
+        if self.encryption_envelope:
+            # only sealed values are ciphertexts, everything else is
+            # plain data being assigned to the model
+            if not is_sealed(value):
+                return value
+
+            key_id, ciphertext = unseal(value)
+            if key_id != self.get_encryption_key_id_for_attribute(attr):
+                box = self.get_previous_encryption_box_for_attribute(attr, key_id)
+
+            if box is None:
+                raise UnknownEncryptionKey(
+                    "{}.{} was encrypted with an unknown key: {}".format(
+                        self.__class__.__name__, attr, key_id
+                    )
+                )
+
+            return box.decrypt(ciphertext).decode("utf-8")
+
         try:
             return box.decrypt(value)
         except ValueError:
             return value
 
     def serialize_value(self, attr, value):
-        col = self.table.columns[attr]
-        if col.default and not value:
-            if col.default.is_callable:
-                value = col.default.arg(value)
-            else:
-                value = col.default.arg
-
-        if isinstance(value, Decimal):
-            return format_decimal(value)
-
-        date_types = (datetime.datetime, datetime.date, datetime.time)
-        if isinstance(value, date_types):
-            return value.isoformat()
-
-        if not value:
-            return value
-
-        data_type = self.__columns__.get(attr, None)
-        builtins = list(dict(inspect.getmembers(__builtin__)).values())
-        builtins.extend([Decimal])
-
-        if col.primary_key and not value:
-            return value
-
-        if data_type and not isinstance(value, data_type) and data_type in builtins:
-            try:
-                return data_type(value)
-            except TypeError as e:
-                raise FieldTypeValueError(self, attr, e)
-
-            except ValueError as e:
-                raise FieldTypeValueError(self, attr, e)
-
-        return value
+        """serializes the given value through the serializer that the
+        :py:class:`~chemist.orm.ORM` metaclass compiled for the
+        column ``attr``"""
+        return self.__serializers__[attr](self, value)
 
     def deserialize_value(self, attr, value):
         value = self.decrypt_attribute(attr, value)
@@ -268,13 +434,6 @@ class Model(with_metaclass(ORM, object)):
 
         return value
 
-    def __setattr__(self, attr, value):
-        if attr in self.__columns__:
-            self.__data__[attr] = self.deserialize_value(attr, value)
-            return
-
-        return super(Model, self).__setattr__(attr, value)
-
     def to_dict(self):
         """pre-serializes the model, returning a dictionary with
         key-values.
@@ -295,7 +454,7 @@ class Model(with_metaclass(ORM, object)):
         """
         return self.serialize()
 
-    def serialize(self):
+    def serialize(self, columns=None):
         """pre-serializes the model, returning a dictionary with
         key-values.
 
@@ -303,20 +462,33 @@ class Model(with_metaclass(ORM, object)):
         separate method so that subclasses overwriting `to_dict` can
         call `serialize()` rather than `super(SubclassName,
         self).to_dict()`
-        """
 
-        keys = list(self.__columns__.keys())
-        return dict(
-            [
-                (k, self.serialize_value(k, self.__data__.get(k)))
-                for k in self.__columns__.keys()
-            ]
-        )
+        Optionally takes the names of the ``columns`` to serialize.
+        """
 
-    def to_insert_params(self):
+        data = self.__data__
+        serializers = self.__serializers__
+        unloaded = get_unloaded_columns(self)
+        if columns is not None:
+            serializers = [(k, serializers[k]) for k in columns]
+        elif unloaded:
+            # columns left out of the query that loaded the model,
+            # unless assigned since
+            skipped = unloaded.difference(self.__dirty__ or ())
+            serializers = [(k, s) for k, s in serializers.items() if k not in skipped]
+        else:
+            serializers = serializers.items()
+
+        return dict([(k, serialize(self, data.get(k))) for k, serialize in serializers])
+
+    def to_insert_params(self, columns=None, encrypt=True):
         """utility method used internally to generate a dict with all the
         serialized values except primary keys.
 
+        Optionally takes the names of the ``columns`` to include, which
+        :py:meth:`save` uses to update only the dirty columns. Values
+        are left unencrypted with ``encrypt=False``.
+
         **Example:**
 
         ::
@@ -329,11 +501,15 @@ class Model(with_metaclass(ORM, object)):
           }
 
         """
-        pre_data = Model.serialize(self)
+        pre_data = Model.serialize(self, columns)
         data = OrderedDict()
 
         for k, v in pre_data.items():
-            data[k] = self.encrypt_attribute(k, v)
+            data[k] = self.encrypt_attribute(k, v) if encrypt else v
+
+        for attr, (index_name, _) in self.__blind_indexes__.items():
+            if attr in pre_data:
+                data[index_name] = self.get_blind_index_for_attribute(attr, pre_data[attr])
 
         primary_key_names = [x.name for x in self.table.primary_key.columns]
         keys_to_pluck = (
@@ -348,10 +524,27 @@ class Model(with_metaclass(ORM, object)):
         # definition, just go ahead and change this code and it's
         # tests :)
         for key in keys_to_pluck:
-            data.pop(key)
+            data.pop(key, None)
 
         return data
 
+    def fill_inserted_values(self, params):
+        """stores the values of the given :py:meth:`to_insert_params`
+        that the data of the model lacks, e.g. evaluated column
+        defaults, so that reading them does not evaluate the defaults
+        again"""
+        data = self.__data__
+        for name, value in params.items():
+            if value is not None and data.get(name) is None:
+                data[name] = self.deserialize_value(name, value)
+
+    def fetch_columns(self, names):
+        """returns a dict with the raw values of the given columns of
+        the row of this model, used to load the columns that were
+        left out of the query that loaded the model, see
+        :py:meth:`~chemist.managers.Manager.find_by`"""
+        return self.using(self.engine).fetch_columns(self.get_pk_value(), names)
+
     def to_json(self, indent=None, sort_keys=True, **kw):
         """Grabs the dictionary with the current model state returned
         by `to_dict` and serializes it to JSON"""
@@ -359,13 +552,9 @@ class Model(with_metaclass(ORM, object)):
         return json.dumps(data, indent=indent, sort_keys=sort_keys, **kw)
 
     def __getattr__(self, attr):
-        try:
-            return object.__getattribute__(self, attr)
-        except AttributeError:
-            columns = list(self.__columns__.keys())
-            if attr in columns:
-                value = self.__data__.get(attr, None)
-                return self.serialize_value(attr, value)
+        # columns are served by the descriptors installed by the
+        # ORM metaclass, any other unknown attribute evaluates to None
+        return None
 
     def delete(self):
         """Deletes the current model from the database (removes a row
@@ -382,9 +571,47 @@ class Model(with_metaclass(ORM, object)):
             )
         )
 
+        self.forget_cached(self.get_engine())
+        session = get_current_session()
+        if session is not None:
+            session.forget(self)
+
         self.post_delete()
         return result
 
+    @classmethod
+    def get_identity_cache_key(cls, pk, engine):
+        """returns the key of the row with the given primary key in the
+        :py:attr:`~chemist.models.Model.identity_cache`, with the
+        primary key coerced to the type of its column, so that ``'1'``
+        from a URL route and ``1`` share an entry, and with the URL of
+        the engine masked, so that its password never reaches the cache
+        backend"""
+        pk_type = cls.__columns__[cls.get_pk_name()]
+        if pk is not None and not isinstance(pk, pk_type):
+            try:
+                pk = pk_type(pk)
+            except (TypeError, ValueError):
+                pass
+
+        return (repr(engine.url), cls.table.name, pk)
+
+    @classmethod
+    def clear_identity_cache(cls):
+        """evicts all the rows of the
+        :py:attr:`~chemist.models.Model.identity_cache`"""
+        if cls.identity_cache is not None:
+            cls.identity_cache.clear()
+
+    def forget_cached(self, engine=None):
+        """evicts the row of this model from the
+        :py:attr:`~chemist.models.Model.identity_cache`, called by
+        :py:meth:`save` and :py:meth:`delete`"""
+        cache = self.identity_cache
+        if cache is not None:
+            key = self.get_identity_cache_key(self.get_pk_value(), engine or self.engine)
+            cache.delete(key)
+
     def pre_delete(self):
         """called right before executing a deletion.
         This method can be overwritten by subclasses in order to take any domain-related action
@@ -419,14 +646,29 @@ class Model(with_metaclass(ORM, object)):
     def save(self, input_engine=None):
         """Persists the model instance in the DB.
         It takes care of checking whether it already exists and should be just updated or if a new record should be created.
+
+        Deferred until the end of the
+        :py:meth:`~chemist.orm.Context.session` active in the current
+        thread, if any.
         """
+        session = get_current_session()
+        if session is not None and input_engine is None:
+            return session.add(self)
+
         self.pre_save()
 
+        primary_key_column_name = self.get_pk_name()
+        mid = self.__data__.get(primary_key_column_name, None)
+        if mid is not None:
+            # only the columns assigned since the model was loaded or
+            # saved are updated, nothing to do when there are none
+            dirty = self.dirty_columns.difference([primary_key_column_name])
+            if not dirty:
+                return self
+
         engine = self.get_engine(input_engine)
         conn = engine.connect()
         transaction = conn.begin()
-        primary_key_column_name = self.get_pk_name()
-        mid = self.__data__.get(primary_key_column_name, None)
         try:
             if mid is None:
                 values = self.to_insert_params()
@@ -438,7 +680,7 @@ class Model(with_metaclass(ORM, object)):
             else:
                 res = conn.execute(
                     self.table.update()
-                    .values(**self.to_insert_params())
+                    .values(**self.to_insert_params(columns=dirty))
                     .where(self.get_pk_col(primary_key_column_name) == mid)
                 )
                 newdata = res.last_updated_params()
@@ -454,6 +696,8 @@ class Model(with_metaclass(ORM, object)):
         transaction.commit()
         # transaction.flush()
         conn.close()
+        self.__dirty__ = None
+        self.forget_cached(engine)
         self.post_save(transaction)
 
         return self
@@ -475,11 +719,22 @@ class Model(with_metaclass(ORM, object)):
         .. note:: any unsaved changes in the model will be lost upon
                   calling this method.
 
+        Within a :py:meth:`~chemist.orm.Context.session` the model is
+        forgotten first, so that the row is read again rather than
+        taken from the identity map, and then mapped back.
         """
+        session = get_current_session()
+        if session is not None:
+            session.forget(self)
+
         params = {}
         params[self.get_pk_name()] = self.get_pk_value()
         new = self.find_one_by(**params)
         self.set(**new.__data__)
+        self.__dirty__ = None
+        if session is not None:
+            session.add_identity(self)
+
         return new
 
     def set(self, **kw):
@@ -498,6 +753,23 @@ class Model(with_metaclass(ORM, object)):
 
         return self
 
+    @property
+    def unloaded_columns(self):
+        """the names of the columns left out of the query that loaded
+        the model and not fetched since, see
+        :py:meth:`~chemist.managers.Manager.find_by`.
+        This property **does not perform I/O against the database**
+        """
+        return frozenset(get_unloaded_columns(self) or ())
+
+    @property
+    def dirty_columns(self):
+        """the names of the columns assigned since the model was
+        loaded from the database or last saved.
+        This property **does not perform I/O against the database**
+        """
+        return frozenset(self.__dirty__ or ())
+
     def update_and_save(self, **kw):
         """Sets multiple fields then saves them"""
         updated = self.set(**kw)
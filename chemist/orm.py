@@ -4,6 +4,7 @@
 from __future__ import unicode_literals
 import os
 import warnings
+from six import string_types
 from six.moves import builtins as __builtin__
 import logging
 import uuid
@@ -14,6 +15,12 @@ from uuid import uuid4
 from functools import partial
 from decimal import Decimal
 from collections import OrderedDict
+from contextlib import contextmanager
+try:
+    from collections.abc import MutableMapping
+except ImportError:  # pragma: no cover
+    from collections import MutableMapping
+
 import sqlalchemy as db
 from sqlalchemy import (
     create_engine,
@@ -21,6 +28,13 @@ from sqlalchemy import (
 )
 from sqlalchemy import Numeric
 
+from chemist.session import Session
+from chemist.session import get_current_session
+from chemist.session import state as session_state
+from chemist.exceptions import FieldTypeValueError
+from chemist.exceptions import InvalidColumnName
+from chemist.exceptions import InvalidModelDeclaration
+
 
 MODEL_REGISTRY = OrderedDict()
 MODELS_BY_TABLE = OrderedDict()
@@ -28,6 +42,21 @@ MODELS_BY_TABLE = OrderedDict()
 format_decimal = lambda num: '{0:.2f}'.format(num)
 logger = logging.getLogger(__name__)
 
+# python types that :py:meth:`chemist.models.Model.serialize_value`
+# coerces values into, computed once at import time
+BUILTIN_TYPES = tuple(dict(inspect.getmembers(__builtin__)).values()) + (Decimal, )
+DATE_TYPES = (datetime.datetime, datetime.date, datetime.time)
+
+# bookkeeping attributes of models declared with ``compact_storage = True``
+COMPACT_SLOTS = ('engine', '__values__', '__row__', '__dirty__')
+
+# marks the columns of a compact model that were never assigned
+missing = type(str("missing"), (object,), {})
+
+# marks the columns of a lazily hydrated model whose value is still
+# the raw value of the row that it was loaded from
+pending = type(str("pending"), (object,), {})
+
 
 
 class Monetary(Numeric):
@@ -55,6 +84,530 @@ def PrimaryKey(name='id'):
 def AutoUUID(name='uuid'):
     return db.Column(name, db.String(32), default=generate_uuid)
 
+def compile_column_serializer(column, data_type):
+    """compiles the serialization steps of a single column into a
+    function ``serializer(model, value)``.
+
+    Everything that only depends on the column declaration (default
+    value, python type coercion) is resolved here, once, so that
+    serializing a value costs a handful of checks.
+    """
+    name = column.name
+    default = column.default
+
+    if default is None or getattr(default, 'is_sequence', False):
+        get_default = None
+    elif default.is_callable:
+        get_default = default.arg
+    else:
+        get_default = lambda value, arg=default.arg: arg
+
+    coerce = data_type if data_type in BUILTIN_TYPES else None
+    # values that already have the exact column type need no treatment
+    passthrough = coerce if coerce is not Decimal else None
+
+    def serializer(model, value):
+        if get_default is not None and not value:
+            value = get_default(value)
+
+        if value is None or type(value) is passthrough:
+            return value
+
+        if isinstance(value, Decimal):
+            return format_decimal(value)
+
+        if isinstance(value, DATE_TYPES):
+            return value.isoformat()
+
+        if not value or coerce is None or isinstance(value, coerce):
+            return value
+
+        try:
+            return coerce(value)
+        except (TypeError, ValueError) as e:
+            raise FieldTypeValueError(model, name, e)
+
+    return serializer
+
+
+def compile_serialization_plan(table, columns):
+    """returns an :py:class:`~collections.OrderedDict` mapping each
+    column name to its compiled serializer, in the table order"""
+    return OrderedDict(
+        (c.name, compile_column_serializer(c, columns[c.name]))
+        for c in table.columns
+    )
+
+
+def mark_dirty(instance, name):
+    """records that the given column was assigned since the model
+    was loaded or saved, ``__dirty__`` is None while the model is
+    clean so that clean models carry no set at all"""
+    dirty = instance.__dirty__
+    if dirty is None:
+        instance.__dirty__ = set([name])
+    else:
+        dirty.add(name)
+
+
+class ColumnAttribute(property):
+    """data descriptor installed by the :py:class:`ORM` metaclass on
+    the model class for each of its columns.
+
+    Reads serialize the stored value through the compiled column
+    serializer, writes deserialize (and decrypt) it through
+    :py:meth:`~chemist.models.Model.deserialize_value` and mark the
+    column as dirty.
+
+    Subclasses :py:class:`property` so that the attribute lookup
+    itself does not cost an extra python frame. Plain columns, that
+    are neither encrypted nor dates, are stored as given.
+
+    Models declared with ``compact_storage = True`` pass the
+    ``index`` of the column in ``table.columns``, the value is then
+    kept in the ``__values__`` array of the instance.
+    """
+
+    def __init__(self, name, serializer, plain=False, index=None):
+        if index is None:
+            def get(instance):
+                return serializer(instance, instance.__data__.get(name))
+
+            def set(instance, value):
+                instance.__data__[name] = instance.deserialize_value(name, value)
+                mark_dirty(instance, name)
+
+            def set_plain(instance, value):
+                instance.__data__[name] = value
+                mark_dirty(instance, name)
+        else:
+            def get(instance):
+                value = instance.__values__[index]
+                if value is pending:
+                    value = hydrate_compact_value(instance, name, index)
+
+                return serializer(instance, None if value is missing else value)
+
+            def set(instance, value):
+                instance.__values__[index] = instance.deserialize_value(name, value)
+                mark_dirty(instance, name)
+
+            def set_plain(instance, value):
+                instance.__values__[index] = value
+                mark_dirty(instance, name)
+
+        super(ColumnAttribute, self).__init__(get, set_plain if plain else set)
+        self.name = name
+        self.serializer = serializer
+        self.index = index
+
+    def __repr__(self):
+        return '<ColumnAttribute {}>'.format(self.name)
+
+
+def hydrate_compact_value(instance, name, index):
+    value = instance.deserialize_value(name, instance.__row__[name])
+    instance.__values__[index] = value
+    return value
+
+
+class CompactData(MutableMapping):
+    """dict-like view of the ``__values__`` array of a model declared
+    with ``compact_storage = True``, returned by its ``__data__``
+    attribute for compatibility."""
+    __slots__ = ('instance', 'values', 'index')
+
+    def __init__(self, instance):
+        self.instance = instance
+        self.values = instance.__values__
+        self.index = instance.__column_index__
+
+    def __getitem__(self, key):
+        index = self.index[key]
+        value = self.values[index]
+        if value is missing:
+            raise KeyError(key)
+
+        if value is pending:
+            value = hydrate_compact_value(self.instance, key, index)
+
+        return value
+
+    def __setitem__(self, key, value):
+        try:
+            self.values[self.index[key]] = value
+        except KeyError:
+            raise InvalidColumnName(key)
+
+    def __delitem__(self, key):
+        if self.values[self.index[key]] is missing:
+            raise KeyError(key)
+
+        self.values[self.index[key]] = missing
+
+    def __iter__(self):
+        for key, i in self.index.items():
+            if self.values[i] is not missing:
+                yield key
+
+    def __len__(self):
+        return sum(1 for value in self.values if value is not missing)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class LazyData(MutableMapping):
+    """``__data__`` of a lazily hydrated model: wraps the raw row that
+    the model was loaded from and decrypts/deserializes each value
+    the first time it is accessed."""
+    __slots__ = ('instance', 'values', 'row')
+
+    def __init__(self, instance, keys, row):
+        self.instance = instance
+        self.values = dict.fromkeys(keys, pending)
+        self.row = row
+
+    def hydrate(self, key):
+        value = self.instance.deserialize_value(key, self.row[key])
+        self.values[key] = value
+        return value
+
+    def get(self, key, default=None):
+        value = self.values.get(key, default)
+        if value is pending:
+            value = self.hydrate(key)
+
+        return value
+
+    def __getitem__(self, key):
+        value = self.values[key]
+        if value is pending:
+            value = self.hydrate(key)
+
+        return value
+
+    def __setitem__(self, key, value):
+        self.values[key] = value
+
+    def __delitem__(self, key):
+        del self.values[key]
+
+    def __contains__(self, key):
+        return key in self.values
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class PartialData(MutableMapping):
+    """``__data__`` of a model loaded with only some of its columns,
+    see :py:func:`mark_unloaded`: wraps the data of the model and
+    fetches the unloaded columns the first time one is accessed."""
+    __slots__ = ('instance', 'data', 'unloaded')
+
+    def __init__(self, instance, data, unloaded):
+        self.instance = instance
+        self.data = data
+        self.unloaded = unloaded
+
+    def fill(self, raw):
+        """sets the fetched raw values of unloaded columns"""
+        instance = self.instance
+        for key, value in raw.items():
+            if key in self.unloaded:
+                self.data[key] = instance.deserialize_value(key, value)
+                self.unloaded.discard(key)
+
+    def get(self, key, default=None):
+        if key in self.unloaded:
+            self.fill(fetch_unloaded(self.instance, self.unloaded, key))
+
+        return self.data.get(key, default)
+
+    def __getitem__(self, key):
+        if key in self.unloaded:
+            self.fill(fetch_unloaded(self.instance, self.unloaded, key))
+
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.unloaded.discard(key)
+        self.data[key] = value
+
+    def __delitem__(self, key):
+        del self.data[key]
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return repr(dict(self.data))
+
+
+class UnloadedRow(object):
+    """``__row__`` of a compact model loaded with only some of its
+    columns, see :py:func:`mark_unloaded`: the unloaded columns are
+    ``pending`` and their raw values are fetched at once the first
+    time one of them is hydrated."""
+    __slots__ = ('instance', 'row', 'unloaded', 'fetched')
+
+    def __init__(self, instance, row, unloaded):
+        self.instance = instance
+        self.row = row
+        self.unloaded = unloaded
+        self.fetched = {}
+
+    def fill(self, raw):
+        """keeps the fetched raw values of unloaded columns until they
+        are hydrated"""
+        for key, value in raw.items():
+            if key in self.unloaded:
+                self.fetched[key] = value
+                self.unloaded.discard(key)
+
+    def __getitem__(self, key):
+        if key in self.unloaded:
+            self.fill(fetch_unloaded(self.instance, self.unloaded, key))
+
+        if key in self.fetched:
+            return self.fetched[key]
+
+        return self.row[key]
+
+
+def fetch_unloaded(instance, unloaded, key):
+    """fetches the raw values of the given unloaded column of a model
+    along with its other unloaded columns, except the deferred ones"""
+    deferred = instance.__deferred__
+    names = sorted(name for name in unloaded if name == key or name not in deferred)
+    return instance.fetch_columns(names)
+
+
+def get_unloaded_columns(instance):
+    """returns the set of the columns of a model marked by
+    :py:func:`mark_unloaded` that were not fetched yet, if any"""
+    if not instance.compact_storage:
+        return getattr(instance.__data__, 'unloaded', None)
+
+    unloaded = getattr(instance.__row__, 'unloaded', None)
+    if unloaded:
+        # assigned columns are no longer pending
+        index = instance.__column_index__
+        values = instance.__values__
+        return set(name for name in unloaded if values[index[name]] is pending)
+
+    return unloaded
+
+
+def mark_unloaded(instance, names):
+    """marks the given columns of a model as not loaded, e.g. left out
+    of the projection of a query: reading any of them fetches the
+    unloaded columns of the model by primary key, each deferred column
+    on its own, while :py:meth:`~chemist.models.Model.to_dict` leaves
+    them out"""
+    unloaded = set(names)
+    if instance.compact_storage:
+        index = instance.__column_index__
+        for name in unloaded:
+            instance.__values__[index[name]] = pending
+
+        instance.__row__ = UnloadedRow(instance, instance.__row__, unloaded)
+    else:
+        instance.__data__ = PartialData(instance, instance.__data__, unloaded)
+
+    return instance
+
+
+def fill_unloaded(instance, raw):
+    """sets the raw values of unloaded columns of a model fetched
+    along with other models, see
+    :py:meth:`~chemist.managers.Manager.undefer`"""
+    holder = instance.__row__ if instance.compact_storage else instance.__data__
+    holder.fill(raw)
+    return instance
+
+
+class CompactDataAttribute(object):
+    """``__data__`` attribute of the models declared with
+    ``compact_storage = True``"""
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+
+        return CompactData(instance)
+
+    def __set__(self, instance, data):
+        index = instance.__column_index__
+        values = [missing] * len(index)
+        for key, value in data.items():
+            if key not in index:
+                raise InvalidColumnName(key)
+            values[index[key]] = value
+
+        instance.__values__ = values
+        instance.__row__ = None
+
+
+def shadowed_column_setattr(instance, attr, value):
+    """``__setattr__`` for models that declare columns named after
+    attributes of the model class, which cannot have a descriptor"""
+    if attr in instance.__shadowed_columns__:
+        instance.__data__[attr] = instance.deserialize_value(attr, value)
+        mark_dirty(instance, attr)
+        return
+
+    object.__setattr__(instance, attr, value)
+
+
+def defines_own(cls, method_name):
+    """returns True if ``method_name`` is overwritten by ``cls`` or by
+    any of its bases other than the builtin models"""
+    for klass in cls.__mro__:
+        if method_name in vars(klass):
+            return not is_builtin_model(klass)
+
+    return False
+
+
+def get_encryption_keymap(cls):
+    """returns the ``encryption`` declared by the model class as a
+    dict of column name to key.
+
+    A declared dict is returned as-is so that keys changed at runtime
+    are still picked up by
+    :py:meth:`~chemist.models.Model.get_encryption_box_for_attribute`,
+    assigning a new ``encryption`` to the class goes through
+    :py:func:`install_encryption_keys`
+    """
+    keymap = getattr(cls, 'encryption', None)
+    if keymap is None:
+        return {}
+
+    if isinstance(keymap, dict):
+        return keymap
+
+    return dict(keymap)
+
+
+def install_encryption_keys(cls):
+    """reads the ``encryption`` of the model class, called when the
+    class is created and whenever ``encryption`` is assigned to it or
+    to a base class it inherits it from"""
+    # SecretBox instances are built once per (attribute, key) and
+    # shared by every instance of the model class
+    cls.__encryption_keys__ = get_encryption_keymap(cls)
+    cls.__encryption_boxes__ = {}
+    cls.__encryption_key_ids__ = {}
+
+
+def get_blind_indexes(cls, columns):
+    """returns the ``blind_indexes`` declared by the model class as a
+    dict of column name to a tuple with the name of the sibling column
+    and the key"""
+    blind_indexes = dict(getattr(cls, 'blind_indexes', None) or {})
+    for name, (index_name, key) in blind_indexes.items():
+        for column_name in (name, index_name):
+            if column_name not in columns:
+                raise InvalidModelDeclaration(
+                    'the blind index of {}.{} refers to the unknown column "{}"'.format(
+                        cls.__name__, name, column_name
+                    )
+                )
+
+    return blind_indexes
+
+
+def get_deferred_columns(cls, columns):
+    """returns the ``deferred_columns`` declared by the model class as
+    a frozenset of column names"""
+    deferred = frozenset(getattr(cls, 'deferred_columns', None) or ())
+    for name in deferred:
+        if name not in columns:
+            raise InvalidModelDeclaration(
+                '{}.deferred_columns refers to the unknown column "{}"'.format(
+                    cls.__name__, name
+                )
+            )
+
+        if cls.table.c[name].primary_key:
+            raise InvalidModelDeclaration(
+                'the primary key of {} cannot be deferred'.format(cls.__name__)
+            )
+
+    return deferred
+
+
+def is_plain_column(cls, name, data_type):
+    """returns True if values assigned to the given column can be
+    stored without going through
+    :py:meth:`~chemist.models.Model.deserialize_value`"""
+    if name in cls.__encryption_keys__:
+        return False
+
+    if isinstance(data_type, type) and issubclass(data_type, (datetime.datetime, datetime.date)):
+        return False
+
+    hooks = ('deserialize_value', 'decrypt_attribute', 'get_encryption_box_for_attribute')
+    return not any(defines_own(cls, hook) for hook in hooks)
+
+
+class ModelShortcut(classmethod):
+    """classmethod of :py:class:`~chemist.models.Model` that proxies
+    to the manager of the model, which a column with the same name
+    takes precedence over, see :py:func:`install_column_attributes`"""
+
+
+def is_model_shortcut(cls, name):
+    """returns True if the given attribute of the model class is a
+    :py:class:`ModelShortcut`"""
+    for klass in cls.__mro__:
+        if name in vars(klass):
+            return isinstance(vars(klass)[name], ModelShortcut)
+
+    return False
+
+
+def install_column_attributes(cls, serializers, compact=False):
+    """installs a :py:class:`ColumnAttribute` for each column of the
+    model class, returns the names of the columns that could not get
+    one because the model class already has an attribute with that
+    name, other than a :py:class:`ModelShortcut`"""
+    shadowed = set()
+    for index, (name, serializer) in enumerate(serializers.items()):
+        existing = getattr(cls, name, None)
+        if existing is not None and not isinstance(existing, ColumnAttribute):
+            if not is_model_shortcut(cls, name):
+                shadowed.add(name)
+                continue
+
+        plain = is_plain_column(cls, name, cls.__columns__[name])
+        index = index if compact else None
+        setattr(cls, name, ColumnAttribute(name, serializer, plain, index))
+
+    return frozenset(shadowed)
+
+
+def is_compact_declaration(bases, attrs):
+    if 'compact_storage' in attrs:
+        return bool(attrs['compact_storage'])
+
+    return any(getattr(base, 'compact_storage', False) for base in bases)
+
+
 def is_builtin_model(target):
     return target.__module__.startswith('chemist.') and target.__name__ in ('ORM', 'Model')
 
@@ -63,6 +616,17 @@ class ORM(type):
     """metaclass for :py:class:`chemist.models.Model`
     """
 
+    def __new__(mcs, name, bases, attrs):
+        # compact models keep their bookkeeping attributes in slots,
+        # which have to be known before the class is created
+        if '__slots__' not in attrs and is_compact_declaration(bases, attrs):
+            attrs['__slots__'] = tuple(
+                slot for slot in COMPACT_SLOTS
+                if not any(hasattr(base, slot) for base in bases)
+            )
+
+        return super(ORM, mcs).__new__(mcs, name, bases, attrs)
+
     def __init__(cls, name, bases, attrs):
         if is_builtin_model(cls):
             return
@@ -74,11 +638,48 @@ class ORM(type):
         columns = {c.name: c.type.python_type
                            for c in cls.table.columns}
         cls.__columns__ = columns
+        cls.__serializers__ = compile_serialization_plan(cls.table, columns)
+        install_encryption_keys(cls)
+        cls.__blind_indexes__ = get_blind_indexes(cls, columns)
+        cls.__deferred__ = get_deferred_columns(cls, columns)
+        if cls.compact_storage:
+            cls.__column_index__ = OrderedDict(
+                (name, i) for i, name in enumerate(cls.__serializers__)
+            )
+            cls.__data__ = CompactDataAttribute()
+
+        # lazy hydration skips Model.preprocess, which needs the
+        # whole data of the model at once
+        cls.__lazy__ = bool(cls.lazy_hydration) and not defines_own(cls, 'preprocess')
+
+        cls.__shadowed_columns__ = install_column_attributes(
+            cls, cls.__serializers__, cls.compact_storage
+        )
+        if cls.__shadowed_columns__:
+            cls.__setattr__ = shadowed_column_setattr
+
         attrs['__columns__'] = columns
         ORM.register_model_class(cls, columns)
 
         super(ORM, cls).__init__(name, bases, attrs)
 
+    def __setattr__(cls, name, value):
+        super(ORM, cls).__setattr__(name, value)
+        if name != 'encryption' or '__serializers__' not in vars(cls):
+            return
+
+        # the encryption keys and the column attributes that skip
+        # decryption were resolved when the class was created
+        models = [cls]
+        while models:
+            model = models.pop()
+            install_encryption_keys(model)
+            install_column_attributes(model, model.__serializers__, model.compact_storage)
+            models.extend(
+                sub for sub in model.__subclasses__()
+                if 'encryption' not in vars(sub) and '__serializers__' in vars(sub)
+            )
+
 
     @staticmethod
     def determine_model_identity(cls):
@@ -117,9 +718,11 @@ class Context(object):
         self.default_uri = default_uri or os.getenv('CHEMIST_SQLALCHEMY_URI')
         self.engines = OrderedDict()
         self.metadata = MetaData()
+        self.managers = {}
 
     def set_default_uri(self, uri):
         self.default_uri = uri
+        self.managers.clear()
         self.metadata.bind = self.get_default_engine()
         return self.metadata
 
@@ -141,6 +744,62 @@ class Context(object):
     def get_default_engine(self):
         return self.get_or_create_engine(self.default_uri)
 
+    def get_manager(self, model, engine=None):
+        """returns the manager of the given model class for the given
+        engine, uri or, by default, the default engine.
+
+        Managers are cached per model and engine until
+        :py:meth:`set_default_uri` is called, so every caller shares
+        the same instance: attributes set on it, e.g.
+        ``crypto_workers`` or ``stream_batch_size``, apply to all the
+        later calls. Declare them on a :py:class:`~chemist.managers.Manager`
+        subclass, or build a manager of your own with
+        ``Manager(model, engine)`` to customize a single one.
+        """
+        key = (model, model.manager, engine)
+        manager = self.managers.get(key)
+        if manager is None:
+            if engine is None:
+                resolved = self.get_default_engine()
+            elif isinstance(engine, string_types):
+                resolved = self.get_or_create_engine(engine)
+            else:
+                resolved = engine
+
+            manager = self.managers[key] = model.manager(model, resolved)
+
+        return manager
+
+    @contextmanager
+    def session(self):
+        """Unit of work for the current thread, see
+        :py:class:`~chemist.session.Session`.
+
+        Pending saves are flushed in a single transaction when the block
+        exits without errors, and discarded otherwise. Nested blocks
+        share the outermost session.
+
+        ::
+
+          with context.session() as session:
+              user = User.find_one_by(id=1)
+              assert User.where_one(User.table.c.id == 1) is user
+              user.name = 'Octocat'
+              user.save()  # deferred
+        """
+        session = get_current_session()
+        if session is not None:
+            yield session
+            return
+
+        session = session_state.session = Session()
+        try:
+            yield session
+            session.flush()
+        finally:
+            session_state.session = None
+            session.close()
+
     def DefaultTable(self, name, *fields):
         options = dict(
             # mysql_engine='InnoDB',
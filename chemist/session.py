@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""Request-scoped unit of work, see :py:meth:`chemist.orm.Context.session`.
+"""
+import threading
+from collections import OrderedDict
+
+import sqlalchemy as db
+
+
+state = threading.local()
+
+
+def get_current_session():
+    """returns the :py:class:`Session` active in the current thread,
+    if any"""
+    return getattr(state, "session", None)
+
+
+class Session(object):
+    """Unit of work active within ``with context.session():``
+
+    * The managers return the same model instance for the same primary
+      key, see :py:meth:`get_identity`.
+    * Queries reuse one connection per engine, see
+      :py:meth:`connection_for`.
+    * :py:meth:`~chemist.models.Model.save` is deferred until the
+      session exits, where :py:meth:`flush` writes all the pending
+      models in one transaction per engine, with the inserts and the
+      updates grouped per table.
+    """
+
+    def __init__(self):
+        self.connections = OrderedDict()
+        self.identities = {}
+        self.pending = OrderedDict()
+
+    def connection_for(self, engine):
+        """returns the connection of the session to the given engine,
+        opening it on first use"""
+        conn = self.connections.get(engine)
+        if conn is None:
+            conn = self.connections[engine] = engine.connect()
+
+        return conn
+
+    def get_identity(self, model, pk):
+        """returns the instance of the given model class with the given
+        primary key already loaded in the session, if any"""
+        return self.identities.get((model, pk))
+
+    def add_identity(self, instance):
+        pk = instance.get_pk_value()
+        if pk is not None:
+            self.identities[(instance.__class__, pk)] = instance
+
+        return instance
+
+    def forget(self, instance):
+        """removes the given instance from the identity map and from the
+        pending saves"""
+        self.pending.pop(id(instance), None)
+        self.identities.pop((instance.__class__, instance.get_pk_value()), None)
+
+    def add(self, instance):
+        """defers the save of the given instance until :py:meth:`flush`"""
+        self.pending[id(instance)] = instance
+        return instance
+
+    def flush(self):
+        """saves all the pending models, in one transaction per engine,
+        inserting and updating them ``executemany`` per table"""
+        pending = list(self.pending.values())
+        self.pending.clear()
+
+        by_engine = OrderedDict()
+        for instance in pending:
+            instance.pre_save()
+            by_engine.setdefault(instance.get_engine(), []).append(instance)
+
+        for engine, instances in by_engine.items():
+            conn = self.connection_for(engine)
+            transaction = conn.begin()
+            try:
+                by_table = OrderedDict()
+                for instance in instances:
+                    by_table.setdefault(instance.table, []).append(instance)
+
+                for table, group in by_table.items():
+                    self.flush_table(conn, table, group)
+
+                transaction.commit()
+            except Exception:
+                transaction.rollback()
+                raise
+
+            for instance in instances:
+                instance.__dirty__ = None
+                instance.forget_cached(engine)
+                self.add_identity(instance)
+                instance.post_save(transaction)
+
+    def flush_table(self, conn, table, instances):
+        model = instances[0].__class__
+        pk_name = model.get_pk_name()
+        pk = getattr(table.c, pk_name)
+
+        inserts = []
+        updates = OrderedDict()
+        for instance in instances:
+            if instance.__data__.get(pk_name) is None:
+                inserts.append(instance)
+                continue
+
+            dirty = instance.dirty_columns.difference([pk_name])
+            if dirty:
+                updates.setdefault(tuple(sorted(dirty)), []).append(instance)
+
+        if inserts:
+            params = [instance.to_insert_params() for instance in inserts]
+            dialect = conn.dialect
+            if dialect.implicit_returning and dialect.supports_multivalues_insert:
+                result = conn.execute(table.insert().values(params).returning(pk))
+                for instance, row in zip(inserts, result.fetchall()):
+                    instance.set(**{pk_name: row[0]})
+            else:
+                for instance, values in zip(inserts, params):
+                    result = conn.execute(table.insert().values(**values))
+                    instance.set(**{pk_name: result.inserted_primary_key[0]})
+
+            for instance, values in zip(inserts, params):
+                instance.fill_inserted_values(values)
+
+        # models that changed the same columns share an UPDATE
+        update = table.update().where(pk == db.bindparam("_pk"))
+        for columns, group in updates.items():
+            params = []
+            for instance in group:
+                values = instance.to_insert_params(columns=columns)
+                values["_pk"] = instance.__data__[pk_name]
+                params.append(values)
+
+            conn.execute(update, params)
+
+    def close(self):
+        for conn in self.connections.values():
+            conn.close()
+
+        self.connections.clear()
+        self.identities.clear()
+        self.pending.clear()
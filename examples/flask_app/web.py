@@ -45,8 +45,7 @@ def login():
 @app.get("/users")
 @authenticated
 def list_users():
-    users = User.all()
-    data = [{'email': u.email, 'id': u.id} for u in users]
+    data = User.values('email', 'id')
     return json_response(data)
 
 
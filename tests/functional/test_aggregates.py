@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+from decimal import Decimal
+
+from sure import scenario
+from chemist import Model, Monetary, db, InvalidColumnName, InvalidQueryModifier
+from chemist import context as chemist_context
+
+
+def reset_db(context):
+    context.engine = chemist_context.set_default_uri("sqlite://").bind
+    Payment.table.create(context.engine)
+    Payment.bulk_create([
+        {"user_id": 1, "amount": Decimal("10.50"), "status": "paid"},
+        {"user_id": 1, "amount": Decimal("4.25"), "status": "paid"},
+        {"user_id": 2, "amount": Decimal("7.00"), "status": "paid"},
+        {"user_id": 2, "amount": Decimal("1.00"), "status": "refunded"},
+        {"user_id": 3, "amount": None, "status": "pending"},
+    ])
+
+
+def cleanup_db(context):
+    Payment.table.drop(context.engine)
+
+
+sqlite_db = scenario(reset_db, cleanup_db)
+
+
+class Payment(Model):
+    table = db.Table(
+        "aggregates_payment",
+        db.MetaData(),
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("user_id", db.Integer),
+        db.Column("amount", Monetary()),
+        db.Column("status", db.String(20)),
+    )
+
+
+@sqlite_db
+def test_aggregate(context):
+    ("aggregate() should compute the aggregates in SQL")
+
+    Payment.aggregate(
+        {"total": ("sum", "amount"), "payments": "count", "largest": ("max", "amount")},
+        status="paid",
+    ).should.equal({"total": "21.75", "payments": 3, "largest": "10.50"})
+
+    Payment.aggregate(
+        {"total": ("sum", "amount"), "payments": "count"},
+        group_by="user_id",
+        status__startswith="p",
+    ).should.equal([
+        {"user_id": 1, "total": "14.75", "payments": 2},
+        {"user_id": 2, "total": "7.00", "payments": 1},
+        {"user_id": 3, "total": None, "payments": 1},
+    ])
+
+
+@sqlite_db
+def test_aggregate_shortcuts(context):
+    ("count(), sum(), avg(), min() and max() should return plain values")
+
+    manager = Payment.objects()
+    manager.count().should.equal(5)
+    manager.count("amount").should.equal(4)
+    manager.count(group_by="status").should.equal({"paid": 3, "pending": 1, "refunded": 1})
+    manager.count(group_by=("user_id", "status")).should.equal({
+        (1, "paid"): 2,
+        (2, "paid"): 1,
+        (2, "refunded"): 1,
+        (3, "pending"): 1,
+    })
+    manager.sum("amount", user_id=2).should.equal("8.00")
+    manager.sum("amount", status="none").should.be.none
+    manager.min("amount").should.equal("1.00")
+    manager.max("amount", group_by="user_id").should.equal({1: "10.50", 2: "7.00", 3: None})
+    manager.avg("user_id").should.equal(1.8)
+
+
+@sqlite_db
+def test_aggregate_errors(context):
+    ("aggregate() should reject unknown functions and columns")
+
+    manager = Payment.objects()
+    manager.aggregate.when.called_with({"x": ("median", "amount")}).should.throw(
+        InvalidQueryModifier
+    )
+    manager.sum.when.called_with("nope").should.throw(InvalidColumnName)
+    manager.count.when.called_with(group_by="nope").should.throw(InvalidColumnName)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+import nacl.secret
+
+from sure import scenario
+from chemist import Model, db, get_blind_index
+from chemist import context as chemist_context
+from chemist.exceptions import InvalidModelDeclaration, InvalidQueryModifier
+
+
+SECRET_KEY = b"\x07" * nacl.secret.SecretBox.KEY_SIZE
+BLIND_INDEX_KEY = b"blind index key"
+
+
+def reset_db(context):
+    context.engine = chemist_context.set_default_uri("sqlite://").bind
+    Customer.table.create(context.engine)
+
+
+def cleanup_db(context):
+    Customer.table.drop(context.engine)
+
+
+sqlite_db = scenario(reset_db, cleanup_db)
+
+
+class Customer(Model):
+    table = db.Table(
+        "blind_index_customer",
+        db.MetaData(),
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("name", db.String(100)),
+        db.Column("ssn", db.Text),
+        db.Column("ssn_index", db.String(64), index=True),
+    )
+    encryption = {"ssn": SECRET_KEY}
+    encryption_envelope = True
+    blind_indexes = {"ssn": ("ssn_index", BLIND_INDEX_KEY)}
+
+
+def raw_indexes(engine):
+    table = Customer.table
+    query = db.select([table.c.ssn_index]).order_by(table.c.id)
+    with engine.begin() as conn:
+        return [row[0] for row in conn.execute(query).fetchall()]
+
+
+@sqlite_db
+def test_blind_index_lookups(context):
+    ("Equality filters on columns with a blind index should match their plaintext")
+
+    Customer.create(name="Jane", ssn="078-05-1120")
+    Customer.bulk_create([
+        {"name": "John", "ssn": "219-09-9999"},
+        {"name": "Nobody", "ssn": None},
+    ])
+
+    raw_indexes(context.engine).should.equal([
+        get_blind_index(BLIND_INDEX_KEY, "078-05-1120"),
+        get_blind_index(BLIND_INDEX_KEY, "219-09-9999"),
+        None,
+    ])
+
+    Customer.find_one_by(ssn="219-09-9999").name.should.equal("John")
+    [c.name for c in Customer.find_by(ssn="078-05-1120")].should.equal(["Jane"])
+    Customer.find_one_by(ssn="000-00-0000").should.be.none
+
+
+@sqlite_db
+def test_blind_index_query_modifiers(context):
+    ("The in and ne modifiers should match the blind index, the ones that can not should fail")
+
+    Customer.bulk_create([
+        {"name": "Jane", "ssn": "111"},
+        {"name": "John", "ssn": "222"},
+        {"name": "Nobody", "ssn": None},
+    ])
+
+    def names(**kw):
+        return [c.name for c in Customer.find_by(order_by="+id", **kw)]
+
+    names(ssn__in=["111", "222"]).should.equal(["Jane", "John"])
+    names(ssn__in=["222", "333"]).should.equal(["John"])
+    names(ssn__ne="111").should.equal(["John"])
+    names(ssn__ne=None).should.equal(["Jane", "John"])
+    names(ssn__isnull=True).should.equal(["Nobody"])
+    Customer.total_rows(ssn__in=["111", "222"]).should.equal(2)
+    Customer.values_list("name", flat=True, ssn__ne="222").should.equal(["Jane"])
+
+    for modifier in ("startswith", "contains", "iexact", "gt", "gte", "lt", "lte"):
+        names.when.called_with(**{"ssn__" + modifier: "111"}).should.throw(
+            InvalidQueryModifier
+        )
+
+    names.when.called_with(ssn__range=("111", "222")).should.throw(InvalidQueryModifier)
+    Customer.total_rows.when.called_with(ssn__gt="111").should.throw(InvalidQueryModifier)
+
+
+@sqlite_db
+def test_blind_index_is_updated_on_save(context):
+    ("Saving a new value of a column with a blind index should update the index")
+
+    jane = Customer.create(name="Jane", ssn="078-05-1120")
+    jane.ssn = "123-45-6789"
+    jane.save()
+
+    Customer.find_one_by(ssn="078-05-1120").should.be.none
+    Customer.find_one_by(ssn="123-45-6789").id.should.equal(jane.id)
+
+
+def test_blind_index_of_unknown_column():
+    ("Declaring a blind index on an unknown column should fail")
+
+    def declare():
+        class Broken(Model):
+            table = db.Table(
+                "blind_index_broken",
+                db.MetaData(),
+                db.Column("id", db.Integer, primary_key=True),
+                db.Column("ssn", db.Text),
+            )
+            blind_indexes = {"ssn": ("ssn_index", BLIND_INDEX_KEY)}
+
+    declare.when.called_with().should.throw(InvalidModelDeclaration)
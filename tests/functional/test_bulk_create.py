@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import itertools
+
+from sure import scenario
+from chemist import Model, db
+from chemist import context as chemist_context
+
+
+def reset_db(context):
+    context.engine = chemist_context.set_default_uri("sqlite://").bind
+    Contact.table.create(context.engine)
+    Ticket.table.create(context.engine)
+
+
+def cleanup_db(context):
+    Contact.table.drop(context.engine)
+    Ticket.table.drop(context.engine)
+
+
+sqlite_db = scenario(reset_db, cleanup_db)
+
+
+class Contact(Model):
+    table = db.Table(
+        "bulk_contact",
+        db.MetaData(),
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("email", db.String(100), nullable=False, unique=True),
+        db.Column("name", db.String(100)),
+    )
+
+    def preprocess(self, data):
+        data["email"] = data["email"].lower()
+        return data
+
+
+@sqlite_db
+def test_bulk_create_from_dicts(context):
+    ("Model.bulk_create() should insert all the given rows in batches")
+
+    rows = [{"email": "USER{}@EXAMPLE.COM".format(i)} for i in range(25)]
+
+    created = Contact.bulk_create(rows, batch_size=10)
+
+    created.should.have.length_of(25)
+    Contact.total_rows().should.equal(25)
+    Contact.find_one_by(email="user7@example.com").shouldnt.be.none
+
+
+@sqlite_db
+def test_bulk_create_returning_primary_keys(context):
+    ("Model.bulk_create(returning=True) should set the primary keys of the models")
+
+    rows = [Contact(email="user{}@example.com".format(i)) for i in range(5)]
+
+    created = Contact.bulk_create(rows, batch_size=2, returning=True)
+
+    [m.id for m in created].should.equal([1, 2, 3, 4, 5])
+    [m.is_persisted for m in created].should.equal([True] * 5)
+
+
+@sqlite_db
+def test_bulk_create_is_atomic(context):
+    ("Model.bulk_create() should not insert any row when one batch fails")
+
+    rows = [{"email": "user{}@example.com".format(i % 15)} for i in range(20)]
+
+    Contact.bulk_create.when.called_with(rows, batch_size=10).should.throw(Exception)
+    Contact.total_rows().should.equal(0)
+
+
+ticket_numbers = itertools.count(1)
+
+
+class Ticket(Model):
+    table = db.Table(
+        "bulk_ticket",
+        db.MetaData(),
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("number", db.Integer, default=lambda: next(ticket_numbers)),
+    )
+
+
+@sqlite_db
+def test_bulk_create_keeps_evaluated_defaults(context):
+    ("Model.bulk_create() should keep the column defaults it inserted in the models")
+
+    created = Ticket.bulk_create([{}, {}])
+    numbers = [t.number for t in created]
+
+    [t.number for t in created].should.equal(numbers)
+    sorted(Ticket.values_list("number", flat=True)).should.equal(sorted(numbers))
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+import nacl.secret
+
+from sure import scenario
+from chemist import Model, db, MemoryCache
+from chemist import context as chemist_context
+from chemist.exceptions import InvalidModelDeclaration
+
+
+def reset_db(context):
+    context.engine = chemist_context.set_default_uri("sqlite://").bind
+    for model in (Document, CompactDocument):
+        model.table.create(context.engine)
+        model.bulk_create([
+            {"name": "doc{}".format(i), "body": "body{}".format(i), "blob": "blob{}".format(i)}
+            for i in range(3)
+        ])
+
+    context.statements = []
+    db.event.listen(
+        context.engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: context.statements.append(statement),
+    )
+
+
+def cleanup_db(context):
+    Document.table.drop(context.engine)
+    CompactDocument.table.drop(context.engine)
+    Document.clear_identity_cache()
+
+
+sqlite_db = scenario(reset_db, cleanup_db)
+
+
+class Document(Model):
+    table = db.Table(
+        "deferred_document",
+        db.MetaData(),
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("name", db.String(100)),
+        db.Column("body", db.Text),
+        db.Column("blob", db.Text),
+    )
+    encryption = {"body": b"\x03" * nacl.secret.SecretBox.KEY_SIZE}
+    encryption_envelope = True
+    deferred_columns = ("body", "blob")
+    identity_cache = MemoryCache()
+
+
+class CompactDocument(Model):
+    table = db.Table(
+        "deferred_compact_document",
+        db.MetaData(),
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("name", db.String(100)),
+        db.Column("body", db.Text),
+        db.Column("blob", db.Text),
+    )
+    deferred_columns = ("body", "blob")
+    compact_storage = True
+    lazy_hydration = True
+
+
+@sqlite_db
+def test_deferred_columns_are_skipped(context):
+    ("Queries should leave out the deferred columns and fetch each on first access")
+
+    for model in (Document, CompactDocument):
+        del context.statements[:]
+        doc = model.find_by(order_by="+id")[0]
+        context.statements[0].should_not.contain("body")
+        doc.to_dict().should.equal({"id": 1, "name": "doc0"})
+
+        doc.body.should.equal("body0")
+        context.statements[-1].should_not.contain("blob")
+        doc.blob.should.equal("blob0")
+        context.statements.should.have.length_of(3)
+
+        model.where_one(model.table.c.id == 2).unloaded_columns.should.equal(
+            frozenset(["body", "blob"])
+        )
+        model.find_one_by(id=2, only=("body",)).body.should.equal("body1")
+        model.paginate(size=1)[0].unloaded_columns.should_not.be.empty
+
+
+@sqlite_db
+def test_undefer(context):
+    ("undefer() should fetch the deferred columns of many models in one query")
+
+    for model in (Document, CompactDocument):
+        docs = model.all(order_by="+id")
+        del context.statements[:]
+
+        model.undefer(docs).should.be(docs)
+        context.statements.should.have.length_of(1)
+        context.statements[0].should.contain(" IN (")
+
+        [d.body for d in docs].should.equal(["body0", "body1", "body2"])
+        [d.blob for d in docs].should.equal(["blob0", "blob1", "blob2"])
+        context.statements.should.have.length_of(1)
+
+
+@sqlite_db
+def test_deferred_columns_with_identity_cache(context):
+    ("Cached rows should keep the deferred columns unloaded")
+
+    Document.find_one_by(id=1)
+    doc = Document.find_one_by(id=1)
+    Document.identity_cache.stats()["hits"].should.equal(1)
+    doc.body.should.equal("body0")
+
+
+def test_deferred_primary_key():
+    ("Deferring the primary key should fail")
+
+    def declare():
+        class Broken(Model):
+            table = db.Table(
+                "deferred_broken",
+                db.MetaData(),
+                db.Column("id", db.Integer, primary_key=True),
+            )
+            deferred_columns = ("id",)
+
+    declare.when.called_with().should.throw(InvalidModelDeclaration)
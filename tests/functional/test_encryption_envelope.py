@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+
+import nacl.secret
+import nacl.utils
+
+from mock import patch
+from sure import scenario
+from chemist import Manager, Model, db, is_sealed
+from chemist import context as chemist_context
+from chemist.encryption import KeyRotation
+from chemist.exceptions import UnknownEncryptionKey
+
+
+SECRET_KEY = b"\x07" * nacl.secret.SecretBox.KEY_SIZE
+
+
+def reset_db(context):
+    context.engine = chemist_context.set_default_uri("sqlite://").bind
+    Card.table.create(context.engine)
+
+
+def cleanup_db(context):
+    Card.table.drop(context.engine)
+
+
+sqlite_db = scenario(reset_db, cleanup_db)
+
+
+class Card(Model):
+    table = db.Table(
+        "envelope_card",
+        db.MetaData(),
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("holder", db.String(100)),
+        db.Column("number", db.Text),
+    )
+    encryption = {"number": SECRET_KEY}
+    encryption_envelope = True
+
+
+def legacy_ciphertext(plaintext):
+    box = nacl.secret.SecretBox(SECRET_KEY)
+    nonce = nacl.utils.random(nacl.secret.SecretBox.NONCE_SIZE)
+    return bytes(box.encrypt(plaintext, nonce))
+
+
+def raw_numbers(engine):
+    query = db.select([Card.table.c.number]).order_by(Card.table.c.id)
+    with engine.begin() as conn:
+        return [row[0] for row in conn.execute(query).fetchall()]
+
+
+@sqlite_db
+def test_sealed_values_round_trip(context):
+    ("Models declared with encryption_envelope should store sealed values and decrypt them")
+
+    Card.create(holder="Jane", number="4111111111111111")
+
+    stored = raw_numbers(context.engine)[0]
+    is_sealed(stored).should.be.true
+    stored.shouldnt.contain("4111111111111111")
+
+    Card.find_one_by(holder="Jane").number.should.equal("4111111111111111")
+
+
+@sqlite_db
+def test_seal_legacy_ciphertexts(context):
+    ("Model.seal_legacy_ciphertexts() should rewrite legacy ciphertexts in chunks")
+
+    rows = [
+        {"holder": "holder{}".format(i), "number": legacy_ciphertext(b"41110000000000%02d" % i)}
+        for i in range(7)
+    ]
+    rows.append({"holder": "plain", "number": "not encrypted"})
+    rows.append({"holder": "empty", "number": None})
+    with context.engine.begin() as conn:
+        conn.execute(Card.table.insert(), rows)
+
+    Card.seal_legacy_ciphertexts(chunk_size=3).should.equal(7)
+
+    numbers = raw_numbers(context.engine)
+    [is_sealed(n) for n in numbers[:7]].should.equal([True] * 7)
+    numbers[7:].should.equal(["not encrypted", None])
+
+    Card.find_one_by(holder="holder5").number.should.equal("4111000000000005")
+    Card.find_one_by(holder="plain").number.should.equal("not encrypted")
+
+    # already sealed values are left alone
+    Card.seal_legacy_ciphertexts(chunk_size=3).should.equal(0)
+
+
+@sqlite_db
+def test_seal_legacy_ciphertexts_skips_rows_written_meanwhile(context):
+    ("Model.seal_legacy_ciphertexts() should not overwrite values written after the chunk was read")
+
+    rows = [{"holder": "holder{}".format(i), "number": legacy_ciphertext(b"4111")} for i in range(3)]
+    with context.engine.begin() as conn:
+        conn.execute(Card.table.insert(), rows)
+
+    encrypt_attribute = Card.encrypt_attribute
+
+    def write_meanwhile(self, name, value):
+        # the application saves the first card while the chunk is sealed
+        context.engine.execute(
+            Card.table.update().where(Card.table.c.id == 1).values(number="written meanwhile")
+        )
+        return encrypt_attribute(self, name, value)
+
+    with patch.object(Card, "encrypt_attribute", write_meanwhile):
+        Card.seal_legacy_ciphertexts().should.equal(2)
+
+    numbers = raw_numbers(context.engine)
+    numbers[0].should.equal("written meanwhile")
+    [is_sealed(n) for n in numbers[1:]].should.equal([True, True])
+
+
+class ThreadedManager(Manager):
+    crypto_workers = 4
+
+
+class ThreadedCard(Card):
+    manager = ThreadedManager
+
+
+@sqlite_db
+def test_batch_crypto(context):
+    ("Managers with crypto_workers should encrypt and decrypt bulk rows on a thread pool")
+
+    rows = [{"holder": "holder{}".format(i), "number": "41110000000000%02d" % i} for i in range(50)]
+    ThreadedCard.bulk_create(rows, batch_size=20)
+
+    numbers = raw_numbers(context.engine)
+    [is_sealed(n) for n in numbers].should.equal([True] * 50)
+
+    cards = ThreadedCard.all(order_by="+id")
+    [c.number for c in cards].should.equal([r["number"] for r in rows])
+    [c.dirty_columns for c in cards].should.equal([frozenset()] * 50)
+
+    streamed = ThreadedCard.iter_all(batch_size=7, order_by="+id")
+    [c.number for c in streamed].should.equal([r["number"] for r in rows])
+
+
+NEW_SECRET_KEY = b"\x08" * nacl.secret.SecretBox.KEY_SIZE
+
+
+class RotatedCard(Card):
+    encryption = {"number": NEW_SECRET_KEY}
+    previous_encryption_keys = {"number": [SECRET_KEY]}
+
+
+@sqlite_db
+def test_rotate_encryption(context):
+    ("Model.rotate_encryption() should re-encrypt a column in chunks")
+
+    rows = [{"holder": "holder{}".format(i), "number": "41110000000000%02d" % i} for i in range(10)]
+    Card.bulk_create(rows)
+
+    report = Card.rotate_encryption("number", SECRET_KEY, NEW_SECRET_KEY, chunk_size=3, workers=2)
+
+    report.scanned.should.equal(10)
+    report.rotated.should.equal(10)
+    report.rows_per_second.should.be.greater_than(0)
+
+    numbers = [c.number for c in RotatedCard.all(order_by="+id")]
+    numbers.should.equal([r["number"] for r in rows])
+
+    Card.find_one_by.when.called_with(holder="holder1").should.throw(UnknownEncryptionKey)
+
+    # rotating again is harmless
+    Card.rotate_encryption("number", SECRET_KEY, NEW_SECRET_KEY).rotated.should.equal(0)
+
+
+@sqlite_db
+def test_rotate_encryption_skips_rows_written_meanwhile(context):
+    ("Model.rotate_encryption() should not overwrite values written after the chunk was read")
+
+    Card.bulk_create([{"holder": "holder{}".format(i), "number": "4111"} for i in range(3)])
+    rotate_many = KeyRotation.rotate_many
+
+    def write_meanwhile(self, values, workers=0):
+        # the application saves the first card while the chunk rotates
+        context.engine.execute(
+            Card.table.update().where(Card.table.c.id == 1).values(number="written meanwhile")
+        )
+        return rotate_many(self, values, workers)
+
+    with patch.object(KeyRotation, "rotate_many", write_meanwhile):
+        report = Card.rotate_encryption("number", SECRET_KEY, NEW_SECRET_KEY)
+
+    report.scanned.should.equal(3)
+    report.rotated.should.equal(2)
+    raw_numbers(context.engine)[0].should.equal("written meanwhile")
+    RotatedCard.find_one_by(holder="holder2").number.should.equal("4111")
+
+
+@sqlite_db
+def test_rotate_encryption_resumes_from_checkpoint(context):
+    ("Model.rotate_encryption() should resume from its checkpoint file")
+
+    Card.bulk_create([{"holder": "holder{}".format(i), "number": "4111"} for i in range(10)])
+
+    directory = tempfile.mkdtemp()
+    try:
+        checkpoint = os.path.join(directory, "rotation.json")
+        with open(checkpoint, "w") as fd:
+            fd.write('{"last": 6}')
+
+        report = Card.rotate_encryption(
+            "number", SECRET_KEY, NEW_SECRET_KEY, chunk_size=3, checkpoint=checkpoint
+        )
+        report.rotated.should.equal(4)
+        report.last.should.equal(10)
+
+        # a complete rotation removes its checkpoint, so that the next
+        # rotation through the same path starts over
+        os.path.exists(checkpoint).should.be.false
+        report = Card.rotate_encryption(
+            "number", SECRET_KEY, NEW_SECRET_KEY, chunk_size=3, checkpoint=checkpoint
+        )
+        report.scanned.should.equal(10)
+        report.rotated.should.equal(6)
+    finally:
+        shutil.rmtree(directory)
+
+    RotatedCard.find_one_by(holder="holder5").number.should.equal("4111")
+    RotatedCard.find_one_by(holder="holder6").number.should.equal("4111")
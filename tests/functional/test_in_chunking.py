@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+from sure import scenario
+from chemist import Model, Manager, db
+from chemist import context as chemist_context
+
+
+def reset_db(context):
+    context.engine = chemist_context.set_default_uri("sqlite://").bind
+    Item.table.create(context.engine)
+    Item.bulk_create([
+        {"name": "item-{:04d}".format(i), "rank": i % 7}
+        for i in range(1, 1001)
+    ])
+
+    context.statements = []
+    db.event.listen(
+        context.engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: context.statements.append(statement),
+    )
+
+
+def cleanup_db(context):
+    Item.table.drop(context.engine)
+
+
+sqlite_db = scenario(reset_db, cleanup_db)
+
+
+class ChunkedManager(Manager):
+    in_chunk_sizes = {"sqlite": 100}
+
+
+class Item(Model):
+    manager = ChunkedManager
+    table = db.Table(
+        "in_chunking_item",
+        db.MetaData(),
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("name", db.String(100)),
+        db.Column("rank", db.Integer),
+    )
+
+
+IDS = list(range(950, 0, -3)) + [5, 5, 2000]
+
+
+@sqlite_db
+def test_find_by_large_in_list(context):
+    ("find_by should query an __in list larger than the chunk size in chunks, in order")
+
+    models = Item.find_by(id__in=IDS, order_by="+id")
+    [m.id for m in models].should.equal(sorted(set(IDS) - {2000}))
+    selects = [s for s in context.statements if s.startswith("SELECT")]
+    selects.should.have.length_of(4)
+
+
+@sqlite_db
+def test_find_by_large_in_list_limit_offset(context):
+    ("the limit and the offset should apply to the merged rows of the chunks")
+
+    expected = sorted(set(IDS) - {2000}, reverse=True)
+    models = Item.find_by(id__in=IDS, limit_by=10, offset_by=95)
+    [m.id for m in models].should.equal(expected[95:105])
+
+    expected = sorted(
+        (i % 7, i) for i in set(IDS) - {2000}
+    )
+    models = Item.find_by(id__in=IDS, order_by="+rank", limit_by=5)
+    [m.rank for m in models].should.equal([r for r, i in expected[:5]])
+
+    Item.find_one_by(id__in=IDS, order_by="-id").id.should.equal(950)
+
+
+@sqlite_db
+def test_values_and_total_rows_large_in_list(context):
+    ("values and total_rows should chunk large __in lists too")
+
+    ids = sorted(set(IDS) - {2000})
+    Item.values_list("name", flat=True, id__in=IDS, order_by="+id").should.equal(
+        ["item-{:04d}".format(i) for i in ids]
+    )
+    Item.total_rows(id__in=IDS).should.equal(len(ids))
+    Item.total_rows(id__in=IDS, rank=0).should.equal(
+        len([i for i in ids if i % 7 == 0])
+    )
+
+
+@sqlite_db
+def test_find_by_several_large_in_lists(context):
+    ("find_by should chunk every __in list larger than the chunk size")
+
+    names = ["item-{:04d}".format(i) for i in range(1, 1001, 2)]
+    expected = sorted(set(IDS) - {2000})
+    expected = [i for i in expected if i % 2]
+
+    models = Item.find_by(id__in=IDS, name__in=names, order_by="+id")
+    [m.id for m in models].should.equal(expected)
+    selects = [s for s in context.statements if s.startswith("SELECT")]
+    selects.should.have.length_of(4 * 5)
+    Item.total_rows(id__in=IDS, name__in=names).should.equal(len(expected))
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+from sure import scenario
+from chemist import Model, db
+from chemist import context as chemist_context
+
+
+def reset_db(context):
+    context.engine = chemist_context.set_default_uri("sqlite://").bind
+    Person.table.create(context.engine)
+    Person.bulk_create([
+        {"name": "Alice", "age": 31},
+        {"name": "bob", "age": 17},
+        {"name": "Carol", "age": 45},
+        {"name": "dave", "age": None},
+    ])
+
+
+def cleanup_db(context):
+    Person.table.drop(context.engine)
+
+
+sqlite_db = scenario(reset_db, cleanup_db)
+
+
+class Person(Model):
+    table = db.Table(
+        "modifiers_person",
+        db.MetaData(),
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("name", db.String(100)),
+        db.Column("age", db.Integer, index=True),
+    )
+
+
+def names(**kw):
+    return [p.name for p in Person.find_by(order_by="+id", **kw)]
+
+
+@sqlite_db
+def test_extended_modifiers(context):
+    ("The extended query modifiers should filter the rows in SQL")
+
+    names(age__in=[17, 45, 99]).should.equal(["bob", "Carol"])
+    names(age__in=[]).should.equal([])
+    names(age__gt=31).should.equal(["Carol"])
+    names(age__gte=31).should.equal(["Alice", "Carol"])
+    names(age__lt=31).should.equal(["bob"])
+    names(age__lte=31).should.equal(["Alice", "bob"])
+    names(age__range=(18, 45)).should.equal(["Alice", "Carol"])
+    names(age__isnull=True).should.equal(["dave"])
+    names(age__isnull=False).should.equal(["Alice", "bob", "Carol"])
+    names(age__ne=17).should.equal(["Alice", "Carol"])
+    names(age__ne=None).should.equal(["Alice", "bob", "Carol"])
+    names(name__iexact="BOB").should.equal(["bob"])
+    names(name__iexact="alice", age__gte=30).should.equal(["Alice"])
+
+
+@sqlite_db
+def test_extended_modifiers_in_total_rows(context):
+    ("total_rows should take the same query modifiers")
+
+    Person.total_rows(age__gte=18).should.equal(2)
+    Person.total_rows(age__isnull=True).should.equal(1)
+    Person.total_rows(name__in=("Alice", "dave")).should.equal(2)
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+
+from sure import scenario
+from sqlalchemy import asc, desc
+from chemist import Model, db, InvalidPaginationCursor
+from chemist import context as chemist_context
+
+
+def reset_db(context):
+    context.path = tempfile.mkdtemp()
+    uri = "sqlite:///{}".format(os.path.join(context.path, "pagination.db"))
+    context.engine = chemist_context.set_default_uri(uri).bind
+    Article.table.create(context.engine)
+    context.engine.execute(
+        Article.table.insert(),
+        [
+            {"id": i, "author": "author {}".format(i % 3), "title": "title {:02d}".format(i)}
+            for i in range(1, 26)
+        ],
+    )
+
+
+def cleanup_db(context):
+    context.engine.dispose()
+    shutil.rmtree(context.path)
+
+
+sqlite_db = scenario(reset_db, cleanup_db)
+
+
+class Article(Model):
+    table = db.Table(
+        "pagination_article",
+        db.MetaData(),
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("author", db.String(80), nullable=False),
+        db.Column("title", db.String(80), nullable=False),
+    )
+
+
+def walk(**kw):
+    pages = [Article.paginate(**kw)]
+    while pages[-1].has_next:
+        pages.append(Article.paginate(after=pages[-1].cursor, **kw))
+
+    return pages
+
+
+@sqlite_db
+def test_paginate_by_primary_key(context):
+    ("Model.paginate() should walk the table in pages using a cursor")
+
+    pages = walk(order_by="-id", size=10)
+
+    [len(page) for page in pages].should.equal([10, 10, 5])
+    [m.id for page in pages for m in page].should.equal(list(range(25, 0, -1)))
+    pages[-1].cursor.should.be.none
+
+
+@sqlite_db
+def test_paginate_breaks_ties_with_primary_key(context):
+    ("Model.paginate() should break ties of non-unique orderings with the primary key")
+
+    pages = walk(order_by="+author", size=4)
+
+    found = [(m.author, m.id) for page in pages for m in page]
+    found.should.equal(sorted(found))
+    len(found).should.equal(25)
+
+
+@sqlite_db
+def test_paginate_with_filters_and_tuple_ordering(context):
+    ("Model.paginate() should support query modifiers and tuple orderings")
+
+    table = Article.table
+    pages = walk(
+        order_by=(asc(table.c.author), desc(table.c.title)),
+        size=3,
+        title__startswith="title 1",
+    )
+
+    expected = [("author {}".format(i % 3), "title {}".format(i)) for i in range(10, 20)]
+    expected.sort(key=lambda item: item[1], reverse=True)
+    expected.sort(key=lambda item: item[0])
+
+    [(m.author, m.title) for page in pages for m in page].should.equal(expected)
+
+
+@sqlite_db
+def test_paginate_rejects_cursor_of_another_ordering(context):
+    ("Model.paginate() should reject cursors generated for another ordering")
+
+    page = Article.paginate(order_by="-id", size=10)
+
+    Article.paginate.when.called_with(
+        after=page.cursor, order_by="+author", size=10
+    ).should.throw(InvalidPaginationCursor)
+    Article.paginate.when.called_with(after="garbage", size=10).should.throw(
+        InvalidPaginationCursor
+    )
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+from sure import scenario
+from chemist import Model, RecordNotFound, InvalidColumnName, db
+from chemist import context as chemist_context
+
+
+def reset_db(context):
+    context.engine = chemist_context.set_default_uri("sqlite://").bind
+    for model in (Article, CompactArticle):
+        model.table.create(context.engine)
+        model.bulk_create([
+            {"title": "first", "body": "a" * 1000, "token": "t1"},
+            {"title": "second", "body": "b" * 1000, "token": "t2"},
+        ])
+
+    context.statements = []
+    db.event.listen(
+        context.engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: context.statements.append(statement),
+    )
+
+
+def cleanup_db(context):
+    Article.table.drop(context.engine)
+    CompactArticle.table.drop(context.engine)
+
+
+sqlite_db = scenario(reset_db, cleanup_db)
+
+
+class Article(Model):
+    table = db.Table(
+        "projection_article",
+        db.MetaData(),
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("title", db.String(100)),
+        db.Column("body", db.UnicodeText),
+        db.Column("token", db.String(100)),
+    )
+
+
+class CompactArticle(Model):
+    table = db.Table(
+        "projection_compact_article",
+        db.MetaData(),
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("title", db.String(100)),
+        db.Column("body", db.UnicodeText),
+        db.Column("token", db.String(100)),
+    )
+    compact_storage = True
+    lazy_hydration = True
+
+
+@sqlite_db
+def test_find_by_only(context):
+    ("find_by(only=...) should select the given columns and the primary key")
+
+    for model in (Article, CompactArticle):
+        del context.statements[:]
+        articles = model.find_by(only=("title",), order_by="+id")
+
+        context.statements[0].should.contain("SELECT {0}.id, {0}.title \nFROM".format(
+            model.table.name
+        ))
+        [a.to_dict() for a in articles].should.equal([
+            {"id": 1, "title": "first"},
+            {"id": 2, "title": "second"},
+        ])
+        articles[0].unloaded_columns.should.equal(frozenset(["body", "token"]))
+
+        # the first access fetches all the unloaded columns at once
+        articles[0].body.should.equal("a" * 1000)
+        articles[0].token.should.equal("t1")
+        context.statements.should.have.length_of(2)
+        articles[0].unloaded_columns.should.be.empty
+        articles[0].to_dict().should.equal(
+            {"id": 1, "title": "first", "body": "a" * 1000, "token": "t1"}
+        )
+
+
+@sqlite_db
+def test_where_many_columns(context):
+    ("where_many(columns=...) should load partial models")
+
+    table = Article.table
+    articles = Article.where_many(
+        table.c.token == "t2", columns=("token",), order_by=(table.c.id,)
+    )
+
+    [a.to_dict() for a in articles].should.equal([{"id": 2, "token": "t2"}])
+    Article.where_one(table.c.id == 1, columns=("id",)).title.should.equal("first")
+
+
+@sqlite_db
+def test_save_partial_model(context):
+    ("Saving a partial model should only update the assigned columns")
+
+    for model in (Article, CompactArticle):
+        article = model.find_one_by(id=1, only=("title",))
+        article.title = "renamed"
+        article.token = "t3"
+        article.save()
+
+        article.to_dict().should.equal({"id": 1, "title": "renamed", "token": "t3"})
+        model.find_one_by(id=1).to_dict().should.equal(
+            {"id": 1, "title": "renamed", "body": "a" * 1000, "token": "t3"}
+        )
+
+
+@sqlite_db
+def test_unloaded_columns_of_deleted_row(context):
+    ("Accessing the unloaded columns of a deleted row should fail clearly")
+
+    article = Article.find_one_by(id=1, only=("title",))
+    Article.find_one_by(id=1).delete()
+
+    (lambda: article.body).when.called_with().should.throw(RecordNotFound)
+    Article.find_by.when.called_with(only=("nope",)).should.throw(InvalidColumnName)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+import itertools
+
+from sure import scenario
+from chemist import Model, db
+from chemist import context as chemist_context
+
+
+def reset_db(context):
+    context.engine = chemist_context.set_default_uri("sqlite://").bind
+    Task.table.create(context.engine)
+    Task.bulk_create([{"name": "task{}".format(i), "done": False} for i in range(3)])
+
+    context.statements = []
+    db.event.listen(
+        context.engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: context.statements.append(statement),
+    )
+    context.checkouts = []
+    db.event.listen(
+        context.engine.pool, "checkout", lambda *args: context.checkouts.append(args)
+    )
+
+
+def cleanup_db(context):
+    Task.table.drop(context.engine)
+
+
+sqlite_db = scenario(reset_db, cleanup_db)
+positions = itertools.count(1)
+
+
+class Task(Model):
+    table = db.Table(
+        "session_task",
+        db.MetaData(),
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("name", db.String(100)),
+        db.Column("done", db.Boolean),
+        db.Column("position", db.Integer, default=lambda: next(positions)),
+    )
+
+
+def writes(statements):
+    return [s.split()[0] for s in statements if not s.startswith("SELECT")]
+
+
+@sqlite_db
+def test_session_identity_map(context):
+    ("Within a session the same primary key should map to the same instance")
+
+    with chemist_context.session():
+        first = Task.find_one_by(id=1)
+        Task.where_one(Task.table.c.name == "task0").should.be(first)
+        Task.all(order_by="+id")[0].should.be(first)
+
+    Task.find_one_by(id=1).shouldnt.be(first)
+    context.checkouts.should.have.length_of(2)
+
+
+@sqlite_db
+def test_session_defers_saves(context):
+    ("Within a session saves should be flushed in a single transaction at exit")
+
+    with chemist_context.session() as session:
+        for task in Task.all():
+            task.done = True
+            task.save()
+
+        Task.create(name="task3", done=False)
+        Task.create(name="task4", done=True)
+
+        writes(context.statements).should.be.empty
+        session.pending.should.have.length_of(5)
+
+    writes(context.statements).should.equal(["INSERT", "INSERT", "UPDATE"])
+    Task.find_one_by(name="task4").id.should.equal(5)
+    [t.done for t in Task.all(order_by="+id")].should.equal([True] * 3 + [False, True])
+
+
+@sqlite_db
+def test_session_discards_saves_on_error(context):
+    ("A session that exits with an error should not flush its saves")
+
+    def fail():
+        with chemist_context.session():
+            task = Task.find_one_by(id=1)
+            task.name = "changed"
+            task.save()
+            raise RuntimeError("boom")
+
+    fail.when.called_with().should.throw(RuntimeError)
+
+    Task.find_one_by(id=1).name.should.equal("task0")
+
+
+@sqlite_db
+def test_session_keeps_evaluated_defaults(context):
+    ("A session flush should keep the column defaults it inserted in the models")
+
+    with chemist_context.session():
+        task = Task.create(name="task3", done=False)
+
+    position = task.position
+    task.position.should.equal(position)
+    Task.find_one_by(id=task.id).position.should.equal(position)
+
+
+@sqlite_db
+def test_session_refresh(context):
+    ("Within a session refresh() should read the row again")
+
+    with chemist_context.session():
+        task = Task.find_one_by(id=1)
+        context.engine.execute(
+            Task.table.update().where(Task.table.c.id == 1).values(name="renamed")
+        )
+
+        task.refresh()
+        task.name.should.equal("renamed")
+        Task.find_one_by(id=1).should.be(task)
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+from sure import scenario
+from chemist import Manager, Model, db
+from chemist import context as chemist_context
+from chemist.managers import StatementCache
+
+
+def reset_db(context):
+    context.engine = chemist_context.set_default_uri("sqlite://").bind
+    Task.table.create(context.engine)
+    Task.bulk_create([{"name": "task{}".format(i % 2), "done": False} for i in range(6)])
+
+
+def cleanup_db(context):
+    Task.table.drop(context.engine)
+
+
+sqlite_db = scenario(reset_db, cleanup_db)
+
+
+class Task(Model):
+    table = db.Table(
+        "statement_cache_task",
+        db.MetaData(),
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("name", db.String(100)),
+        db.Column("done", db.Boolean),
+    )
+
+
+@sqlite_db
+def test_statement_cache_reuses_compiled_statements(context):
+    ("Queries of the same shape should reuse the compiled statement")
+
+    cache = StatementCache()
+    manager = Manager(Task, context.engine)
+    manager.statement_cache = cache
+
+    [t.id for t in manager.find_by(name="task0", order_by="+id")].should.equal([1, 3, 5])
+    [t.id for t in manager.find_by(name="task1", order_by="+id")].should.equal([2, 4, 6])
+    manager.find_by(name=None).should.be.empty
+
+    stats = cache.stats()
+    stats["statements"]["hits"].should.equal(1)
+    stats["statements"]["size"].should.equal(2)
+    stats["compiled"]["size"].should.equal(2)
+
+
+@sqlite_db
+def test_statement_cache_limit_and_offset(context):
+    ("Limits and offsets should be bound as parameters")
+
+    ids = lambda **kw: [t.id for t in Task.find_by(order_by="+id", **kw)]
+
+    ids(name="task0", limit_by=2).should.equal([1, 3])
+    ids(name="task0", limit_by=1, offset_by=2).should.equal([5])
+    ids(name="task1", offset_by=1).should.equal([4, 6])
+    ids(name="task1", limit_by=5).should.equal([2, 4, 6])
+
+
+class DoneManager(Manager):
+    def select_all(self):
+        return super(DoneManager, self).select_all().where(Task.table.c.done.is_(True))
+
+
+@sqlite_db
+def test_statement_cache_is_per_manager_class(context):
+    ("Managers that build different statements should not share cache entries")
+
+    Task.find_by(name="task0").should.have.length_of(3)
+    DoneManager(Task, context.engine).find_by(name="task0").should.be.empty
+    Task.find_by(name="task0").should.have.length_of(3)
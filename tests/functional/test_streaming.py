@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import tracemalloc
+
+from sure import scenario
+from chemist import Model, db, metadata
+from chemist import context as chemist_context
+
+
+def reset_db(context):
+    context.path = tempfile.mkdtemp()
+    uri = "sqlite:///{}".format(os.path.join(context.path, "streaming.db"))
+    context.engine = chemist_context.set_default_uri(uri).bind
+    StreamedRow.table.create(context.engine)
+
+
+def cleanup_db(context):
+    context.engine.dispose()
+    shutil.rmtree(context.path)
+
+
+sqlite_db = scenario(reset_db, cleanup_db)
+
+
+class StreamedRow(Model):
+    lazy_hydration = True
+    table = db.Table(
+        "streaming_row",
+        db.MetaData(),
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("name", db.String(80)),
+    )
+
+
+def insert_rows(engine, count, batch_size=50000):
+    for start in range(0, count, batch_size):
+        engine.execute(
+            StreamedRow.table.insert(),
+            [
+                {"id": i, "name": "row {}".format(i)}
+                for i in range(start + 1, min(start + batch_size, count) + 1)
+            ],
+        )
+
+
+def peak_memory_while_consuming(models):
+    tracemalloc.start()
+    try:
+        count = 0
+        for _ in models:
+            count += 1
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return count, peak
+
+
+@sqlite_db
+def test_iter_all_keeps_memory_flat(context):
+    ("Model.iter_all() should stream a million rows in bounded memory")
+
+    insert_rows(context.engine, 1000000)
+
+    count, peak = peak_memory_while_consuming(StreamedRow.iter_all(batch_size=500))
+
+    count.should.equal(1000000)
+    peak.should.be.lower_than(2 * 1024 * 1024)
+
+
+@sqlite_db
+def test_iter_by_filters_and_orders(context):
+    ("Model.iter_by() should stream the models matching the keyword-arguments")
+
+    insert_rows(context.engine, 100)
+
+    found = StreamedRow.iter_by(name__startswith="row 1", order_by="+id", batch_size=3)
+    names = [m.name for m in found]
+
+    names.should.equal(
+        ["row 1"] + ["row 1{}".format(i) for i in range(10)] + ["row 100"]
+    )
+
+
+@sqlite_db
+def test_where_iter(context):
+    ("Model.where_iter() should stream the models matching the expressions")
+
+    insert_rows(context.engine, 10)
+
+    table = StreamedRow.table
+    found = StreamedRow.where_iter(
+        table.c.id > 7, order_by=(db.desc(table.c.id),), batch_size=2
+    )
+
+    [m.id for m in found].should.equal([10, 9, 8])
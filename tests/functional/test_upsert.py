@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+from contextlib import contextmanager
+
+from mock import patch
+from sure import scenario
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql.base import PGCompiler
+from sqlalchemy.dialects.sqlite.base import SQLiteCompiler
+from chemist import Model, db
+from chemist import context as chemist_context
+from chemist.managers import UPSERT_INSERTS
+
+
+def reset_db(context):
+    context.engine = chemist_context.set_default_uri("sqlite://").bind
+    Subscriber.table.create(context.engine)
+    Subscriber.create(email="alice@example.com", name="Alice", visits=1)
+
+
+def cleanup_db(context):
+    Subscriber.table.drop(context.engine)
+
+
+sqlite_db = scenario(reset_db, cleanup_db)
+
+
+class Subscriber(Model):
+    table = db.Table(
+        "upsert_subscriber",
+        db.MetaData(),
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("email", db.String(100), unique=True),
+        db.Column("name", db.String(100)),
+        db.Column("visits", db.Integer, default=0),
+    )
+
+
+def rows():
+    return sorted(
+        Subscriber.values_list("email", "name", "visits"),
+    )
+
+
+@sqlite_db
+def test_upsert(context):
+    ("Manager#upsert should update the row with the same conflict "
+     "values or insert a new one")
+
+    manager = Subscriber.objects()
+
+    alice = manager.upsert(conflict_on="email", email="alice@example.com", visits=2)
+    alice.name.should.equal("Alice")
+    alice.visits.should.equal(2)
+
+    bob = manager.upsert(conflict_on=("email",), email="bob@example.com", name="Bob")
+    bob.id.should.be.an(int)
+
+    rows().should.equal([
+        ("alice@example.com", "Alice", 2),
+        ("bob@example.com", "Bob", 0),
+    ])
+
+
+@sqlite_db
+def test_bulk_upsert(context):
+    ("Manager#bulk_upsert should upsert many rows and return their models")
+
+    models = Subscriber.objects().bulk_upsert(
+        [
+            {"email": "alice@example.com", "name": "Alicia"},
+            {"email": "carol@example.com", "name": "Carol", "visits": 3},
+        ],
+        conflict_on="email",
+    )
+
+    [m.name for m in models].should.equal(["Alicia", "Carol"])
+    rows().should.equal([
+        ("alice@example.com", "Alicia", 1),
+        ("carol@example.com", "Carol", 3),
+    ])
+
+
+@sqlite_db
+def test_get_or_create_with_unique_key(context):
+    ("get_or_create should return the existing row of a unique key")
+
+    alice = Subscriber.get_or_create(email="alice@example.com", name="Alice")
+    alice.visits.should.equal(1)
+
+    Subscriber.get_or_create(email="dave@example.com", name="Dave").id.should.be.an(int)
+    Subscriber.total_rows().should.equal(2)
+
+
+@contextmanager
+def native_upsert():
+    # SQLite understands ON CONFLICT but SQLAlchemy 1.3 has no upsert
+    # construct for it, the one of PostgreSQL compiles the same clause
+    names = ("visit_on_conflict_do_update", "visit_on_conflict_do_nothing", "_on_conflict_target")
+    patches = [
+        patch.object(SQLiteCompiler, name, getattr(PGCompiler, name), create=True)
+        for name in names
+    ]
+    patches.append(patch.dict(UPSERT_INSERTS, sqlite=postgresql.insert))
+    for p in patches:
+        p.start()
+
+    try:
+        yield
+    finally:
+        for p in reversed(patches):
+            p.stop()
+
+
+class Member(Subscriber):
+    table = db.Table(
+        "upsert_member",
+        db.MetaData(),
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("email", db.String(100), unique=True),
+        db.Column("name", db.String(100)),
+        db.Column("visits", db.Integer, default=0),
+    )
+    hooks = []
+
+    def pre_save(self):
+        self.hooks.append(("pre_save", self))
+
+    def post_save(self, transaction):
+        self.hooks.append(("post_save", self))
+
+
+def reset_members(context):
+    context.engine = chemist_context.set_default_uri("sqlite://").bind
+    Member.table.create(context.engine)
+    Member.create(email="alice@example.com", name="Alice", visits=1)
+    del Member.hooks[:]
+
+
+def cleanup_members(context):
+    Member.table.drop(context.engine)
+
+
+members_db = scenario(reset_members, cleanup_members)
+
+
+@members_db
+def test_native_upsert(context):
+    ("Manager#upsert should run the native upsert and return the model "
+     "of the row, with or without the values of the conflict columns")
+
+    manager = Member.objects()
+    with native_upsert():
+        manager.supports_upsert().should.be.true
+
+        alice = manager.upsert(conflict_on="email", email="alice@example.com", visits=2)
+        alice.id.should.equal(1)
+        alice.name.should.equal("Alice")
+        alice.visits.should.equal(2)
+
+        # no primary key to conflict on, selected back by the inserted one
+        bob = manager.upsert(email="bob@example.com", name="Bob")
+        bob.id.should.equal(2)
+        bob.visits.should.equal(0)
+
+        models = manager.bulk_upsert([{"name": "Carol"}, {"name": "Dave"}])
+        [(m.id, m.name) for m in models].should.equal([(3, "Carol"), (4, "Dave")])
+
+    Member.total_rows().should.equal(4)
+    # both hooks run on each returned model
+    [hook for hook, m in Member.hooks].should.equal(
+        ["pre_save", "post_save"] * 2 + ["pre_save"] * 2 + ["post_save"] * 2
+    )
+    [m for hook, m in Member.hooks].should.equal([alice, alice, bob, bob] + models * 2)
+    [m is alice for hook, m in Member.hooks[:2]].should.equal([True, True])
+
+
+@members_db
+def test_native_get_or_create(context):
+    ("get_or_create should only run post_save for the rows it inserts")
+
+    with native_upsert():
+        alice = Member.get_or_create(email="alice@example.com", name="Alicia")
+        dave = Member.get_or_create(email="dave@example.com", name="Dave")
+
+    alice.name.should.equal("Alice")
+    alice.visits.should.equal(1)
+    dave.id.should.equal(2)
+    dave.visits.should.equal(0)
+    Member.total_rows().should.equal(2)
+    [(hook, m.email) for hook, m in Member.hooks].should.equal([
+        ("pre_save", "alice@example.com"),
+        ("pre_save", "dave@example.com"),
+        ("post_save", "dave@example.com"),
+    ])
+    Member.hooks[2][1].should.be(dave)
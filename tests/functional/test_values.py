@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import types
+
+import nacl.secret
+
+from sure import scenario
+from chemist import Model, db
+from chemist import context as chemist_context
+
+
+def reset_db(context):
+    context.engine = chemist_context.set_default_uri("sqlite://").bind
+    Member.table.create(context.engine)
+    Member.bulk_create([
+        {"email": "member{}@example.com".format(i), "token": "token{}".format(i),
+         "active": i % 2 == 0, "bio": "bio{}".format(i)}
+        for i in range(5)
+    ])
+
+
+def cleanup_db(context):
+    Member.table.drop(context.engine)
+
+
+sqlite_db = scenario(reset_db, cleanup_db)
+
+
+class Member(Model):
+    table = db.Table(
+        "values_member",
+        db.MetaData(),
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("email", db.String(100)),
+        db.Column("token", db.Text),
+        db.Column("active", db.Boolean),
+        db.Column("bio", db.Text),
+    )
+    encryption = {"token": b"\x05" * nacl.secret.SecretBox.KEY_SIZE}
+    encryption_envelope = True
+    deferred_columns = ("bio",)
+
+
+@sqlite_db
+def test_values(context):
+    ("values() should return dicts of the selected columns, decrypted")
+
+    Member.values("id", "token", active=True, order_by="+id").should.equal([
+        {"id": 1, "token": "token0"},
+        {"id": 3, "token": "token2"},
+        {"id": 5, "token": "token4"},
+    ])
+    Member.values("email", email__startswith="member4").should.equal(
+        [{"email": "member4@example.com"}]
+    )
+    Member.values(id=2).should.equal([
+        {"id": 2, "email": "member1@example.com", "token": "token1", "active": False}
+    ])
+
+
+@sqlite_db
+def test_values_list(context):
+    ("values_list() should return tuples, or the values with flat=True")
+
+    Member.values_list("id", "email", limit_by=2, order_by="+id").should.equal([
+        (1, "member0@example.com"),
+        (2, "member1@example.com"),
+    ])
+    Member.values_list("bio", flat=True, order_by="-id", limit_by=2, offset_by=1).should.equal(
+        ["bio3", "bio2"]
+    )
+    Member.values_list.when.called_with("id", "email", flat=True).should.throw(TypeError)
+
+
+@sqlite_db
+def test_values_stream(context):
+    ("values(stream=True) should return a generator of the rows")
+
+    rows = Member.values_list("id", "token", stream=True, batch_size=2, order_by="+id")
+    rows.should.be.a(types.GeneratorType)
+    list(rows).should.equal([(i + 1, "token{}".format(i)) for i in range(5)])
+
+    dicts = Member.values("id", stream=True, active=False, order_by="+id")
+    list(dicts).should.equal([{"id": 2}, {"id": 4}])
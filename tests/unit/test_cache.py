@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+from mock import patch
+
+from chemist.cache import MemoryCache
+
+
+def test_memory_cache_get_set_delete():
+    "MemoryCache should store, return and delete values"
+
+    cache = MemoryCache()
+    cache.set(("user", 1), "row")
+
+    cache.get(("user", 1)).should.equal("row")
+    cache.get(("user", 2)).should.be.none
+
+    cache.delete(("user", 1))
+    cache.get(("user", 1)).should.be.none
+
+    cache.stats().should.equal({"hits": 1, "misses": 2, "evictions": 0, "size": 0})
+
+
+def test_memory_cache_evicts_least_recently_used():
+    "MemoryCache should evict the least recently used entries beyond max_size"
+
+    cache = MemoryCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    cache.get("b").should.be.none
+    cache.get("a").should.equal(1)
+    cache.get("c").should.equal(3)
+    cache.stats()["evictions"].should.equal(1)
+
+
+@patch("chemist.cache.monotonic")
+def test_memory_cache_expires_entries(monotonic):
+    "MemoryCache should not return entries older than the ttl"
+
+    monotonic.return_value = 100
+    cache = MemoryCache(ttl=10)
+    cache.set("a", 1)
+
+    monotonic.return_value = 109
+    cache.get("a").should.equal(1)
+
+    monotonic.return_value = 110
+    cache.get("a").should.be.none
+    cache.stats()["size"].should.equal(0)
+
+
+def test_memory_cache_clear():
+    "MemoryCache.clear should remove all the entries"
+
+    cache = MemoryCache()
+    cache.set("a", 1)
+    cache.clear()
+
+    cache.get("a").should.be.none
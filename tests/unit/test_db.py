@@ -2,18 +2,23 @@
 # -*- coding: utf-8 -*-
 
 
+import gc
+import tracemalloc
 from datetime import datetime
 from decimal import Decimal
 
 import sqlalchemy as db
 from chemist import (
     EngineNotSpecified,
+    FieldTypeValueError,
     InvalidColumnName,
     InvalidModelDeclaration,
+    InvalidQueryModifier,
     Manager,
     Model,
     MultipleEnginesSpecified,
 )
+from chemist.orm import ColumnAttribute, CompactData, Context, missing
 from mock import MagicMock, Mock, patch
 
 metadata = db.MetaData()
@@ -398,6 +403,42 @@ def test_model_using():
     MyDummyUserModel.manager.assert_called_once_with(MyDummyUserModel, engine_mock)
 
 
+def test_model_using_caches_managers():
+    ("Model.using() should return the same manager for the same engine")
+
+    class MyDummyUserModel(DummyUserModel):
+        manager = Mock()
+
+    engine_mock = Mock(name="engine")
+    manager = MyDummyUserModel.using(engine_mock)
+
+    MyDummyUserModel.using(engine_mock).should.be(manager)
+    MyDummyUserModel.using(Mock(name="other"))
+    MyDummyUserModel.manager.call_count.should.equal(2)
+
+
+def test_context_set_default_uri_clears_managers():
+    ("Context.set_default_uri() should discard the cached managers")
+
+    class MyDummyUserModel(DummyUserModel):
+        manager = Mock()
+
+    context = Context("sqlite://")
+    manager = context.get_manager(MyDummyUserModel)
+    context.get_manager(MyDummyUserModel).should.be(manager)
+    MyDummyUserModel.manager.assert_called_once_with(
+        MyDummyUserModel, context.engines["sqlite://"]
+    )
+
+    context.set_default_uri("sqlite:///:memory:")
+    context.get_manager(MyDummyUserModel)
+
+    MyDummyUserModel.manager.assert_called_with(
+        MyDummyUserModel, context.engines["sqlite:///:memory:"]
+    )
+    MyDummyUserModel.manager.call_count.should.equal(2)
+
+
 def test_model_is_persisted_true():
     ("Model#is_persisted evaluates to True if the Model instance " "has an id field.")
 
@@ -478,6 +519,68 @@ def test_model_save_existing():
     )
 
 
+def test_model_save_existing_updates_only_dirty_columns():
+    "Saving a model loaded from the database only updates the assigned columns"
+
+    class DirtyTrackedModel(Model):
+        table = db.Table(
+            "dirty_tracked_model",
+            metadata,
+            db.Column("id", db.Integer, primary_key=True),
+            db.Column("name", db.String(80)),
+            db.Column("email", db.String(80)),
+        )
+
+        get_engine = Mock()
+
+    engine_mock = DirtyTrackedModel.get_engine.return_value
+    db_mock = engine_mock.connect.return_value
+    db_mock.execute.return_value.last_updated_params.return_value = {}
+
+    proxy = Mock()
+    proxy.keys.return_value = ["id", "name", "email"]
+    d = Manager(DirtyTrackedModel, engine_mock).from_result_proxy(
+        proxy, (1, "foobar", "foo@bar.com")
+    )
+    d.dirty_columns.should.be.empty
+
+    d.email = "foo@baz.com"
+    d.dirty_columns.should.equal(frozenset(["email"]))
+
+    d.save().should.equal(d)
+
+    query = db_mock.execute.call_args[0][0]
+    str(query).should.equal(
+        "UPDATE dirty_tracked_model SET email=:email WHERE dirty_tracked_model.id = :id_1"
+    )
+    d.dirty_columns.should.be.empty
+
+
+def test_model_save_clean_does_not_touch_the_database():
+    "Saving a model without assigned columns performs no I/O"
+
+    class CleanModel(Model):
+        table = db.Table(
+            "clean_model",
+            metadata,
+            db.Column("id", db.Integer, primary_key=True),
+            db.Column("name", db.String(80)),
+        )
+
+        get_engine = Mock()
+
+    proxy = Mock()
+    proxy.keys.return_value = ["id", "name"]
+    d = Manager(CleanModel, CleanModel.get_engine.return_value).from_result_proxy(
+        proxy, (1, "foobar")
+    )
+    CleanModel.get_engine.reset_mock()
+
+    d.save().should.equal(d)
+
+    CleanModel.get_engine.called.should.be.false
+
+
 class MyDeletableModel(Model):
     table = db.Table(
         "my_deletable_model",
@@ -652,7 +755,7 @@ def test_total_rows_with_where():
     proxy = connection_mock.execute.return_value
 
     # When I try to query a manager by some field
-    result = manager.total_rows(age=26, unexisting_field=123)
+    result = manager.total_rows(age=26)
 
     # Then the result should be the result proxy
     result.should.equal(proxy.scalar.return_value)
@@ -667,6 +770,23 @@ def test_total_rows_with_where():
     )
 
 
+def test_total_rows_with_unknown_field():
+    ("Manager#total_rows should not ignore unknown fields in the where clause")
+
+    class MyDummyUserManager(TestManager):
+        model = DummyUserModel
+        engine = MagicMock(name="engine")
+
+    manager = MyDummyUserManager()
+
+    manager.total_rows.when.called_with(unexisting_field=123).should.throw(
+        InvalidColumnName
+    )
+    manager.total_rows.when.called_with(age__between=123).should.throw(
+        InvalidQueryModifier
+    )
+
+
 def test_total_rows():
     ("Manager#total_rows should return the count")
 
@@ -787,3 +907,198 @@ def test_model_one_from_query_calls_manager_with_default_engine():
 
     # And it should have been called appropriately
     ManagedModel.using.assert_called_once_with(None)
+
+
+def test_model_serialization_plan_is_compiled_per_column():
+    ("The ORM metaclass should compile one serializer per column, in table order")
+
+    list(ExquisiteModel.__serializers__.keys()).should.equal(
+        ["id", "score", "created_at"]
+    )
+
+
+@patch("chemist.orm.inspect.getmembers")
+def test_model_serialize_does_not_inspect_builtins(getmembers):
+    ("Model#serialize should not re-derive the builtin types on every call")
+
+    j = ExquisiteModel(score=Decimal("2.3"), created_at=datetime(2010, 10, 10))
+
+    j.serialize().should.equal(
+        {"score": "2.30", "created_at": "2010-10-10T00:00:00", "id": None}
+    )
+    getmembers.called.should.be.false
+
+
+def test_model_serialize_value_coerces_builtin_types():
+    ("Model.serialize_value should coerce values into the builtin python type of the column")
+
+    j = DummyUserModel()
+
+    j.serialize_value("age", "33").should.equal(33)
+    j.serialize_value.when.called_with("age", "not a number").should.throw(
+        FieldTypeValueError
+    )
+
+
+def test_model_columns_are_descriptors():
+    ("The ORM metaclass should install a ColumnAttribute for each column")
+
+    DummyUserModel.name.should.be.a(ColumnAttribute)
+    str(DummyUserModel.name.name).should.equal("name")
+
+    instance = DummyUserModel(name="Jeez")
+    instance.__dict__.shouldnt.have.key("name")
+    instance.__data__.should.equal({"name": "Jeez"})
+
+
+def test_model_column_descriptor_deserializes_dates():
+    ("Assigning a date column should go through Model.deserialize_value")
+
+    instance = ExquisiteModel()
+    instance.created_at = "2010-10-10T00:00:00"
+
+    instance.__data__["created_at"].should.equal(datetime(2010, 10, 10))
+
+
+def test_model_column_descriptor_respects_deserialize_value_overrides():
+    ("Assigning a column of a model that overrides deserialize_value should call it")
+
+    class UpperCaseModel(DummyUserModel):
+        def deserialize_value(self, attr, value):
+            return value.upper()
+
+    instance = UpperCaseModel(name="jeez")
+
+    instance.name.should.equal("JEEZ")
+
+
+def test_model_column_shadowed_by_class_attribute():
+    ("Columns named after model attributes should still be stored in the model data")
+
+    class Document(Model):
+        table = db.Table(
+            "shadowing_document",
+            metadata,
+            db.Column("id", db.Integer, primary_key=True),
+            db.Column("delete", db.Boolean),
+        )
+
+    Document.__shadowed_columns__.should.equal(frozenset(["delete"]))
+
+    instance = Document(id=1, delete=True)
+
+    instance.__data__.should.equal({"id": 1, "delete": True})
+    instance.delete.should_not.equal(True)
+
+
+def test_model_column_takes_precedence_over_shortcuts():
+    ("Columns named after manager shortcuts of the model should get a column attribute")
+
+    names = [
+        "iter_by",
+        "iter_all",
+        "where_iter",
+        "paginate",
+        "bulk_create",
+        "seal_legacy_ciphertexts",
+        "rotate_encryption",
+        "find_cached",
+        "undefer",
+        "values",
+        "values_list",
+        "aggregate",
+    ]
+
+    class Cursor(Model):
+        table = db.Table(
+            "shortcut_cursor",
+            metadata,
+            db.Column("id", db.Integer, primary_key=True),
+            *[db.Column(name, db.String(80)) for name in names]
+        )
+
+    Cursor.__shadowed_columns__.should.equal(frozenset())
+
+    instance = Cursor(id=1, **dict((name, name.upper()) for name in names))
+
+    for name in names:
+        getattr(instance, name).should.equal(name.upper())
+
+
+class CompactUserModel(Model):
+    compact_storage = True
+    table = db.Table(
+        "compact_user_model",
+        metadata,
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("name", db.String(80)),
+        db.Column("age", db.Integer),
+    )
+
+
+def test_compact_model_has_no_instance_dict():
+    ("Models declared with compact_storage should keep their values in slots")
+
+    instance = CompactUserModel(id=1, name="Jeez", engine="the engine")
+
+    type(instance).__dictoffset__.should.equal(0)
+    instance.__values__.should.equal([1, "Jeez", missing])
+    instance.engine.should.equal("the engine")
+
+
+def test_compact_model_public_api():
+    ("Models declared with compact_storage should keep the same public API")
+
+    instance = CompactUserModel(name="Jeez")
+
+    instance.__data__.should.be.a(CompactData)
+    dict(instance.__data__).should.equal({"name": "Jeez"})
+    instance.is_persisted.should.be.false
+    instance.get("name").should.equal("Jeez")
+    instance.get("age", 123).should.equal(123)
+
+    instance.set(id=3, age="40")
+    instance.age.should.equal(40)
+    instance.is_persisted.should.be.true
+    instance.to_dict().should.equal({"id": 3, "name": "Jeez", "age": 40})
+    (instance == CompactUserModel(id=3, name="Whatever")).should.be.true
+
+    instance.set.when.called_with(foo="bar").should.throw(InvalidColumnName)
+
+
+def test_compact_model_memory_per_instance():
+    ("Models declared with compact_storage should use less memory per instance")
+
+    class RegularUserModel(Model):
+        table = db.Table(
+            "regular_user_model",
+            metadata,
+            db.Column("id", db.Integer, primary_key=True),
+            db.Column("name", db.String(80)),
+            db.Column("age", db.Integer),
+        )
+
+    def bytes_per_instance(model, count=1000):
+        manager = Manager(model, Mock())
+        # a plain object rather than a Mock which would record every call
+        proxy = type(str("Proxy"), (object,), {"keys": lambda self: keys})()
+        keys = ["id", "name", "age"]
+        row = (1, "Jeez", 33)
+
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before, _ = tracemalloc.get_traced_memory()
+            instances = [manager.from_result_proxy(proxy, row) for _ in range(count)]
+            after, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        instances.should.have.length_of(count)
+        return (after - before) / float(count)
+
+    compact = bytes_per_instance(CompactUserModel)
+    regular = bytes_per_instance(RegularUserModel)
+
+    compact.should.be.lower_than(160)
+    compact.should.be.lower_than(regular / 2)
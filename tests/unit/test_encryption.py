@@ -1,9 +1,13 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import threading
+
 import sqlalchemy as db
 from mock import patch, Mock
 from chemist import Model
+from chemist.encryption import InMemoryKeyProvider, is_sealed
+from chemist.exceptions import UnknownEncryptionKey
 
 
 metadata = db.MetaData()
@@ -91,3 +95,211 @@ def test_decrypt_value_already_decrypted(SecretBox):
 
     result.should.equal("THIS|IS|ENCRYPTED|DATA")
     box_mock.decrypt.assert_called_once_with('THIS|IS|ENCRYPTED|DATA')
+
+
+@patch('chemist.models.nacl.secret.SecretBox')
+def test_model_encryption_box_is_cached_per_class(SecretBox):
+    ("Model.get_encryption_box_for_attribute should build a single "
+     "SecretBox per attribute and key for all instances")
+
+    class CachedEncModel(FakeEncryptionModel):
+        table = db.Table('cached_enc_model', metadata,
+                         db.Column('id', db.Integer, primary_key=True),
+                         db.Column('name', db.String(80)))
+
+    first = CachedEncModel().get_encryption_box_for_attribute('name')
+    second = CachedEncModel().get_encryption_box_for_attribute('name')
+
+    first.should.be(second)
+    SecretBox.assert_called_once_with('fake-encryption-key1')
+
+    CachedEncModel.encryption['name'] = 'fake-encryption-key2'
+    try:
+        CachedEncModel().get_encryption_box_for_attribute('name')
+    finally:
+        CachedEncModel.encryption['name'] = 'fake-encryption-key1'
+
+    SecretBox.call_count.should.equal(2)
+
+
+@patch('chemist.models.nacl.secret.SecretBox')
+def test_model_unencrypted_attribute_has_no_box(SecretBox):
+    "Model.get_encryption_box_for_attribute should return None for unencrypted attributes"
+
+    fem = FakeEncryptionModel()
+
+    fem.get_encryption_box_for_attribute('age').should.be.none
+    fem.decrypt_attribute('age', 42).should.equal(42)
+    SecretBox.called.should.be.false
+
+
+class EnvelopeModel(Model):
+    table = db.Table('envelope_model', metadata,
+                     db.Column('id', db.Integer, primary_key=True),
+                     db.Column('name', db.String(80)))
+    encryption = {
+        'name': b'\x01' * 32
+    }
+    encryption_envelope = True
+
+
+def test_envelope_encrypt_decrypt():
+    "Model.encrypt_attribute should seal values that Model.decrypt_attribute opens"
+
+    sealed = EnvelopeModel().encrypt_attribute('name', u'gabriel')
+
+    is_sealed(sealed).should.be.true
+    EnvelopeModel().decrypt_attribute('name', sealed).should.equal(u'gabriel')
+    EnvelopeModel(name=sealed).name.should.equal(u'gabriel')
+
+
+def test_envelope_does_not_decrypt_plain_values():
+    "Model.decrypt_attribute should not attempt decryption of untagged values"
+
+    class MyEnvelopeModel(EnvelopeModel):
+        get_encryption_box_for_attribute = Mock(
+            name='MyEnvelopeModel.get_encryption_box_for_attribute')
+
+    box_mock = MyEnvelopeModel.get_encryption_box_for_attribute.return_value
+
+    fem = MyEnvelopeModel(name='gabriel')
+    fem.name = 'falcão'
+
+    fem.name.should.equal('falcão')
+    box_mock.decrypt.called.should.be.false
+
+
+def test_encryption_assigned_after_class_creation():
+    "Assigning the encryption of a model class should encrypt its columns from then on"
+
+    class LateEncryptionModel(Model):
+        table = db.Table('late_enc_model', metadata,
+                         db.Column('id', db.Integer, primary_key=True),
+                         db.Column('name', db.String(80)))
+        encryption_envelope = True
+
+    class LateEncryptionChild(LateEncryptionModel):
+        pass
+
+    LateEncryptionModel.encryption = {'name': b'\x01' * 32}
+
+    for model_class in (LateEncryptionModel, LateEncryptionChild):
+        fem = model_class()
+        fem.name = u'gabriel'
+        sealed = fem.to_insert_params()['name']
+
+        is_sealed(sealed).should.be.true
+        model_class(name=sealed).name.should.equal(u'gabriel')
+
+
+def test_envelope_unknown_key():
+    "Model.decrypt_attribute should refuse values sealed with another key"
+
+    class OtherKeyModel(EnvelopeModel):
+        encryption = {
+            'name': b'\x02' * 32
+        }
+
+    sealed = OtherKeyModel().encrypt_attribute('name', u'gabriel')
+
+    EnvelopeModel().decrypt_attribute.when.called_with('name', sealed).should.throw(
+        UnknownEncryptionKey)
+
+
+class Slow(InMemoryKeyProvider):
+    def __init__(self, *args, **kw):
+        super(Slow, self).__init__(*args, **kw)
+        self.release = threading.Event()
+
+    def fetch_key(self, model, attr):
+        self.release.wait(5)
+        return super(Slow, self).fetch_key(model, attr)
+
+
+def test_key_provider_caches_keys():
+    "KeyProvider.get_key should fetch each key once until it expires"
+
+    provider = InMemoryKeyProvider({('FakeEncryptionModel', 'name'): 'key1'})
+
+    provider.get_key(FakeEncryptionModel, 'name').should.equal('key1')
+    provider.get_key(FakeEncryptionModel, 'name').should.equal('key1')
+    provider.fetch_count.should.equal(1)
+
+    provider.set_key(FakeEncryptionModel, 'name', 'key2')
+    provider.ttl = -1
+    provider.clear()
+
+    provider.get_key(FakeEncryptionModel, 'name').should.equal('key2')
+    provider.get_key(FakeEncryptionModel, 'name').should.equal('key2')
+    provider.fetch_count.should.equal(3)
+
+
+def test_key_provider_evicts_least_recently_used():
+    "KeyProvider.get_key should keep up to max_size keys"
+
+    provider = InMemoryKeyProvider({
+        ('FakeEncryptionModel', 'name'): 'key1',
+        ('FakeEncryptionModel', 'age'): 'key2',
+    }, max_size=1)
+
+    provider.get_key(FakeEncryptionModel, 'name')
+    provider.get_key(FakeEncryptionModel, 'age')
+    provider.get_key(FakeEncryptionModel, 'name')
+
+    provider.cache.should.have.length_of(1)
+    provider.fetch_count.should.equal(3)
+
+
+def test_key_provider_single_flight():
+    "KeyProvider.get_key should fetch a key once for concurrent threads"
+
+    provider = Slow({('FakeEncryptionModel', 'name'): 'key1'})
+    results = []
+
+    def get_key():
+        results.append(provider.get_key(FakeEncryptionModel, 'name'))
+
+    threads = [threading.Thread(target=get_key) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+
+    provider.release.set()
+    for thread in threads:
+        thread.join()
+
+    results.should.equal(['key1'] * 8)
+    provider.fetch_count.should.equal(1)
+
+
+def test_key_provider_fetch_errors_are_not_cached():
+    "KeyProvider.get_key should raise the errors of fetch_key without caching"
+
+    provider = InMemoryKeyProvider()
+
+    provider.get_key.when.called_with(FakeEncryptionModel, 'name').should.throw(KeyError)
+
+    provider.set_key('FakeEncryptionModel', 'name', 'key1')
+    provider.get_key(FakeEncryptionModel, 'name').should.equal('key1')
+
+
+def test_model_encryption_with_key_provider():
+    "Model.encryption should accept a KeyProvider in place of a key"
+
+    provider = InMemoryKeyProvider()
+
+    class ProvidedKeyModel(Model):
+        table = db.Table('provided_key_model', metadata,
+                         db.Column('id', db.Integer, primary_key=True),
+                         db.Column('name', db.String(80)))
+        encryption = {
+            'name': provider,
+        }
+        encryption_envelope = True
+
+    provider.set_key(ProvidedKeyModel, 'name', b'\x03' * 32)
+
+    sealed = ProvidedKeyModel().encrypt_attribute('name', u'gabriel')
+    ProvidedKeyModel(name=sealed).name.should.equal(u'gabriel')
+    ProvidedKeyModel(name=sealed).name.should.equal(u'gabriel')
+
+    provider.fetch_count.should.equal(1)
@@ -4,6 +4,7 @@ from datetime import datetime
 
 import sqlalchemy as db
 from chemist import InvalidColumnName, InvalidQueryModifier, Manager, Model
+from chemist.managers import StatementCache
 from mock import call, MagicMock, Mock, patch
 
 metadata = db.MetaData()
@@ -194,6 +195,82 @@ def test_from_result_proxy_with_result():
     manager.from_result_proxy(proxy, ("Foobar", 1, 33)).should.be.a(DummyUserModel)
 
 
+class LazyUserModel(Model):
+    lazy_hydration = True
+    table = db.Table(
+        "lazy_user_model",
+        metadata,
+        db.Column("id", db.Integer, primary_key=True),
+        db.Column("name", db.String(80)),
+        db.Column("created_at", db.DateTime()),
+    )
+
+
+class CompactLazyUserModel(LazyUserModel):
+    compact_storage = True
+
+
+def test_from_result_proxy_lazy_hydration():
+    ("Manager#from_result_proxy should not hydrate the row of models "
+     "declared with lazy_hydration")
+
+    proxy = Mock()
+    proxy.keys.return_value = ["id", "name", "created_at"]
+    row = {"id": 1, "name": "Foobar", "created_at": "2010-10-10T00:00:00"}
+
+    for model in (LazyUserModel, CompactLazyUserModel):
+        manager = Manager(model, Mock())
+
+        with patch.object(
+            model, "deserialize_value", side_effect=lambda attr, value: value
+        ) as deserialize_value:
+            instance = manager.from_result_proxy(proxy, row)
+            instance.should.be.a(model)
+            deserialize_value.called.should.be.false
+
+            # When I read a column twice
+            instance.name.should.equal("Foobar")
+            instance.name.should.equal("Foobar")
+
+            # Then only that column is deserialized, once
+            deserialize_value.assert_called_once_with("name", "Foobar")
+
+
+def test_from_result_proxy_lazy_hydration_deserializes_on_access():
+    ("Lazily hydrated models should deserialize each column on first access")
+
+    proxy = Mock()
+    proxy.keys.return_value = ["id", "created_at"]
+    manager = Manager(LazyUserModel, Mock())
+
+    instance = manager.from_result_proxy(
+        proxy, {"id": 1, "created_at": "2010-10-10T00:00:00"}
+    )
+
+    instance.is_persisted.should.be.true
+    instance.get("created_at").should.equal(datetime(2010, 10, 10))
+    instance.to_dict().should.equal(
+        {"id": 1, "name": None, "created_at": "2010-10-10T00:00:00"}
+    )
+
+
+def test_from_result_proxy_lazy_hydration_with_preprocess():
+    ("Models declared with lazy_hydration that implement preprocess "
+     "are hydrated eagerly")
+
+    class PreprocessedUserModel(LazyUserModel):
+        def preprocess(self, data):
+            data["name"] = data["name"].upper()
+            return data
+
+    proxy = Mock()
+    proxy.keys.return_value = ["id", "name"]
+    manager = Manager(PreprocessedUserModel, Mock())
+
+    instance = manager.from_result_proxy(proxy, (1, "foobar"))
+    instance.__data__.should.equal({"id": 1, "name": "FOOBAR"})
+
+
 def test_manager_create():
     "Manager#create should create an instance and save it in the database"
 
@@ -226,6 +303,8 @@ def test_manager_get_or_create_when_exists():
 
     class MyFindableManager(TestManager):
 
+        model = DummyUserModel
+        engine = Mock(name="engine")
         find_one_by = find_one_by_mock
 
     manager = MyFindableManager()
@@ -248,6 +327,8 @@ def test_manager_get_or_create_when_does_not_exist():
 
     class MyFCreatableManager(TestManager):
 
+        model = DummyUserModel
+        engine = Mock(name="engine")
         find_one_by = find_one_by_mock
         create = create_mock
 
@@ -350,8 +431,10 @@ def test_query_by():
     manager = MyDummyUserManager()
 
     # Given a DB connection
+    # (cached statements are executed with the compiled_cache option)
     connection_mock = (
         MyDummyUserManager.engine.begin.return_value.__enter__.return_value
+        .execution_options.return_value
     )
     # And its result proxy
     proxy = connection_mock.execute.return_value
@@ -390,8 +473,10 @@ def test_query_by_limit_by():
     manager = MyDummyUserManager()
 
     # Given a DB connection
+    # (cached statements are executed with the compiled_cache option)
     connection_mock = (
         MyDummyUserManager.engine.begin.return_value.__enter__.return_value
+        .execution_options.return_value
     )
     # And its result proxy
     proxy = connection_mock.execute.return_value
@@ -431,8 +516,10 @@ def test_query_by_offset_by():
     manager = MyDummyUserManager()
 
     # Given a DB connection
+    # (cached statements are executed with the compiled_cache option)
     connection_mock = (
         MyDummyUserManager.engine.begin.return_value.__enter__.return_value
+        .execution_options.return_value
     )
     # And its result proxy
     proxy = connection_mock.execute.return_value
@@ -469,8 +556,10 @@ def test_query_by_startswith():
     manager = MyDummyUserManager()
 
     # Given a DB connection
+    # (cached statements are executed with the compiled_cache option)
     connection_mock = (
         MyDummyUserManager.engine.begin.return_value.__enter__.return_value
+        .execution_options.return_value
     )
     # And its result proxy
     proxy = connection_mock.execute.return_value
@@ -506,8 +595,10 @@ def test_query_by_contains():
     manager = MyDummyUserManager()
 
     # Given a DB connection
+    # (cached statements are executed with the compiled_cache option)
     connection_mock = (
         MyDummyUserManager.engine.begin.return_value.__enter__.return_value
+        .execution_options.return_value
     )
     # And its result proxy
     proxy = connection_mock.execute.return_value
@@ -738,3 +829,176 @@ def test_one_from_query(from_result_proxy, get_connection):
         proxy,
         proxy.fetchone.return_value,
     )
+
+
+def test_prepare_query_caches_statements_per_shape():
+    ("Manager#prepare_query should reuse the statement of a query shape "
+     "and bind the values as parameters")
+
+    class MyDummyUserManager(TestManager):
+        model = DummyUserModel
+        statement_cache = StatementCache()
+
+    manager = MyDummyUserManager()
+
+    first, first_params = manager.prepare_query(name="foo", limit_by=10)
+    second, second_params = manager.prepare_query(name="bar", limit_by=20)
+
+    second.should.be(first)
+    first_params["name_1"].should.equal("foo")
+    second_params["name_1"].should.equal("bar")
+    sorted(first_params.values(), key=str).should.equal([10, "foo"])
+    sorted(second_params.values(), key=str).should.equal([20, "bar"])
+
+    stats = MyDummyUserManager.statement_cache.stats()["statements"]
+    stats.should.equal({"hits": 1, "misses": 1, "evictions": 0, "size": 1, "hit_rate": 0.5})
+
+
+def test_prepare_query_none_values():
+    ("Manager#prepare_query should compare None values with IS NULL")
+
+    class MyDummyUserManager(TestManager):
+        model = DummyUserModel
+        statement_cache = StatementCache()
+
+    manager = MyDummyUserManager()
+
+    query, params = manager.prepare_query(name=None, age__contains="3_")
+
+    str(query).should.equal(
+        "SELECT dummy_user_model.id, dummy_user_model.name, dummy_user_model.age \n"
+        "FROM dummy_user_model \n"
+        "WHERE (dummy_user_model.age LIKE '%' + :age_1 || '%' ESCAPE '#') "
+        "AND dummy_user_model.name IS NULL "
+        "ORDER BY dummy_user_model.id DESC"
+    )
+    params.should.equal({"age_1": "3#_"})
+    manager.prepare_query(name="foo")[0].shouldnt.be(query)
+
+
+def test_prepare_query_extended_modifiers():
+    ("Manager#prepare_query should compile the extended query modifiers")
+
+    class MyDummyUserManager(TestManager):
+        model = DummyUserModel
+        statement_cache = StatementCache()
+
+    manager = MyDummyUserManager()
+
+    query, params = manager.prepare_query(
+        age__in=[1, 2],
+        age__range=(3, 4),
+        name__iexact="Foo",
+        name__isnull=False,
+        age__ne=None,
+        age__gte=5,
+    )
+
+    str(query).should.equal(
+        "SELECT dummy_user_model.id, dummy_user_model.name, dummy_user_model.age \n"
+        "FROM dummy_user_model \n"
+        "WHERE dummy_user_model.age >= :age_1 "
+        "AND dummy_user_model.age IN ([EXPANDING_age_2]) "
+        "AND dummy_user_model.age IS NOT NULL "
+        "AND dummy_user_model.age BETWEEN :age_3 AND :age_4 "
+        "AND lower(dummy_user_model.name) = lower(:name_1) "
+        "AND dummy_user_model.name IS NOT NULL "
+        "ORDER BY dummy_user_model.id DESC"
+    )
+    params.should.equal(
+        {"age_1": 5, "age_2": [1, 2], "age_3": 3, "age_4": 4, "name_1": "Foo"}
+    )
+
+    # the booleans of isnull are part of the query shape
+    manager.prepare_query(name__isnull=True)[0].shouldnt.be(
+        manager.prepare_query(name__isnull=False)[0]
+    )
+
+
+def test_split_in_filter():
+    ("Manager#split_in_filter should split the distinct values of "
+     "the large __in filters in chunks of the dialect")
+
+    class MyDummyUserManager(TestManager):
+        model = DummyUserModel
+        engine = Mock(name="engine")
+        in_chunk_sizes = {"sqlite": 2}
+
+    manager = MyDummyUserManager()
+    manager.engine.dialect.name = "sqlite"
+
+    manager.split_in_filter({"age__in": [1, 2], "name": "foo"}).should.be.none
+    manager.split_in_filter(
+        {"age__in": [1, 2, 2, 3], "name__in": lambda: ["a"]}
+    ).should.equal((("age__in",), [([1, 2],), ([3],)]))
+    manager.split_in_filter(
+        {"age__in": [1, 2, 3], "name__in": ["a", "b", "c"]}
+    ).should.equal((
+        ("age__in", "name__in"),
+        [([1, 2], ["a", "b"]), ([1, 2], ["c"]), ([3], ["a", "b"]), ([3], ["c"])],
+    ))
+
+    manager.engine.dialect.name = "postgresql"
+    manager.split_in_filter({"age__in": [1, 2, 3]}).should.be.none
+
+
+def test_parse_order_by():
+    ("Manager#parse_order_by should return the column name and "
+     "whether the order is descending")
+
+    class MyDummyUserManager(TestManager):
+        model = DummyUserModel
+
+    manager = MyDummyUserManager()
+
+    manager.parse_order_by(None).should.equal(("id", True))
+    manager.parse_order_by("+name").should.equal(("name", False))
+    manager.parse_order_by("-name").should.equal(("name", True))
+    manager.parse_order_by("name").should.equal(("name", True))
+
+
+def test_upsert_statement():
+    ("Manager#upsert_statement should compile to the native upsert "
+     "of the dialect")
+
+    from sqlalchemy.dialects import mysql, postgresql
+
+    class MyDummyUserManager(TestManager):
+        model = DummyUserModel
+
+    manager = MyDummyUserManager()
+
+    statement = manager.upsert_statement("postgresql", ("id",), ["name"])
+    str(statement.values(id=1, name="foo").compile(dialect=postgresql.dialect())).should.equal(
+        "INSERT INTO dummy_user_model (id, name) VALUES (%(id)s, %(name)s) "
+        "ON CONFLICT (id) DO UPDATE SET name = excluded.name"
+    )
+
+    statement = manager.upsert_statement("mysql", ("id",), [])
+    str(statement.values(id=1, name="foo").compile(dialect=mysql.dialect())).should.equal(
+        "INSERT INTO dummy_user_model (id, name) VALUES (%s, %s) "
+        "ON DUPLICATE KEY UPDATE id = VALUES(id)"
+    )
+
+
+def test_get_unique_key():
+    ("Manager#get_unique_key should return the first unique key "
+     "with all its values in the data")
+
+    class Account(Model):
+        table = db.Table(
+            "dummy_account",
+            metadata,
+            db.Column("id", db.Integer, primary_key=True),
+            db.Column("email", db.String(80), unique=True),
+            db.Column("name", db.String(80)),
+        )
+
+    class MyAccountManager(TestManager):
+        model = Account
+
+    manager = MyAccountManager()
+
+    manager.get_unique_key({"id": 1, "email": "a@b.c"}).should.equal(("id",))
+    manager.get_unique_key({"email": "a@b.c", "name": "a"}).should.equal(("email",))
+    manager.get_unique_key({"name": "a", "email": None}).should.be.none